@@ -11,6 +11,7 @@ artifactor:
             enabled: True
             plugin: reporter
             only_failed: False #Only show faled tests in the report
+            report_interval: 5 #Least seconds between report rewrites while tests run
 """
 import csv
 import datetime
@@ -43,6 +44,16 @@ _tests_tpl = {
     '_duration': 0
 }
 
+# Label colors of the test outcomes in the tree
+_label_colors = {
+    'passed': 'success',
+    'failed': 'warning',
+    'error': 'danger',
+    'skipped': 'primary',
+    'xpassed': 'danger',
+    'xfailed': 'success'
+}
+
 # Regexp, that finds all URLs in a string
 # Does not cover all the cases, but rather only those we can
 URL = re.compile(r"https?://[^/\s]+(?:/[^/\s?]+)*/?(?:\?(?:[^&\s=]+(?:=[^&\s]+)?&?)*)?")
@@ -82,11 +93,38 @@ class ReporterBase(object):
             self.render_report(template_data, "report_{}".format(mgmt), artifact_dir,
                 'test_report_provider.html')
 
+    @property
+    def template_env(self):
+        if not hasattr(self, '_template_env'):
+            self._template_env = Environment(
+                loader=FileSystemLoader(template_path.strpath)
+            )
+        return self._template_env
+
+    @property
+    def finished_tests(self):
+        """Processed finished tests, ``{test_name: test_data}``, see :py:meth:`add_test`"""
+        if not hasattr(self, '_finished_tests'):
+            self._finished_tests = {}
+        return self._finished_tests
+
+    @property
+    def finished_totals(self):
+        """Counts, qa contacts and tree of the :py:attr:`finished_tests`"""
+        if not hasattr(self, '_finished_totals'):
+            self._finished_totals = {
+                'counts': dict.fromkeys(_tests_tpl['_stats'], 0),
+                'current_counts': dict.fromkeys(_tests_tpl['_stats'], 0),
+                'blocker_skip_count': 0,
+                'provider_skip_count': 0,
+                # qa contact -> number of tests
+                'qa': {},
+                'tree': self.new_tree(),
+            }
+        return self._finished_totals
+
     def render_report(self, report, filename, log_dir, template):
-        template_env = Environment(
-            loader=FileSystemLoader(template_path.strpath)
-        )
-        data = template_env.get_template(template).render(**report)
+        data = self.template_env.get_template(template).render(**report)
 
         with open(os.path.join(log_dir, '{}.html'.format(filename)), "w") as f:
             f.write(data)
@@ -95,27 +133,97 @@ class ReporterBase(object):
         except OSError:
             pass
 
+    def add_test(self, test_name, test, log_dir):
+        """Process a finished test once, and add it to the counts and the tree
+
+        The test's files are read, and its tree item and report panel are rendered, so that
+        reports only have to join them. A test added again replaces the one with the same name.
+        """
+        self.remove_test(test_name)
+        test_data = self.process_test(test_name, test, log_dir)
+        self.render_test(test_data)
+        self.finished_tests[test_name] = test_data
+        self.count_test(self.finished_totals, test_data, 1)
+
+    def remove_test(self, test_name):
+        test_data = self.finished_tests.pop(test_name, None)
+        if test_data is not None:
+            self.count_test(self.finished_totals, test_data, -1)
+
+    def count_test(self, totals, test_data, sign):
+        """Add (``sign`` 1) or remove (``sign`` -1) a test to or from the totals"""
+        overall_status = test_data['outcomes']['overall']
+        totals['counts'][overall_status] += sign
+        if not test_data.get('old', False):
+            totals['current_counts'][overall_status] += sign
+        if 'skip_blocker' in test_data:
+            totals['blocker_skip_count'] += sign
+        if 'skip_provider' in test_data:
+            totals['provider_skip_count'] += sign
+        for qacontact in test_data['qa_contact']:
+            totals['qa'][qacontact[0]] = totals['qa'].get(qacontact[0], 0) + sign
+            if not totals['qa'][qacontact[0]]:
+                del totals['qa'][qacontact[0]]
+        self.build_dict(test_data['name'].replace('cfme/', ''), totals['tree'], test_data, sign)
+
+    def render_test(self, test_data):
+        """Render the tree item and the report panel of a test into its data"""
+        pretty_time = str(datetime.timedelta(seconds=math.ceil(test_data.get('duration', 0))))
+        test_data['fragment'] = self.build_test_li(test_data, pretty_time)
+        panel_data = dict(test_data, duration=pretty_time) if 'duration' in test_data else test_data
+        test_data['panel'] = self.template_env.get_template('test_report_test.html').render(
+            test=panel_data)
+
     def process_data(self, artifacts, log_dir, version, name_filter=None):
-        tb_errors = []
-        blocker_skip_count = 0
-        provider_skip_count = 0
-        template_data = {'tests': [], 'qa': []}
-        template_data['version'] = version
+        """Build the template data of a report
+
+        Finished tests in ``artifacts`` which were not added yet are added with
+        :py:meth:`add_test`, tests still in progress are processed for this report only. All the
+        finished tests are in the report, also those not in ``artifacts``.
+        """
+        template_data = {'version': version, 'top10': self.top10([])}
+        running = []
+        for test_name, test in artifacts.iteritems():
+            if not test.get('statuses', None) or test_name in self.finished_tests:
+                continue
+            if test.get('finish_time', None):
+                self.add_test(test_name, test, log_dir)
+            else:
+                test_data = self.process_test(test_name, test, log_dir)
+                self.render_test(test_data)
+                running.append(test_data)
+        tests = self.finished_tests.values() + running
+
+        if name_filter:
+            tests = [x for x in tests if re.findall('{}[-\]]+'.format(name_filter), x['name'])]
+            totals = {'counts': dict(self.finished_totals['counts']),
+                      'current_counts': dict(self.finished_totals['current_counts']),
+                      'blocker_skip_count': 0, 'provider_skip_count': 0, 'qa': {},
+                      'tree': self.new_tree()}
+            for test_data in tests:
+                self.build_dict(test_data['name'].replace('cfme/', ''), totals['tree'],
+                    test_data)
+        else:
+            totals = self.finished_totals
+            for test_data in running:
+                self.count_test(totals, test_data, 1)
+        try:
+            template_data['ndata'] = self.build_li(totals['tree'])
+            template_data['counts'] = dict(totals['counts'])
+            template_data['current_counts'] = dict(totals['current_counts'])
+            template_data['blocker_skip_count'] = totals['blocker_skip_count']
+            template_data['provider_skip_count'] = totals['provider_skip_count']
+            template_data['qa'] = sorted(totals['qa'])
+        finally:
+            if not name_filter:
+                for test_data in running:
+                    self.count_test(totals, test_data, -1)
+        template_data['tests'] = tests
+        return template_data
+
+    def process_test(self, test_name, test, log_dir):
+        """Build the template data of a single test from its artifacts"""
         log_dir = local(log_dir).strpath + "/"
-        counts = {
-            'passed': 0,
-            'failed': 0,
-            'skipped': 0,
-            'error': 0,
-            'xfailed': 0,
-            'xpassed': 0}
-        current_counts = {
-            'passed': 0,
-            'failed': 0,
-            'skipped': 0,
-            'error': 0,
-            'xfailed': 0,
-            'xpassed': 0}
         colors = {
             'passed': 'success',
             'failed': 'warning',
@@ -123,117 +231,81 @@ class ReporterBase(object):
             'xpassed': 'danger',
             'xfailed': 'success',
             'skipped': 'info'}
-        # Iterate through the tests and process the counts and durations
-        for test_name, test in artifacts.iteritems():
-            if not test.get('statuses', None):
-                continue
-            overall_status = overall_test_status(test['statuses'])
-            counts[overall_status] += 1
-            if not test.get('old', False):
-                current_counts[overall_status] += 1
-            color = colors[overall_status]
-            # This was removed previously but is needed as the overall is not generated
-            # until the test finishes. So this is here as a shim.
-            test['statuses']['overall'] = overall_status
-            test_data = {'name': test_name, 'outcomes': test['statuses'],
-                         'slaveid': test.get('slaveid', "Unknown"), 'color': color}
-            if 'composite' in test:
-                test_data['composite'] = test['composite']
-
-            if 'skipped' in test:
-                if test['skipped'].get('type', None) == 'provider':
-                    provider_skip_count += 1
-                    test_data['skip_provider'] = test['skipped'].get('reason', None)
-                if test['skipped'].get('type', None) == 'blocker':
-                    blocker_skip_count += 1
-                    test_data['skip_blocker'] = test['skipped'].get('reason', None)
-
-            if 'skip_blocker' in test_data:
-                # Fix the inconveniently long list of repeated blockers until we sort out sets
-                # in riggerlib somehow.
-                test_data['skip_blocker'] = sorted(set(test_data['skip_blocker']))
-
-            if test.get('old', False):
-                test_data['old'] = True
-
-            if test.get('start_time', None):
-                if test.get('finish_time', None):
-                    test_data['in_progress'] = False
-                    test_data['duration'] = test['finish_time'] - test['start_time']
-                else:
-                    test_data['duration'] = time.time() - test['start_time']
-                    test_data['in_progress'] = True
-
-            # Set up destinations for the files
-            test_data["file_groups"] = []
-            test_data['qa_contact'] = []
-            processed_groups = {}
-            order = 0
-            for file_dict in test.get('files', []):
-                group = file_dict["group_id"]
-                if group not in processed_groups:
-                    processed_groups[group] = (order, [])
-                    order += 1
-                processed_groups[group][-1].append(file_dict)
-            # Current structure:
-            # {groupid: (group_order, [{filedict1}, {filedict2}])}
-            # Sorting by group_order
-            processed_groups = sorted(processed_groups.iteritems(), key=lambda kv: kv[1][0])
-            # And now make it [(groupid, [{filedict1}, {filedict2}, ...])]
-            processed_groups = [(group_name, files) for group_name, (_, files) in processed_groups]
-            for group_name, file_dicts in processed_groups:
-                group_file_list = []
-                for file_dict in file_dicts:
-                    if file_dict["file_type"] == "qa_contact":
-                        with open(file_dict["os_filename"], 'rb') as qafile:
-                            qareader = csv.reader(qafile, delimiter=',', quotechar='"')
-                            for qacontact in qareader:
-                                test_data['qa_contact'].append(qacontact)
-                                if qacontact[0] not in template_data['qa']:
-                                    template_data['qa'].append(qacontact[0])
-                        continue  # Do not store, handled a different way :)
-                    elif file_dict["file_type"] == "short_tb":
-                        with open(file_dict["os_filename"], 'r') as short_tb:
-                            test_data["short_tb"] = short_tb.read()
-                        continue
-                    file_dict["filename"] = file_dict["os_filename"].replace(log_dir, "")
-                    group_file_list.append(file_dict)
-
-                test_data["file_groups"].append((group_name, group_file_list))
-            # Snd remove groups that are left empty because of eg. traceback or qa contact
-            test_data["file_groups"] = filter(
-                lambda group: len(group[1]) > 0, test_data["file_groups"])
-            if "short_tb" in test_data and test_data["short_tb"]:
-                urls = [url for url in URL.findall(test_data["short_tb"])]
-                if urls:
-                    test_data["urls"] = urls
-            template_data['tests'].append(test_data)
-        template_data['top10'] = self.top10(tb_errors)
-        template_data['counts'] = counts
-        template_data['current_counts'] = current_counts
-        template_data['blocker_skip_count'] = blocker_skip_count
-        template_data['provider_skip_count'] = provider_skip_count
-
-        if name_filter:
-            template_data['tests'] = [x for x in template_data['tests']
-                                      if re.findall('{}[-\]]+'.format(name_filter), x['name'])]
-
-        # Create the tree dict that is used for js tree
-        # Note template_data['tests'] != tests
-        tests = deepcopy(_tests_tpl)
-        tests['_sub']['tests'] = deepcopy(_tests_tpl)
-
-        for test in template_data['tests']:
-            self.build_dict(test['name'].replace('cfme/', ''), tests, test)
-
-        template_data['ndata'] = self.build_li(tests)
-
-        for test in template_data['tests']:
-            if test.get('duration', None):
-                test['duration'] = str(datetime.timedelta(
-                    seconds=math.ceil(test['duration'])))
-
-        return template_data
+        # This was removed previously but is needed as the overall is not generated
+        # until the test finishes. So this is here as a shim.
+        overall_status = overall_test_status(test['statuses'])
+        test_data = {'name': test_name,
+                     'outcomes': dict(test['statuses'], overall=overall_status),
+                     'slaveid': test.get('slaveid', "Unknown"), 'color': colors[overall_status]}
+        if 'composite' in test:
+            test_data['composite'] = test['composite']
+
+        if 'skipped' in test:
+            if test['skipped'].get('type', None) == 'provider':
+                test_data['skip_provider'] = test['skipped'].get('reason', None)
+            if test['skipped'].get('type', None) == 'blocker':
+                test_data['skip_blocker'] = test['skipped'].get('reason', None)
+
+        if 'skip_blocker' in test_data:
+            # Fix the inconveniently long list of repeated blockers until we sort out sets
+            # in riggerlib somehow.
+            test_data['skip_blocker'] = sorted(set(test_data['skip_blocker']))
+
+        if test.get('old', False):
+            test_data['old'] = True
+
+        if test.get('start_time', None):
+            if test.get('finish_time', None):
+                test_data['in_progress'] = False
+                test_data['duration'] = test['finish_time'] - test['start_time']
+            else:
+                test_data['duration'] = time.time() - test['start_time']
+                test_data['in_progress'] = True
+
+        # Set up destinations for the files
+        test_data["file_groups"] = []
+        test_data['qa_contact'] = []
+        processed_groups = {}
+        order = 0
+        for file_dict in test.get('files', []):
+            group = file_dict["group_id"]
+            if group not in processed_groups:
+                processed_groups[group] = (order, [])
+                order += 1
+            processed_groups[group][-1].append(file_dict)
+        # Current structure:
+        # {groupid: (group_order, [{filedict1}, {filedict2}])}
+        # Sorting by group_order
+        processed_groups = sorted(processed_groups.iteritems(), key=lambda kv: kv[1][0])
+        # And now make it [(groupid, [{filedict1}, {filedict2}, ...])]
+        processed_groups = [(group_name, files) for group_name, (_, files) in processed_groups]
+        for group_name, file_dicts in processed_groups:
+            group_file_list = []
+            for file_dict in file_dicts:
+                if file_dict["file_type"] == "qa_contact":
+                    with open(file_dict["os_filename"], 'rb') as qafile:
+                        qareader = csv.reader(qafile, delimiter=',', quotechar='"')
+                        for qacontact in qareader:
+                            test_data['qa_contact'].append(qacontact)
+                    continue  # Do not store, handled a different way :)
+                elif file_dict["file_type"] == "short_tb":
+                    with open(file_dict["os_filename"], 'r') as short_tb:
+                        test_data["short_tb"] = short_tb.read()
+                    continue
+                # Copied, so that the test's artifacts are not changed
+                file_dict = dict(file_dict, filename=file_dict["os_filename"].replace(log_dir, ""))
+                group_file_list.append(file_dict)
+
+            test_data["file_groups"].append((group_name, group_file_list))
+        # Snd remove groups that are left empty because of eg. traceback or qa contact
+        test_data["file_groups"] = filter(
+            lambda group: len(group[1]) > 0, test_data["file_groups"])
+        if "short_tb" in test_data and test_data["short_tb"]:
+            urls = [url for url in URL.findall(test_data["short_tb"])]
+            if urls:
+                test_data["urls"] = urls
+
+        return test_data
 
     def top10(self, tb_errors):
         sets = []
@@ -249,10 +321,18 @@ class ReporterBase(object):
 
         return sorted(sets, lambda p, q: cmp(len(p), len(q)), reverse=True)[:10]
 
-    def build_dict(self, path, container, contents):
+    @staticmethod
+    def new_tree():
+        """An empty tree for :py:meth:`build_dict`"""
+        # Create the tree dict that is used for js tree
+        tests = deepcopy(_tests_tpl)
+        tests['_sub']['tests'] = deepcopy(_tests_tpl)
+        return tests
+
+    def build_dict(self, path, container, contents, sign=1):
         """
         Build a hierarchical dictionary including information about the stats at each level
-        and the duration.
+        and the duration. With ``sign`` -1 the test is removed from it again.
         """
 
         if isinstance(path, basestring):
@@ -265,44 +345,46 @@ class ReporterBase(object):
 
         # If we are at the end node, ie a test.
         if not end:
-            container['_sub'][head] = contents
-            container['_stats'][contents['outcomes']['overall']] += 1
-            container['_duration'] += contents['duration']
+            if sign > 0:
+                container['_sub'][head] = contents
+            else:
+                container['_sub'].pop(head, None)
         # If we are in a module.
         else:
             if head not in container['_sub']:
                 container['_sub'][head] = deepcopy(_tests_tpl)
             # Call again to recurse down the tree.
-            self.build_dict(end, container['_sub'][head], contents)
-            container['_stats'][contents['outcomes']['overall']] += 1
-            container['_duration'] += contents['duration']
+            self.build_dict(end, container['_sub'][head], contents, sign)
+            if not any(container['_sub'][head]['_stats'].values()):
+                del container['_sub'][head]
+        container['_stats'][contents['outcomes']['overall']] += sign
+        container['_duration'] += sign * contents.get('duration', 0)
+
+    def build_test_li(self, test_data, pretty_time):
+        """Build the HTML tree item of a test"""
+        overall_status = test_data['outcomes']['overall']
+        teststring = '<span name="mod_lev" class="label label-primary">T</span>'
+        label = '<span class="label label-{}">{}</span>'.format(
+            _label_colors[overall_status], overall_status.upper())
+        proc_name = process_pytest_path(test_data['name'])[-1]
+        link = (
+            '<a href="#{}">{} {} {} <span style="color:#888888"><em>[{}]</em>'
+            '</span></a>'.format(test_data['name'], proc_name, teststring, label, pretty_time))
+        # Do we really need the os.path.split (now process_pytest_path) here?
+        # For me it seems the name is always the leaf
+        return '<li>{}</li>\n'.format(link)
 
     def build_li(self, lev):
         """
-        Build up the actual HTML tree from the dict from build_dict
+        Build up the actual HTML tree from the dict from build_dict, joining the tree items the
+        tests were rendered with
         """
-        bimdict = {'passed': 'success',
-                   'failed': 'warning',
-                   'error': 'danger',
-                   'skipped': 'primary',
-                   'xpassed': 'danger',
-                   'xfailed': 'success'}
         list_string = '<ul>\n'
         for k, v in lev['_sub'].iteritems():
 
             # If 'name' is an attribute then we are looking at a test (leaf).
             if 'name' in v:
-                pretty_time = str(datetime.timedelta(seconds=math.ceil(v['duration'])))
-                teststring = '<span name="mod_lev" class="label label-primary">T</span>'
-                label = '<span class="label label-{}">{}</span>'.format(
-                    bimdict[v['outcomes']['overall']], v['outcomes']['overall'].upper())
-                proc_name = process_pytest_path(v['name'])[-1]
-                link = (
-                    '<a href="#{}">{} {} {} <span style="color:#888888"><em>[{}]</em></span></a>'
-                    .format(v['name'], proc_name, teststring, label, pretty_time))
-                # Do we really need the os.path.split (now process_pytest_path) here?
-                # For me it seems the name is always the leaf
-                list_string += '<li>{}</li>\n'.format(link)
+                list_string += v['fragment']
 
             # If there is a '_sub' attribute then we know we have other modules to go.
             elif '_sub' in v:
@@ -322,7 +404,7 @@ class ReporterBase(object):
                     else:
                         level = 'error'
                     percenstring = '<span name="blab" class="label label-{}">{}%</span>'.format(
-                        bimdict[level], percen)
+                        _label_colors[level], percen)
                 modstring = '<span name="mod_lev" class="label label-primary">M</span>'
                 pretty_time = str(datetime.timedelta(seconds=math.ceil(v['_duration'])))
                 list_string += ('<li>{} {}<span>&nbsp;</span>'
@@ -339,9 +421,8 @@ class ReporterBase(object):
 class Reporter(ArtifactorBasePlugin, ReporterBase):
     def plugin_initialize(self):
         self.register_plugin_hook('report_test', self.report_test)
-        self.register_plugin_hook('finish_session', self.run_report)
-        self.register_plugin_hook('finish_session', self.run_provider_report)
-        self.register_plugin_hook('build_report', self.run_report)
+        self.register_plugin_hook('finish_session', self.finish_session)
+        self.register_plugin_hook('build_report', self.build_report)
         self.register_plugin_hook('start_test', self.start_test)
         self.register_plugin_hook('skip_test', self.skip_test)
         self.register_plugin_hook('finish_test', self.finish_test)
@@ -350,10 +431,17 @@ class Reporter(ArtifactorBasePlugin, ReporterBase):
 
     def configure(self):
         self.only_failed = self.data.get('only_failed', False)
+        self.report_interval = self.data.get('report_interval', 5)
+        self.last_report = 0
+        # names of the tests started, but not added with add_test yet
+        self.running_tests = set()
         self.configured = True
 
     @ArtifactorBasePlugin.check_configured
-    def composite_pump(self, old_artifacts):
+    def composite_pump(self, old_artifacts, artifact_dir):
+        for test_name, test in old_artifacts.iteritems():
+            if test.get('statuses', None):
+                self.add_test(test_name, test, artifact_dir)
         return None, {'old_artifacts': old_artifacts}
 
     @ArtifactorBasePlugin.check_configured
@@ -366,6 +454,7 @@ class Reporter(ArtifactorBasePlugin, ReporterBase):
         if not param_dict:
             param_dict = {}
         test_ident = "{}/{}".format(test_location, test_name)
+        self.running_tests.add(test_ident)
         return None, {'artifacts': {test_ident: {
             'start_time': time.time(), 'slaveid': slaveid, 'tier': tier or "N/A",
             'params': param_dict}}
@@ -381,8 +470,17 @@ class Reporter(ArtifactorBasePlugin, ReporterBase):
         }}}
 
     @ArtifactorBasePlugin.check_configured
-    def report_test(self, artifacts, test_location, test_name, test_xfail, test_when, test_outcome):
+    def report_test(self, artifacts, test_location, test_name, test_xfail, test_when, test_outcome,
+            artifact_dir):
         test_ident = "{}/{}".format(test_location, test_name)
+        if test_when == 'teardown' and test_ident in artifacts:
+            # The teardown is reported last, after finish_test, so the test is complete now
+            test = artifacts[test_ident]
+            self.add_test(test_ident, dict(
+                test, finish_time=test.get('finish_time', None) or time.time(),
+                statuses=dict(test.get('statuses', {}), teardown=(test_outcome, test_xfail))),
+                artifact_dir)
+            self.running_tests.discard(test_ident)
         return None, {'artifacts': {test_ident: {'statuses': {
             test_when: (test_outcome, test_xfail)}}}}
 
@@ -390,9 +488,27 @@ class Reporter(ArtifactorBasePlugin, ReporterBase):
     def session_info(self, version=None, build=None, stream=None):
         return None, {'build': build, 'stream': stream, 'version': version}
 
+    @ArtifactorBasePlugin.check_configured
+    def build_report(self, old_artifacts, artifact_dir, version=None):
+        # Reported after every test phase, so only rewrite the report every few seconds;
+        # finish_session always writes the final one. The finished tests were added by
+        # report_test, so only the running ones are processed here.
+        if time.time() - self.last_report >= self.report_interval:
+            self.run_report(
+                {test_name: old_artifacts[test_name] for test_name in self.running_tests
+                 if test_name in old_artifacts},
+                artifact_dir, version)
+
     @ArtifactorBasePlugin.check_configured
     def run_report(self, old_artifacts, artifact_dir, version=None):
         self._run_report(old_artifacts, artifact_dir, version)
+        self.last_report = time.time()
+
+    @ArtifactorBasePlugin.check_configured
+    def finish_session(self, old_artifacts, artifact_dir, version=None):
+        # A plugin has one callback per hook, so both reports are run from here
+        self.run_report(old_artifacts, artifact_dir, version)
+        self.run_provider_report(old_artifacts, artifact_dir, version)
 
     @ArtifactorBasePlugin.check_configured
     def run_provider_report(self, old_artifacts, artifact_dir, version=None):
@@ -1,12 +1,16 @@
 from mgmtsystem.ec2 import EC2System
 from . import CloudProvider
 import cfme.fixtures.pytest_selenium as sel
+from utils import deferred_verpick, version
 
 
 @CloudProvider.add_provider_type
 class EC2Provider(CloudProvider):
     type_name = "ec2"
     mgmt_class = EC2System
+    db_type = deferred_verpick({
+        version.LOWEST: 'EmsAmazon',
+        '5.5': 'ManageIQ::Providers::Amazon::CloudManager'})
 
     def __init__(self, name=None, credentials=None, zone=None, key=None, region=None):
         super(EC2Provider, self).__init__(name=name, credentials=credentials,
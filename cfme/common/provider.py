@@ -51,6 +51,18 @@ class BaseProvider(Taggable, Updateable, SummaryMixin, Navigatable):
     _properties_region = None
     add_provider_button = None
     save_button = None
+    #: Class of the provider in the appliance, providers which have it can be created via REST
+    db_type = None
+    # provider attribute -> REST API field, for the attributes a provider type has
+    _rest_fields = [
+        ('hostname', 'hostname'),
+        ('ip_address', 'ipaddress'),
+        ('api_port', 'port'),
+        ('port', 'port'),
+        ('region', 'provider_region'),
+    ]
+    # credentials key -> REST API auth_type
+    _rest_auth_types = {'candu': 'metrics', 'token': 'bearer'}
 
     @classmethod
     def add_base_type(cls, nclass):
@@ -167,16 +179,19 @@ class BaseProvider(Taggable, Updateable, SummaryMixin, Navigatable):
             raise ProviderHasNoKey(
                 'Provider {} has no key, so cannot get yaml data'.format(self.name))
 
-    def get_mgmt_system(self):
+    def get_mgmt_system(self, cached=True):
         """ Returns the mgmt_system using the :py:func:`utils.providers.get_mgmt` method.
+
+        Args:
+            cached: Whether to reuse the cached client, see :py:func:`utils.providers.get_mgmt`
         """
         # gotta stash this in here to prevent circular imports
         from utils.providers import get_mgmt
 
         if self.key:
-            return get_mgmt(self.key)
+            return get_mgmt(self.key, cached=cached)
         elif getattr(self, 'provider_data', None):
-            return get_mgmt(self.provider_data)
+            return get_mgmt(self.provider_data, cached=cached)
         else:
             raise ProviderHasNoKey(
                 'Provider {} has no key, so cannot get mgmt system'.format(self.name))
@@ -209,6 +224,30 @@ class BaseProvider(Taggable, Updateable, SummaryMixin, Navigatable):
             flash.assert_message_match('{} Providers "{}" was saved'.format(self.string_name,
                                                                             self.name))
 
+    def rest_data(self):
+        """The data to create this provider with through the REST API
+
+        The provider lands in the default zone, the credentials are not validated.
+        """
+        if self.db_type is None:
+            raise NotImplementedError(
+                'Provider {} can not be created through the REST API'.format(self.name))
+        data = {'type': self.db_type, 'name': self.name}
+        for attr, field in self._rest_fields:
+            value = getattr(self, attr, None)
+            if value:
+                data[field] = value
+        credentials = []
+        for cred_key, cred in self.credentials.items():
+            auth_type = self._rest_auth_types.get(cred_key, cred_key)
+            if getattr(cred, 'type', None) == 'token':
+                credentials.append({'auth_type': auth_type, 'auth_key': cred.token})
+            else:
+                credentials.append(
+                    {'auth_type': auth_type, 'userid': cred.principal, 'password': cred.secret})
+        data['credentials'] = credentials
+        return data
+
     def update(self, updates, cancel=False, validate_credentials=True):
         """
         Updates a provider in the UI.  Better to use utils.update.update context
@@ -289,7 +328,8 @@ class BaseProvider(Taggable, Updateable, SummaryMixin, Navigatable):
         if the match is not complete within a certain defined time period.
         """
 
-        client = self.get_mgmt_system()
+        # a session of our own, it is disconnected at the end
+        client = self.get_mgmt_system(cached=False)
 
         # If we're not using db, make sure we are on the provider detail page
         if ui:
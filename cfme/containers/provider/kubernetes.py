@@ -6,6 +6,7 @@ from mgmtsystem.kubernetes import Kubernetes
 class KubernetesProvider(ContainersProvider):
     type_name = "kubernetes"
     mgmt_class = Kubernetes
+    db_type = 'ManageIQ::Providers::Kubernetes::ContainerManager'
 
     def __init__(self, name=None, credentials=None, key=None,
                  zone=None, hostname=None, port=None, provider_data=None):
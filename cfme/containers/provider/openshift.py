@@ -8,6 +8,7 @@ class OpenshiftProvider(ContainersProvider):
     STATS_TO_MATCH = ContainersProvider.STATS_TO_MATCH + ['num_route']
     type_name = "openshift"
     mgmt_class = Openshift
+    db_type = 'ManageIQ::Providers::Openshift::ContainerManager'
 
     def __init__(self, name=None, credentials=None, key=None,
                  zone=None, hostname=None, port=None, provider_data=None):
@@ -1,5 +1,6 @@
 from mgmtsystem.rhevm import RHEVMSystem
 from . import InfraProvider, prop_region
+from utils import deferred_verpick, version
 
 
 @InfraProvider.add_provider_type
@@ -7,6 +8,9 @@ class RHEVMProvider(InfraProvider):
     _properties_region = prop_region
     type_name = "rhevm"
     mgmt_class = RHEVMSystem
+    db_type = deferred_verpick({
+        version.LOWEST: 'EmsRedhat',
+        '5.5': 'ManageIQ::Providers::Redhat::InfraManager'})
 
     def __init__(self, name=None, credentials=None, zone=None, key=None, hostname=None,
                  ip_address=None, api_port=None, start_ip=None, end_ip=None,
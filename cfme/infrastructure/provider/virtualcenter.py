@@ -1,11 +1,15 @@
 from mgmtsystem.virtualcenter import VMWareSystem
 from . import InfraProvider
+from utils import deferred_verpick, version
 
 
 @InfraProvider.add_provider_type
 class VMwareProvider(InfraProvider):
     type_name = "virtualcenter"
     mgmt_class = VMWareSystem
+    db_type = deferred_verpick({
+        version.LOWEST: 'EmsVmware',
+        '5.5': 'ManageIQ::Providers::Vmware::InfraManager'})
 
     def __init__(self, name=None, credentials=None, key=None, zone=None, hostname=None,
                  ip_address=None, start_ip=None, end_ip=None, provider_data=None):
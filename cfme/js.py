@@ -223,3 +223,50 @@ function find_leaf(root, path, by_id) {
 """)
 
 # TODO: Get the url: directly from the attribute in the page?
+
+# Reads a whole table in one call, see :py:meth:`cfme.web_ui.Table.read_rows`
+# Expects: arguments[0] = header root element, arguments[1] = XPath of the header cells,
+# arguments[2] = body root element, arguments[3] = XPath of the rows,
+# arguments[4] = options ({hrefs: bool, checkboxes: bool, keep_whitespace: bool}), whitespace in
+# the cell texts is collapsed to single spaces unless keep_whitespace is set
+read_table = jsmin("""\
+function xpathNodes(xpath, root) {
+    var result = document.evaluate(
+        xpath, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var nodes = [];
+    for (var i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+    return nodes;
+}
+
+function text(el) {
+    var content = (el.innerText === undefined) ? el.textContent : el.innerText;
+    if (options.keep_whitespace) return content.trim();
+    return content.replace(/\\s+/g, " ").trim();
+}
+
+function firstNode(xpath, root) {
+    var nodes = xpathNodes(xpath, root);
+    return nodes.length ? nodes[0] : null;
+}
+
+var options = arguments[4] || {};
+var headers = xpathNodes(arguments[1], arguments[0]).map(text);
+var rows = xpathNodes(arguments[3], arguments[2]).map(function(row) {
+    var cells = xpathNodes("./td", row);
+    var data = {element: row, cells: cells.map(text)};
+    if (options.hrefs) {
+        data.hrefs = cells.map(function(cell) {
+            var link = firstNode(".//a[@href]", cell);
+            return link === null ? null : link.getAttribute("href");
+        });
+    }
+    if (options.checkboxes) {
+        data.checked = cells.map(function(cell) {
+            var checkbox = firstNode(".//input[@type='checkbox']", cell);
+            return checkbox === null ? null : checkbox.checked;
+        });
+    }
+    return data;
+});
+return {headers: headers, rows: rows};
+""")
@@ -17,6 +17,8 @@ from cfme.web_ui import InfoBlock, DriftGrid, toolbar
 from fixtures.pytest_store import store
 from utils import testgen, ssh, safe_string, version, error
 from utils.conf import cfme_data
+from utils.db import cfmedb
+from utils.db_queries import get_sorted_position
 from utils.log import logger
 from utils.wait import wait_for
 from utils.blockers import GH, BZ
@@ -486,6 +488,20 @@ def test_ssa_vm(provider, instance, soft_assert):
                     "image: '{}' != '{}'".format(c_image, instance.image))
 
 
+def detail_position(instance, table_name, name, vm_column='vm_or_template_id', **filters):
+    """Position of a row in a list of the instance details, so that the list is not paged through
+
+    Returns ``None`` if it is not known, see :py:func:`utils.db_queries.get_sorted_position`
+    """
+    db = cfmedb()
+    vms = db['vms']
+    vm = db.session.query(vms.id).filter(vms.name == instance.name).first()
+    if vm is None:
+        return None
+    filters[vm_column] = vm.id
+    return get_sorted_position(table_name, name, db=db, **filters)
+
+
 @pytest.mark.long_running
 def test_ssa_users(provider, instance, soft_assert):
     """ Tests SSA fetches correct results for users list
@@ -515,7 +531,8 @@ def test_ssa_users(provider, instance, soft_assert):
     # Make sure created user is in the list
     instance.open_details(("Security", "Users"))
     if instance.system_type != WINDOWS:
-        if not instance.paged_table.find_row_on_all_pages('Name', username):
+        position = detail_position(instance, 'accounts', username, accttype='user')
+        if not instance.paged_table.has_row('Name', username, position):
             pytest.fail("User {0} was not found".format(username))
 
 
@@ -546,7 +563,8 @@ def test_ssa_groups(provider, instance, soft_assert):
     # Make sure created group is in the list
     instance.open_details(("Security", "Groups"))
     if instance.system_type != WINDOWS:
-        if not instance.paged_table.find_row_on_all_pages('Name', group):
+        position = detail_position(instance, 'accounts', group, accttype='group')
+        if not instance.paged_table.has_row('Name', group, position):
             pytest.fail("Group {0} was not found".format(group))
 
 
@@ -585,7 +603,8 @@ def test_ssa_packages(provider, instance, soft_assert):
 
     # Make sure new package is listed
     instance.open_details(("Configuration", "Packages"))
-    if not instance.paged_table.find_row_on_all_pages('Name', package_name):
+    position = detail_position(instance, 'guest_applications', package_name)
+    if not instance.paged_table.has_row('Name', package_name, position):
         pytest.fail("Package {0} was not found".format(package_name))
 
 
@@ -605,7 +624,9 @@ def test_ssa_files(provider, instance, policy_profile, soft_assert):
     assert current != '0', "No files were scanned"
 
     instance.open_details(("Configuration", "Files"))
-    if not instance.paged_table.find_row_on_all_pages('Name', ssa_expect_file):
+    position = detail_position(instance, 'filesystems', ssa_expect_file,
+        vm_column='resource_id', resource_type='VmOrTemplate')
+    if not instance.paged_table.has_row('Name', ssa_expect_file, position):
         pytest.fail("File {0} was not found".format(ssa_expect_file))
 
 
@@ -67,6 +67,7 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.remote.file_detector import LocalFileDetector
 from multimethods import multimethod, multidispatch, Anything
 from widgetastic.xpath import quote
+from widgetastic_patternfly import BootstrapTreeview as PFBootstrapTreeview
 
 import cfme.fixtures.pytest_selenium as sel
 from cfme import exceptions, js
@@ -311,6 +312,12 @@ class Table(Pretty):
     the ``*_by_cells`` methods are able to find matching row much more quickly than iterating,
     as the work can be done with fewer selenium calls.
 
+    To only read the table, :py:meth:`read_rows` gets the texts of all the cells with a single
+    selenium call::
+
+        for row in table.read_rows():
+            row.name, row['Animal'], row[2]
+
         * :py:meth:`find_rows_by_cells`
         * :py:meth:`find_row_by_cells`
         * :py:meth:`click_rows_by_cells`
@@ -421,6 +428,34 @@ class Table(Pretty):
                 # but no data.
                 return
 
+    def read_rows(self, hrefs=False, checkboxes=False):
+        """Read the texts of all the rows in one JavaScript call
+
+        Args:
+            hrefs: Whether to read the target of the first link in every cell too
+            checkboxes: Whether to read the state of the checkbox in every cell too
+
+        Returns: A list of :py:class:`Table.RowData`, one for every row :py:meth:`rows` yields
+        """
+        try:
+            header_row, body = self.header_row, self.body
+        except (exceptions.CannotScrollException, NoSuchElementException):
+            if self.hidden_locator is None or not sel.is_displayed(self.hidden_locator):
+                raise
+            # The table is not present but there is something that signalizes it is all right
+            return []
+        data = sel.execute_script(
+            js.read_table, header_row, './td | ./th',
+            body, './tr[position() > {}]'.format(self.body_offset),
+            {'hrefs': hrefs, 'checkboxes': checkboxes})
+        header_indexes = {
+            attributize_string(header): index for index, header in enumerate(data['headers'])}
+        return [
+            Table.RowData(
+                self, header_indexes, row['element'], row['cells'], row.get('hrefs'),
+                row.get('checked'))
+            for row in data['rows']]
+
     def find_row(self, header, value):
         """
         Finds a row in the Table by iterating through each visible item.
@@ -475,35 +510,9 @@ class Table(Pretty):
         """
         # accept dicts or supertuples
         cells = dict(cells)
-        cell_text_loc = (
-            './/td/descendant-or-self::*[contains(normalize-space(text()), "{}")]/ancestor::tr[1]')
-        matching_rows_list = list()
-        for value in cells.values():
-            # Get all td elements that contain the value text
-            matching_elements = sel.elements(cell_text_loc.format(value),
-                root=sel.move_to_element(self._root_loc))
-            if matching_elements:
-                matching_rows_list.append(set(matching_elements))
-
-        # Now, find the common row elements that matched all the input cells
-        # (though not yet matching values to headers)
-        if not matching_rows_list:
-            # If none matched, short out
-            return []
-
-        rows_elements = list(reduce(lambda set1, set2: set1 & set2, matching_rows_list))
 
-        # Convert them to rows
-        # This is slow, which is why we do it after reducing the row element pile,
-        # and not when building matching_rows_list, but it makes comparing header
-        # names and expected values easy
-        rows = [self.create_row_from_element(element) for element in rows_elements]
-
-        # Only include rows where the expected values are in the right columns
-        matching_rows = list()
-
-        def matching_row_filter(heading, value):
-            text = normalize_space(row[heading].text)
+        def matching_row_filter(row_data, heading, value):
+            text = normalize_space(row_data[heading])
             if isinstance(value, re._pattern_type):
                 return value.match(text) is not None
             elif partial_check:
@@ -511,11 +520,11 @@ class Table(Pretty):
             else:
                 return text == value
 
-        for row in rows:
-            if all(matching_row_filter(*cell) for cell in cells.items()):
-                matching_rows.append(row)
-
-        return matching_rows
+        # The whole table is read in one go and matched here, only the matching rows are
+        # turned into Rows with the live row elements
+        return [
+            row_data.row for row_data in self.read_rows()
+            if all(matching_row_filter(row_data, *cell) for cell in cells.items())]
 
     def find_row_by_cells(self, cells, partial_check=False):
         """Find the first row containing cells
@@ -703,6 +712,69 @@ class Table(Pretty):
             # table.create_row_from_element(row_instance) might actually work...
             return sel.move_to_element(self.row_element)
 
+    class RowData(Pretty):
+        """The texts of a row read by :py:meth:`Table.read_rows`
+
+        The cells are accessed like with :py:class:`Table.Row`, by header name or index, but give
+        the normalized text of the cell, without talking to the browser again.
+
+        Args:
+            parent_table: :py:class:`Table` the row was read from
+            header_indexes: A dict of header names related to their int index as a column
+            row_element: The row ``WebElement``, still live for clicking
+            cells: List of the cell texts
+            hrefs: List of the first link target in every cell, if they were read
+            checked: List of the checkbox state in every cell, if they were read
+
+        """
+        pretty_attrs = ['cells', 'table']
+
+        def __init__(self, parent_table, header_indexes, row_element, cells, hrefs=None,
+                     checked=None):
+            self.table = parent_table
+            self.header_indexes = header_indexes
+            self.row_element = row_element
+            self.cells = cells
+            self.hrefs = hrefs
+            self.checked = checked
+
+        @property
+        def row(self):
+            """The :py:class:`Table.Row` of the live row element, for clicking and such"""
+            return self.table.create_row_from_element(self.row_element)
+
+        def column_index(self, header):
+            """Column index of the header name or index"""
+            if isinstance(header, int):
+                return header
+            try:
+                return self.header_indexes[attributize_string(header)]
+            except KeyError:
+                # Suspected shared table use
+                self.table.verify_headers()
+                # If it did not fail at that time, reraise
+                raise
+
+        def __getattr__(self, name):
+            """
+            Returns the cell text by header name
+            """
+            if name.startswith('_'):
+                raise AttributeError(name)
+            return self[name]
+
+        def __getitem__(self, index):
+            """
+            Returns the cell text by header index or name
+            """
+            return self.cells[self.column_index(index)]
+
+        def __str__(self):
+            return ", ".join(["'{}'".format(text) for text in self.cells])
+
+        def locate(self):
+            return sel.move_to_element(self.row_element)
+
 
 class CAndUGroupTable(Table):
     """Type of tables used in C&U, not tested in others.
@@ -1183,6 +1255,34 @@ class PagedTable(Table):
             if row is not None:
                 return row
 
+    def has_row(self, header, value, position=None):
+        """Find out if a row is on any of the pages, with as few page loads as possible
+
+        When the position of the row in the whole list is known (e.g. from
+        :py:func:`utils.db_queries.get_sorted_position`), only the page with it is looked at. The
+        results per page are set so that the row is on the first page if it would not be there
+        already, and they are set back afterwards, as the appliance saves them as a user setting.
+        If the row is not at the position, the pages are walked one by one.
+
+        Args:
+            header: See :py:meth:`Table.find_row`
+            value: See :py:meth:`Table.find_row`
+            position: 0-based index of the row in the whole list, if known
+
+        Returns: ``True`` if the row was found, ``False`` otherwise
+        """
+        from cfme.web_ui import paginator
+        if position is not None and paginator.page_controls_exist():
+            try:
+                with paginator.fitted_results(position + 1) as fitted:
+                    if fitted:
+                        sel.wait_for_element(self)
+                        if self.find_row(header, value) is not None:
+                            return True
+            except (exceptions.PaginatorException, NoSuchElementException, ValueError):
+                pass
+        return self.find_row_on_all_pages(header, value) is not None
+
 
 class SplitPagedTable(SplitTable, PagedTable):
     """:py:class:`SplitTable` with support for paginator
@@ -1709,9 +1809,7 @@ class BootstrapTreeview(object):
             image_node = sel.element('./span[contains(@class, "node-image")]', root=item)
         except NoSuchElementException:
             return None
-        style = sel.get_attribute(image_node, 'style')
-        image_href = re.search(r'url\("([^"]+)"\)', style).groups()[0]
-        return re.search(r'/([^/]+)-[0-9a-f]+\.png$', image_href).groups()[0]
+        return PFBootstrapTreeview.image_from_style(sel.get_attribute(image_node, 'style'))
 
     def locate(self):
         return '#{}'.format(self.tree_id)
@@ -1944,36 +2042,37 @@ class BootstrapTreeview(object):
         sel.click(node)
         return node
 
+    def dump_items(self):
+        """Read all the rendered items of the tree in one JavaScript call
+
+        See :py:meth:`widgetastic_patternfly.BootstrapTreeview.dump_items`
+        """
+        return sel.execute_script(PFBootstrapTreeview.DUMP_ITEMS, sel.element(self))
+
+    def click_arrows(self, nodeids):
+        """Click the expand/collapse arrows of the nodes in one JavaScript call"""
+        logger.trace('Clicking %d node arrows on tree %s', len(nodeids), self.tree_id)
+        sel.execute_script(PFBootstrapTreeview.CLICK_ARROWS, sel.element(self), nodeids)
+
     def read_contents(self, nodeid=None, include_images=False, collapse_after_read=False):
+        """Reads the contents of the tree (or of the node) into a structure of strings and lists
+
+        The tree is expanded level by level and read with one JavaScript call, instead of
+        visiting every node, see :py:meth:`widgetastic_patternfly.BootstrapTreeview.expand_items`
+        """
         if nodeid is not None:
-            item = self.get_item_by_nodeid(nodeid)
-            self.expand_node(nodeid)
-        else:
-            item = None
-        result = []
-
-        for child_item in self.child_items(item):
-            result.append(
-                self.read_contents(
-                    nodeid=self.get_nodeid(child_item),
-                    include_images=include_images,
-                    collapse_after_read=collapse_after_read))
-
-        if collapse_after_read and nodeid is not None:
-            self.collapse_node(nodeid)
-
-        if include_images and item is not None:
-            this_item = (self.image_getter(item), sel.text(item))
-        elif item is not None:
-            this_item = sel.text(item)
-        else:
-            this_item = None
-        if result and this_item is not None:
-            return [this_item, result]
-        elif result:
-            return result
+            # Fails the same way as before when there is no such node
+            self.get_item_by_nodeid(nodeid)
+        items = PFBootstrapTreeview.expand_items(self.dump_items, self.click_arrows, nodeid)
+        result = PFBootstrapTreeview.nest_items(items, include_images=include_images)
+
+        if collapse_after_read:
+            PFBootstrapTreeview.collapse_items(self.dump_items, self.click_arrows, items)
+
+        if nodeid is not None:
+            return result[0]
         else:
-            return this_item
+            return result or None
 
     def check_uncheck_node(self, check, *path, **kwargs):
         leaf = self.expand_path(*path, **kwargs)
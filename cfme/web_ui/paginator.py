@@ -2,6 +2,7 @@
 from cfme.web_ui import Select, Input, AngularSelect
 import cfme.fixtures.pytest_selenium as sel
 import re
+from contextlib import contextmanager
 from selenium.common.exceptions import NoSuchElementException
 from functools import partial
 from utils import version
@@ -17,6 +18,8 @@ _num_results = '//select[@id="ppsetting" or @id="perpage_setting1"]'
 _sort_by = '//select[@id="sort_choice"]'
 _page_cell = '//td//td[contains(., " of ")]|//li//span[contains(., " of ")]'
 _check_all = Input("masterToggle")
+# The choices of the results per page select
+_per_page_choices = (5, 10, 20, 50, 100, 200, 500, 1000)
 
 _prefix = r"(?:Items?|Rows?|Showing)?\s*"
 _regexp = r"{}(?P<first>\d+)-?(?P<last>\d+)? of (?P<total>\d+)\s*(?:items?)?".format(_prefix)
@@ -73,16 +76,63 @@ def last():
     return btn
 
 
+def _results_per_page_select():
+    return version.pick({
+        version.LOWEST: Select(_locator() + _num_results),
+        "5.5": AngularSelect('ppsetting')})
+
+
 def results_per_page(num):
     """ Changes the number of results on a page.
 
     Args:
         num: Number of results per page
     """
-    _select = version.pick({
-        version.LOWEST: Select(_locator() + _num_results),
-        "5.5": AngularSelect('ppsetting')})
-    sel.select(_select, sel.ByText(str(num)))
+    sel.select(_results_per_page_select(), sel.ByText(str(num)))
+
+
+def current_results_per_page():
+    """ Returns the number of results on a page, as set in the select."""
+    return int(_results_per_page_select().first_selected_option_text.strip())
+
+
+def fit_results(count):
+    """Set the smallest number of results per page that shows ``count`` results on the first page
+
+    Args:
+        count: Number of results which should fit on the first page
+    Returns: ``True`` if the results per page were set, ``False`` if ``count`` is too big
+    """
+    for num in _per_page_choices:
+        if num >= count:
+            results_per_page(num)
+            return True
+    return False
+
+
+@contextmanager
+def fitted_results(count):
+    """Context manager showing at least ``count`` results on the first page
+
+    The results per page are only changed if there are less of them than ``count``, and they are
+    set back on exit, as the appliance saves them as a user setting.
+
+    Args:
+        count: Number of results which should fit on the first page
+    Yields: ``True`` if the first page shows the results, ``False`` if ``count`` is too big
+    """
+    per_page = current_results_per_page()
+    if count <= per_page:
+        reset()
+        yield True
+    elif fit_results(count):
+        try:
+            reset()
+            yield True
+        finally:
+            results_per_page(per_page)
+    else:
+        yield False
 
 
 def sort_by(sort):
@@ -179,6 +179,7 @@ pytest_plugins = (
     'fixtures.qa_contact',
     'fixtures.randomness',
     'fixtures.rbac',
+    'fixtures.result_history',
     'fixtures.screenshots',
     'fixtures.snmp',
     'fixtures.soft_assert',
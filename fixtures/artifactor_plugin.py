@@ -27,6 +27,7 @@ import pytest
 from artifactor import ArtifactorClient
 from fixtures.pytest_store import write_line, store
 from utils.conf import env, credentials
+from utils.log import logger
 from utils.net import random_port, net_check
 from utils.path import project_path
 from utils.wait import wait_for
@@ -148,6 +149,8 @@ def pytest_runtest_protocol(item):
     except:
         param_dict = {}
 
+    # Messages logged so far belong to the previous test
+    logger.flush_artifactor()
     # This pre_start_test hook is needed so that filedump is able to make get the test
     # object set up before the logger starts logging. As the logger fires a nested hook
     # to the filedumper, and we can't specify order inriggerlib.
@@ -161,6 +164,8 @@ def pytest_runtest_protocol(item):
 
 def pytest_runtest_teardown(item, nextitem):
     name, location = get_test_idents(item)
+    # Make sure the test's log is complete before it's finished
+    logger.flush_artifactor()
     art_client.fire_hook('finish_test', test_location=location, test_name=name,
                          slaveid=SLAVEID, ip=appliance_ip_address, grab_result=True)
     art_client.fire_hook('sanitize', test_location=location, test_name=name, words=words)
@@ -194,6 +199,7 @@ def pytest_runtest_logreport(report):
 def pytest_unconfigure():
     global proc
     yield
+    logger.flush_artifactor()
     if not SLAVEID:
         write_line('collecting artifacts')
         art_client.fire_hook('finish_session')
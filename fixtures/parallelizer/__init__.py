@@ -9,6 +9,9 @@ The Workflow
   - py.test config.option.appliances and the related --appliance cmdline flag are used
     if env['parallel_base_urls'] isn't set
   - if neither are set, no parallelization happens
+  - with ``--use-sprout``, the appliances are requested from Sprout; with ``--sprout-incremental``
+    the slaves start as soon as the first appliance is ready, and a slave is added for each
+    appliance that becomes ready later
 
 - Slaves are started
 - Master runs collection, blocks until slaves report their collections
@@ -18,7 +21,8 @@ The Workflow
   across all nodes
 - Master enters main runtest loop, uses a generator to build lists of test groups which are then
   sent to slaves, one group at a time
-- For each phase of each test, the slave serializes test reports, which are then unserialized on
+- For each phase of each test, the slave serializes test reports and posts them to the master
+  in batches without waiting for a reply; they are then unserialized on
   the master and handed to the normal pytest reporting hooks, which is able to deal with test
   reports arriving out of order
 - Before running the last test in a group, the slave will request more tests from the master
@@ -29,6 +33,20 @@ The Workflow
 - After all slaves are shut down, the master will do its end-of-session reporting as usual, and
   shut down
 
+Scheduling
+----------
+
+By default, test groups are sent in collection order (``--parallel-scheduler modscope``).
+
+With ``--parallel-scheduler duration``, the master uses the test durations of previous runs in
+the result history (see :py:mod:`fixtures.parallelizer.durations`) to send the longest test
+groups first.
+Groups are sent to a slave in chunks of roughly ``DURATION_CHUNK_SECONDS``, with the rest of the
+group reserved for that slave. Once all groups are handed out, a slave asking for tests steals
+the second half of the largest reservation held by another slave, so slaves finish together
+instead of waiting on whichever slave drew the last long module. Only the tests for providers
+the slave already has, or which fit under ``APPLIANCE_NUM_LIMIT``, are stolen.
+
 """
 
 import collections
@@ -38,6 +56,7 @@ import json
 import os
 import re
 import signal
+import sqlite3
 import subprocess
 from collections import OrderedDict, defaultdict, deque, namedtuple
 from datetime import datetime
@@ -53,12 +72,16 @@ from functools32 import wraps
 
 from fixtures import terminalreporter
 from fixtures.parallelizer import remote
+from fixtures.parallelizer.durations import DurationHistory, SlaveReservations
+from fixtures.parallelizer.pool import ProviderGroupPool, allocate_provider, group_provider
 from fixtures.pytest_store import store
+from fixtures.result_history import result_ident
 from utils import at_exit, conf
 from utils.appliance import IPAppliance, stack as appliance_stack
 from utils.log import create_sublogger
 from utils.net import random_port
 from utils.path import conf_path, project_path
+from utils.result_history import ResultHistory
 from utils.sprout import SproutClient, SproutException
 from utils.wait import wait_for
 
@@ -74,6 +97,15 @@ if env_base_urls:
 # slaves will set this to a unique string when they're initialized
 conf.runtime['env']['slaveid'] = None
 
+# estimated seconds of tests in a chunk sent by the duration scheduler
+DURATION_CHUNK_SECONDS = 300
+
+# how many providers a slave's appliance can have before it is cleansed for another provider
+APPLIANCE_NUM_LIMIT = 2
+
+# how often to check the Sprout pool for newly ready appliances in incremental mode
+SPROUT_POLL_INTERVAL = 15
+
 # lock for protecting mutation of recv queue
 recv_lock = Lock()
 # lock for protecting zmq socket access
@@ -104,6 +136,13 @@ def pytest_addoption(parser):
         '--sprout-date', dest='sprout_date', default=None, help="Which date to use.")
     group._addoption(
         '--sprout-desc', dest='sprout_desc', default=None, help="Set description of the pool.")
+    group._addoption('--sprout-incremental', dest='sprout_incremental', action='store_true',
+        default=False, help="Start testing as soon as the first Sprout appliance is ready, "
+        "adding a slave for every other appliance as it becomes ready.")
+    group._addoption('--parallel-scheduler', dest='parallel_scheduler',
+        choices=('modscope', 'duration'), default='modscope',
+        help="How to order test groups sent to slaves: in collection order (modscope), "
+        "or longest-first based on previous runs' durations in the result history (duration).")
 
 
 def pytest_addhooks(pluginmanager):
@@ -135,6 +174,11 @@ def dump_pool_info(printf, pool_data):
             printf("\t\t{}: {}".format(key, appliance[key]))
 
 
+def sprout_appliance_ready(appliance):
+    """Whether an appliance from a Sprout pool is ready to have a slave started for it"""
+    return bool(appliance["ready"] and appliance["ip_address"])
+
+
 def handle_end_session(signal, frame):
     # when signaled, end the current test session immediately
     if store.parallel_session:
@@ -199,21 +243,29 @@ class ParallelSession(object):
         self.slaves = SlaveDict()
         self.slave_urls = SlaveDict()
         self.slave_tests = defaultdict(set)
+        # loaded from the result history once the tests are collected
+        self.durations = DurationHistory(ResultHistory(config.getvalue('result_history')))
+        self.schedule_by_duration = config.getvalue('parallel_scheduler') == 'duration'
+        # tests from groups handed to a slave by the duration scheduler, but not yet sent to it
+        self.slave_reserved = SlaveReservations(self.durations, DURATION_CHUNK_SECONDS)
         self.test_groups = self._test_item_generator()
 
-        self._pool = []
+        # built from self.test_groups when collection is done
+        self._pool = None
         self.pool_lock = Lock()
         from utils.conf import cfme_data
         self.provs = sorted(set(cfme_data['management_systems'].keys()),
                             key=len, reverse=True)
         self.slave_allocation = collections.defaultdict(list)
-        self.used_prov = set()
 
         self.failed_slave_test_groups = deque()
         self.slave_spawn_count = 0
         self.sprout_client = None
         self.sprout_timer = None
         self.sprout_pool = None
+        # appliances ready in the Sprout pool after the slaves were started, see sprout_poll_pool
+        self.sprout_ready_appliances = deque()
+        sprout_poller = None
         if not self.config.option.use_sprout:
             # Without Sprout
             self.appliances = self.config.option.appliances
@@ -273,6 +325,8 @@ class ParallelSession(object):
                     now=datetime.now(),
                     progress=result['progress']
                 ))
+                if self.config.option.sprout_incremental:
+                    return any(map(sprout_appliance_ready, result["appliances"]))
                 return result["fulfilled"]
             try:
                 result = wait_for(
@@ -292,6 +346,13 @@ class ParallelSession(object):
                 dump_pool_info(self.println, pool)
             self.println("Provisioning took {0:.1f} seconds".format(result.duration))
             request = self.sprout_client.request_check(self.sprout_pool)
+            if not request["fulfilled"]:
+                # incremental mode, start with the appliances which are ready now,
+                # and poll the pool for the rest once the slaves are running
+                request["appliances"] = filter(sprout_appliance_ready, request["appliances"])
+                sprout_poller = Thread(target=self.sprout_poll_pool,
+                    args=(set(a["ip_address"] for a in request["appliances"]),))
+                sprout_poller.daemon = True
             self.appliances = []
             # Push an appliance to the stack to have proper reference for test collection
             # FIXME: this is a bad hack based on the need for controll of collection partitioning
@@ -354,10 +415,15 @@ class ParallelSession(object):
         recv_queuer.daemon = True
         recv_queuer.start()
 
+        if sprout_poller is not None:
+            self.println("Waiting for the rest of the pool in the background.")
+            sprout_poller.start()
+
     def _slave_audit(self):
-        # XXX: There is currently no mechanism to add or remove slave_urls, short of
-        #      firing up the debugger and doing it manually. This is making room for
-        #      planned future abilities to dynamically add and remove slaves via automation
+        # XXX: slave_urls are only added automatically by incremental sprout pools, there is
+        #      no mechanism to remove them short of firing up the debugger and doing it manually.
+        #      This is making room for planned future abilities to dynamically add and remove
+        #      slaves via automation
 
         # check for unexpected slave shutdowns and redistribute tests
         for slaveid, slave in self.slaves.items():
@@ -375,8 +441,15 @@ class ParallelSession(object):
                     msg += ' and redistributing {} tests'.format(num_failed_tests)
                     with SlaveDict.lock:
                         self.failed_slave_test_groups.append(self.slave_tests.pop(slaveid))
+                if slaveid in self.slave_reserved:
+                    with SlaveDict.lock:
+                        self.failed_slave_test_groups.append(self.slave_reserved.release(slaveid))
                 self.print_message(msg, purple=True)
 
+        # Add slaves for appliances which became ready in the sprout pool
+        while self.sprout_ready_appliances:
+            self._add_sprout_appliance(self.sprout_ready_appliances.popleft())
+
         # Make sure we have a slave for every slave_url
         for slaveid in list(self.slave_urls):
             if slaveid not in self.slaves:
@@ -389,6 +462,22 @@ class ParallelSession(object):
                 self.print_message("{}'s appliance has died, deactivating slave".format(slaveid))
                 self.interrupt(slaveid)
 
+    def _add_sprout_appliance(self, appliance):
+        if self._pool is not None and not self._pool and not self.failed_slave_test_groups:
+            self.print_message('{} is ready, but all tests were already sent'.format(
+                appliance['name']))
+            return
+        # slaves read their appliance data from the slave config when they start
+        self.slave_appliances_data[appliance["ip_address"]] = (
+            appliance["template_name"], appliance["provider"])
+        conf.runtime['slave_config']["appliance_data"] = self.slave_appliances_data
+        conf.save('slave_config')
+        url = "https://{}/".format(appliance["ip_address"])
+        self.appliances.append(url)
+        self.slave_urls.add(url)
+        self.print_message('{} is ready, using appliance {}'.format(appliance['name'], url),
+            green=True)
+
     def _start_slave(self, slaveid):
         devnull = open(os.devnull, 'w')
         try:
@@ -447,6 +536,37 @@ class ParallelSession(object):
         finally:
             self._reset_timer(timeout=timeout)
 
+    def sprout_poll_pool(self, known_ips):
+        """Queue appliances as they become ready in the Sprout pool, until it's fulfilled
+
+        Runs in a thread in incremental mode, the queued appliances get their slaves
+        started by :py:meth:`_slave_audit` in the runtest loop.
+
+        """
+        deadline = time() + self.config.option.sprout_provision_timeout * 60
+        while not self.session_finished:
+            if time() > deadline:
+                self.print_message('sprout pool was not fulfilled in time, '
+                    'continuing with {} appliances'.format(len(known_ips)), yellow=True)
+                return
+            sleep(SPROUT_POLL_INTERVAL)
+            try:
+                request = self.sprout_client.request_check(self.sprout_pool)
+            except SproutException as e:
+                self.print_message('sprout pool check failed, no more appliances will be added: '
+                    '{}'.format(e), red=True)
+                return
+            except Exception as e:
+                self.log.error('An unexpected error happened during interaction with Sprout:')
+                self.log.exception(e)
+                continue
+            for appliance in request["appliances"]:
+                if sprout_appliance_ready(appliance) and appliance["ip_address"] not in known_ips:
+                    known_ips.add(appliance["ip_address"])
+                    self.sprout_ready_appliances.append(appliance)
+            if request["fulfilled"]:
+                return
+
     def send(self, slaveid, event_data):
         """Send data to slave.
 
@@ -566,13 +686,22 @@ class ParallelSession(object):
             with SlaveDict.lock:
                 tests = list(self.failed_slave_test_groups.popleft())
         except IndexError:
-            try:
-                tests = self.get(slaveid)
-                # To return to the old parallelizer distributor, remove the line above
-                # and replace it with the line below.
-                # tests = self.test_groups.next()
-            except StopIteration:
-                tests = []
+            if self.schedule_by_duration and slaveid in self.slave_reserved:
+                tests = self.slave_reserved.chunk(slaveid)
+            else:
+                try:
+                    tests = self.get(slaveid)
+                    # To return to the old parallelizer distributor, remove the line above
+                    # and replace it with the line below.
+                    # tests = self.test_groups.next()
+                except StopIteration:
+                    tests = []
+                if self.schedule_by_duration:
+                    if not tests:
+                        self._steal_reserved(slaveid)
+                    else:
+                        self.slave_reserved.reserve(slaveid, tests)
+                    tests = self.slave_reserved.chunk(slaveid)
 
         self.send(slaveid, tests)
         self.slave_tests[slaveid] |= set(tests)
@@ -586,6 +715,21 @@ class ParallelSession(object):
             ))
         return tests
 
+    def _steal_reserved(self, slaveid):
+        # take tests reserved for another slave, but only the ones this slave's appliance can run
+        # without being cleansed of its providers, recording any provider added to it
+        with self.pool_lock:
+            allocation = self.slave_allocation[slaveid]
+
+            def can_take(test):
+                return allocate_provider(
+                    allocation, group_provider([test], self.provs), APPLIANCE_NUM_LIMIT)
+
+            victim, num_stolen = self.slave_reserved.steal(slaveid, can_take)
+        if victim is not None:
+            self.print_message(
+                'took {} reserved tests from {}'.format(num_stolen, victim), slaveid)
+
     def pytest_sessionstart(self, session):
         """pytest sessionstart hook
 
@@ -617,6 +761,12 @@ class ParallelSession(object):
         # Build master collection for slave diffing and distribution
         for item in self.session.items:
             self.collection[item.nodeid] = item
+            self.durations.idents[item.nodeid] = result_ident(item)
+        if self.schedule_by_duration:
+            self._load_durations()
+        # Index the test groups by provider for the allocator in get
+        with self.pool_lock:
+            self._pool = ProviderGroupPool(self.test_groups, self.provs)
 
         # Fire up the workers after master collection is complete
         # master and the first slave share an appliance, this is a workaround to prevent a slave
@@ -662,11 +812,9 @@ class ParallelSession(object):
                     self.send_tests(slaveid)
                     self.log.info('starting master test distribution')
                 elif event_name == 'runtest_logstart':
-                    self.ack(slaveid, event_name)
                     self.trdist.runtest_logstart(slaveid,
                         event_data['nodeid'], event_data['location'])
                 elif event_name == 'runtest_logreport':
-                    self.ack(slaveid, event_name)
                     report = unserialize_report(event_data['report'])
                     if report.when in ('call', 'teardown'):
                         self.slave_tests[slaveid].discard(report.nodeid)
@@ -698,8 +846,35 @@ class ParallelSession(object):
         # Suppress other runtestloop calls
         return True
 
+    def _load_durations(self):
+        try:
+            self.durations.stream = store.current_appliance.version.stream()
+        except Exception as ex:
+            self.log.warning('Unable to get the appliance stream, estimating the tests by '
+                'their durations on all streams: {}'.format(ex))
+        try:
+            self.durations.load()
+        except sqlite3.Error as ex:
+            self.log.error('Unable to load test durations: {}'.format(ex))
+        finally:
+            self.durations.history.close()
+        self.log.info('loaded the durations of {} tests'.format(len(self.durations.durations)))
+
     def _test_item_generator(self):
-        for tests in self._modscope_item_generator():
+        if self.schedule_by_duration:
+            generator = self._duration_item_generator()
+        else:
+            generator = self._modscope_item_generator()
+        for tests in generator:
+            yield tests
+
+    def _duration_item_generator(self):
+        # the same groups as the modscope generator, longest estimated duration first
+        test_groups = sorted(self._modscope_item_generator(),
+            key=self.durations.group_estimate, reverse=True)
+        for tests in test_groups:
+            self.log.info('sending tests with estimated duration {:.1f}s'.format(
+                self.durations.group_estimate(tests)))
             yield tests
 
     def _modscope_item_generator(self):
@@ -760,111 +935,37 @@ class ParallelSession(object):
             yield tests
 
     def get(self, slave):
+        """Take the next test group for a slave from the pool, keeping provider affinity
+
+        - a slave with fewer than ``APPLIANCE_NUM_LIMIT`` providers gets the next group,
+          adding that group's provider to the slave
+        - a slave at the limit gets the next group for one of its providers, or with no provider
+        - if only groups for other providers are left, the slave's appliance is cleansed of
+          providers, and it gets the next group
+
+        """
         with self.pool_lock:
-            if not self._pool:
-                for test_group in self.test_groups:
-                    self._pool.append(test_group)
-                    for test in test_group:
-                        if '[' in test:
-                            found_prov = []
-                            for pv in self.provs:
-                                if pv in test:
-                                    found_prov.append(pv)
-                                    break
-                            provs = list(set(found_prov).intersection(self.provs))
-                            if provs:
-                                self.used_prov = self.used_prov.union(set(provs))
-                if self.used_prov:
-                    self.ratio = float(len(self.slaves)) / float(len(self.used_prov))
-                else:
-                    self.ratio = 0.0
             if not self._pool:
                 raise StopIteration
-            current_allocate = self.slave_allocation.get(slave, None)
-            # num_provs_list = [len(v) for k, v in self.slave_allocation.iteritems()]
-            # average_num_provs = sum(num_provs_list) / float(len(self.slaves))
-            appliance_num_limit = 2
-            for test_group in self._pool:
-                for test in test_group:
-                    # If the test is parametrized...
-                    if '[' in test:
-                        found_prov = []
-                        for pv in self.provs:
-                            if pv in test:
-                                found_prov.append(pv)
-                                break
-                        # The line below can probably be removed now, since we compare
-                        # providers in the loop above with self.provs, which is a list
-                        # of all providers.
-                        provs = list(set(found_prov).intersection(self.provs))
-                        # If the parametrization contains a provider...
-                        if provs:
-                            prov = provs[0]
-                            # num_slave_with_prov = len([sl for sl, provs_list
-                            #    in self.slave_allocation.iteritems()
-                            #    if prov in provs_list])
-                            # If this slave/appliance already has providers then...
-                            if current_allocate:
-                                # If the slave has _our_ provider
-                                if prov in current_allocate:
-                                    # provider is already with the slave, so just return the tests
-                                    self._pool.remove(test_group)
-                                    return test_group
-                                # If the slave doesn't have _our_ provider
-                                else:
-                                    # Check to see how many slaves there are with this provider
-                                    if len(self.slave_allocation[slave]) >= appliance_num_limit:
-                                        continue
-                                    else:
-                                        # Adding provider to slave since there are not too many
-                                        self.slave_allocation[slave].append(prov)
-                                        self._pool.remove(test_group)
-                                        return test_group
-                            # If this slave doesn't have any providers...
-                            else:
-                                # Adding provider to slave
-                                self.slave_allocation[slave].append(prov)
-                                self._pool.remove(test_group)
-                                return test_group
-                        else:
-                            # No providers - ie, not a provider parametrized test
-                            self._pool.remove(test_group)
-                            return test_group
-                    else:
-                        # No params, so no need to think about providers
-                        self._pool.remove(test_group)
-                        return test_group
-                # Here means no tests were able to be sent
-            for test_group in self._pool:
-                for test in test_group:
-                    # If the test is parametrized...
-                    if '[' in test:
-                        found_prov = []
-                        for pv in self.provs:
-                            if pv in test:
-                                found_prov.append(pv)
-                                break
-                        # The line below can probably be removed now, since we compare
-                        # providers in the loop above with self.provs, which is a list
-                        # of all providers.
-                        provs = list(set(found_prov).intersection(self.provs))
-                        # If the parametrization contains a provider...
-                        if provs:
-                            # Already too many slaves with provider
-                            app_url = self.slave_urls[slave]
-                            app_ip = urlparse(app_url).netloc
-                            app = IPAppliance(app_ip)
-                            self.print_message('cleansing appliance', slave,
-                                purple=True)
-                            try:
-                                app.delete_all_providers()
-                            except:
-                                self.print_message('cloud not cleanse', slave,
-                                red=True)
-                            self.slave_allocation[slave] = [prov]
-                            self._pool.remove(test_group)
-                            return test_group
-            return []
+            allocation = self.slave_allocation[slave]
+            order, prov = self._pool.first_allowed(allocation, APPLIANCE_NUM_LIMIT)
+            if order is None:
+                # Already too many providers on this slave's appliance
+                order, prov = self._pool.first()
+                app_url = self.slave_urls[slave]
+                app_ip = urlparse(app_url).netloc
+                app = IPAppliance(app_ip)
+                self.print_message('cleansing appliance', slave,
+                    purple=True)
+                try:
+                    app.delete_all_providers()
+                except:
+                    self.print_message('cloud not cleanse', slave,
+                    red=True)
+                self.slave_allocation[slave] = allocation = []
+            if prov is not None and prov not in allocation:
+                allocation.append(prov)
+            return self._pool.take(order)
 
 
 def report_collection_diff(slaveid, from_collection, to_collection):
@@ -904,16 +1005,21 @@ def _recv_queue(session):
         except zmq.Again:
             continue
         event_data = json.loads(event_json)
-        event_name = event_data.pop('_event_name')
-
-        if event_name == 'message':
-            message = event_data.pop('message')
-            # messages are special, handle them immediately
-            session.print_message(message, slaveid, **event_data)
-            session.ack(slaveid, event_name)
+        if event_data['_event_name'] == 'batch':
+            # notifications posted by the slave, unpacked in the order they were posted
+            events = event_data['events']
         else:
-            with recv_lock:
-                session._recv_queue.append((slaveid, event_data, event_name))
+            events = [event_data]
+
+        for event_data in events:
+            event_name = event_data.pop('_event_name')
+            if event_name == 'message':
+                message = event_data.pop('message')
+                # messages are special, handle them immediately
+                session.print_message(message, slaveid, **event_data)
+            else:
+                with recv_lock:
+                    session._recv_queue.append((slaveid, event_data, event_name))
 
 
 class TerminalDistReporter(object):
@@ -0,0 +1,129 @@
+"""Test duration estimates for the parallelizer
+
+The durations come from the local result history (see :py:mod:`utils.result_history`). The
+master gets the reports of all the slaves, so the durations of every parallelized run are
+recorded there by :py:mod:`fixtures.result_history` when the session finishes, together with the
+outcomes. Tests are estimated by their average duration on the stream of the appliances, or on
+any stream if they never ran on it.
+
+The estimates are used by the ``duration`` parallel scheduler to hand out test groups
+longest-first, and to decide how large the chunks of a group sent to a slave should be
+(see :py:class:`SlaveReservations`).
+
+"""
+from collections import defaultdict, deque
+
+
+class DurationHistory(object):
+    """Per-nodeid test duration estimates, loaded from a result history
+
+    Args:
+        history: :py:class:`utils.result_history.ResultHistory` to load the durations from
+        stream: Stream of the appliances the tests run against, ``None`` to only use the
+            durations of all the streams
+
+    """
+    #: duration estimate used for every test when the history is empty
+    fallback_duration = 1.0
+
+    def __init__(self, history, stream=None):
+        self.history = history
+        self.stream = stream
+        # nodeid -> ident of the test in the result history, nodeids not in here are used as is
+        self.idents = {}
+        # ident -> duration
+        self.durations = {}
+        self._default_duration = None
+
+    def load(self):
+        """Load the durations from the result history"""
+        durations = self.history.durations()
+        if self.stream is not None:
+            durations.update(self.history.durations(self.stream))
+        self.durations = durations
+        self._default_duration = None
+
+    @property
+    def default_duration(self):
+        """Estimate for tests with no history, the mean of all known durations"""
+        if self._default_duration is None:
+            if self.durations:
+                self._default_duration = sum(self.durations.values()) / len(self.durations)
+            else:
+                self._default_duration = self.fallback_duration
+        return self._default_duration
+
+    def estimate(self, nodeid):
+        """Estimated duration of a single test"""
+        return self.durations.get(self.idents.get(nodeid, nodeid), self.default_duration)
+
+    def group_estimate(self, tests):
+        """Estimated duration of a group of tests"""
+        return sum(self.estimate(nodeid) for nodeid in tests)
+
+
+class SlaveReservations(object):
+    """Tests of the groups handed to each slave by the duration scheduler, not yet sent to it
+
+    Args:
+        history: :py:class:`DurationHistory` to estimate the tests with
+        chunk_seconds: Estimated duration of the tests sent to a slave at once
+
+    """
+    def __init__(self, history, chunk_seconds):
+        self.history = history
+        self.chunk_seconds = chunk_seconds
+        self._reserved = defaultdict(deque)
+
+    def __contains__(self, slaveid):
+        return bool(self._reserved.get(slaveid))
+
+    def reserve(self, slaveid, tests):
+        """Reserve tests for a slave, after the tests it already has reserved"""
+        self._reserved[slaveid].extend(tests)
+
+    def release(self, slaveid):
+        """Remove all the tests reserved for a slave and return them"""
+        return list(self._reserved.pop(slaveid, []))
+
+    def chunk(self, slaveid):
+        """Take reserved tests from the front of a slave's reservation until they add up to
+        ``chunk_seconds``"""
+        reserved = self._reserved[slaveid]
+        tests = []
+        chunk_duration = 0
+        while reserved and chunk_duration < self.chunk_seconds:
+            test = reserved.popleft()
+            tests.append(test)
+            chunk_duration += self.history.estimate(test)
+        return tests
+
+    def steal(self, slaveid, can_take):
+        """Move tests from the second half of the largest reservation held by another slave
+
+        Args:
+            slaveid: Slave to move the tests to
+            can_take: Called with every test of the second half, only the tests it returns
+                ``True`` for are moved, the others stay reserved for their slave. If no test of
+                the largest reservation can be moved, the next largest one is tried.
+
+        Returns: A ``(victim slaveid, number of moved tests)`` tuple, ``(None, 0)`` if no tests
+            were moved.
+
+        """
+        victims = sorted(
+            ((self.history.group_estimate(reserved), victim)
+                for victim, reserved in self._reserved.items()
+                if victim != slaveid and reserved),
+            reverse=True)
+        for estimate, victim in victims:
+            reserved = list(self._reserved[victim])
+            half = len(reserved) // 2
+            stolen, kept = [], []
+            for test in reserved[half:]:
+                (stolen if can_take(test) else kept).append(test)
+            if stolen:
+                self._reserved[victim] = deque(reserved[:half] + kept)
+                self._reserved[slaveid].extend(stolen)
+                return victim, len(stolen)
+        return None, 0
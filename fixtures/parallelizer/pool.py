@@ -0,0 +1,124 @@
+"""Provider-indexed pool of test groups for the parallelizer master
+
+Test groups are indexed once, when the pool is built after collection, by the provider their
+tests are parametrized with. The pool keeps the order the groups were generated in, so the
+master can ask for the first remaining group overall, or the first remaining group for a small
+set of providers, without rescanning every test in the pool on each request.
+
+"""
+from collections import OrderedDict, defaultdict
+
+
+def group_provider(test_group, providers):
+    """Get the provider key a test group is parametrized with, or None
+
+    The provider is looked up in the first test of the group. ``providers`` should be sorted
+    longest-first, so that a provider key which is a substring of another one isn't
+    matched instead of the longer key.
+
+    """
+    test = test_group[0]
+    if '[' not in test:
+        # No params, so no need to think about providers
+        return None
+    for provider in providers:
+        if provider in test:
+            return provider
+    return None
+
+
+def allocate_provider(allocation, provider, limit):
+    """Check if a slave can run tests for a provider, adding the provider to its allocation
+
+    Args:
+        allocation: List of the providers on the slave's appliance, a provider that fits is
+            appended to it
+        provider: Provider of the tests, ``None`` for tests without a provider
+        limit: How many providers the appliance may have
+
+    Returns: ``True`` if the provider is already on the appliance or was added, ``False`` if the
+        appliance would have to be cleansed of its providers first
+
+    """
+    if provider is None or provider in allocation:
+        return True
+    elif len(allocation) < limit:
+        allocation.append(provider)
+        return True
+    return False
+
+
+class ProviderGroupPool(object):
+    """Test groups indexed by provider, removed from the pool as they are taken
+
+    Args:
+        test_groups: Iterable of test groups (lists of test ids), in the order to send them
+        providers: Provider keys to look for in the test ids
+
+    """
+    def __init__(self, test_groups, providers):
+        providers = sorted(providers, key=len, reverse=True)
+        # pool order -> (test group, provider)
+        self._groups = OrderedDict()
+        # provider -> {pool order: test group}, None being the groups without a provider
+        self._provider_groups = defaultdict(OrderedDict)
+        self.used_providers = set()
+        for order, test_group in enumerate(test_groups):
+            provider = group_provider(test_group, providers)
+            self._groups[order] = (test_group, provider)
+            self._provider_groups[provider][order] = test_group
+            if provider is not None:
+                self.used_providers.add(provider)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def first(self, providers=None):
+        """Find the first remaining test group
+
+        Args:
+            providers: If given, only consider groups for these providers. ``None`` in this
+                list stands for the groups without a provider.
+
+        Returns: A ``(order, provider)`` tuple for the group, or ``(None, None)`` if no group
+            matched.
+
+        """
+        if providers is None:
+            for order, (test_group, provider) in self._groups.iteritems():
+                return order, provider
+            return None, None
+
+        found = None, None
+        for provider in providers:
+            provider_groups = self._provider_groups.get(provider)
+            if not provider_groups:
+                continue
+            order = next(iter(provider_groups))
+            if found[0] is None or order < found[0]:
+                found = order, provider
+        return found
+
+    def first_allowed(self, allocation, limit):
+        """Find the first remaining test group a slave can run without cleansing its appliance
+
+        Args:
+            allocation: Providers on the slave's appliance
+            limit: How many providers the appliance may have
+
+        Returns: Like :py:meth:`first`, ``(None, None)`` if only groups for other providers are
+            left and the appliance has ``limit`` providers already.
+
+        """
+        if len(allocation) < limit:
+            return self.first()
+        return self.first([None] + list(allocation))
+
+    def take(self, order):
+        """Remove a test group from the pool and return it"""
+        test_group, provider = self._groups.pop(order)
+        provider_groups = self._provider_groups[provider]
+        del provider_groups[order]
+        if not provider_groups:
+            del self._provider_groups[provider]
+        return test_group
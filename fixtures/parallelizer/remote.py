@@ -1,5 +1,7 @@
+import json
 import signal
 from collections import deque
+from time import time
 from urlparse import urlparse
 
 import zmq
@@ -7,9 +9,21 @@ from py.path import local
 
 SLAVEID = None
 
+# events are buffered by the slave, and sent to the master in one batch when this many
+# events are buffered, or when this many seconds passed since the last batch was sent
+EVENT_BATCH_SIZE = 50
+EVENT_BATCH_INTERVAL = 5
+
 
 class SlaveManager(object):
-    """SlaveManager which coordinates with the master process for parallel testing"""
+    """SlaveManager which coordinates with the master process for parallel testing
+
+    Events are either requests, sent with :py:meth:`send_event`, which wait for the master's
+    reply, or notifications, posted with :py:meth:`post_event`, which are buffered and sent
+    to the master in batches without waiting for anything. The DEALER socket keeps the events
+    in order, so buffered notifications are always flushed before a request is sent.
+
+    """
     def __init__(self, config, slaveid, base_url, zmq_endpoint):
         self.config = config
         self.session = None
@@ -21,20 +35,27 @@ class SlaveManager(object):
         # Override the logger in utils.log
 
         ctx = zmq.Context.instance()
-        self.sock = ctx.socket(zmq.REQ)
-        self.sock.set_hwm(1)
+        self.sock = ctx.socket(zmq.DEALER)
         self.sock.setsockopt_string(zmq.IDENTITY, u'{}'.format(self.slaveid))
         self.sock.connect(zmq_endpoint)
 
         self.messages = {}
+        self._event_batch = []
+        self._event_batch_sent = time()
 
         self.quit_signaled = False
 
+    def _send(self, event):
+        # the empty frame is the envelope delimiter the master's ROUTER socket expects
+        self.sock.send_multipart(['', json.dumps(event)])
+
     def send_event(self, name, **kwargs):
+        """Send a request to the master, and wait for its reply"""
+        self.flush_events()
         kwargs['_event_name'] = name
         self.log.trace("sending {} {!r}".format(name, kwargs))
-        self.sock.send_json(kwargs)
-        recv = self.sock.recv_json()
+        self._send(kwargs)
+        recv = json.loads(self.sock.recv_multipart()[-1])
         if recv == 'die':
             self.log.info('Slave instructed to die by master; shutting down')
             raise SystemExit()
@@ -43,9 +64,30 @@ class SlaveManager(object):
             if recv != 'ack':
                 return recv
 
+    def post_event(self, name, flush=False, **kwargs):
+        """Buffer a notification for the master, which doesn't reply to it
+
+        The buffer is sent when it's full, when it's older than ``EVENT_BATCH_INTERVAL``,
+        when ``flush`` is True, or before the next request.
+
+        """
+        kwargs['_event_name'] = name
+        self.log.trace("posting {} {!r}".format(name, kwargs))
+        self._event_batch.append(kwargs)
+        if (flush or len(self._event_batch) >= EVENT_BATCH_SIZE or
+                time() - self._event_batch_sent >= EVENT_BATCH_INTERVAL):
+            self.flush_events()
+
+    def flush_events(self):
+        """Send all buffered notifications to the master in one batch"""
+        if self._event_batch:
+            self._send({'_event_name': 'batch', 'events': self._event_batch})
+            self._event_batch = []
+        self._event_batch_sent = time()
+
     def message(self, message, **kwargs):
         """Send a message to the master, which should get printed to the console"""
-        self.send_event('message', message=message, **kwargs)  # message!
+        self.post_event('message', flush=True, message=message, **kwargs)  # message!
 
     def pytest_collection_finish(self, session):
         """pytest collection hook
@@ -62,18 +104,21 @@ class SlaveManager(object):
     def pytest_runtest_logstart(self, nodeid, location):
         """pytest runtest logstart hook
 
-        - sends logstart notice to the master
+        - posts logstart notice to the master
 
         """
-        self.send_event("runtest_logstart", nodeid=nodeid, location=location)
+        self.post_event("runtest_logstart", nodeid=nodeid, location=location)
 
     def pytest_runtest_logreport(self, report):
         """pytest runtest logreport hook
 
-        - sends serialized log reports to the master
+        - posts serialized log reports to the master, flushing the batch after teardown, so all
+          the events of a test are sent together once it finished; the batch is also sent when
+          it's full or too old, and before any request, like the ``shutdown`` at session finish
 
         """
-        self.send_event("runtest_logreport", report=serialize_report(report))
+        self.post_event("runtest_logreport", flush=report.when == 'teardown',
+            report=serialize_report(report))
 
     def pytest_internalerror(self, excrepr):
         """pytest internal error hook
@@ -114,6 +159,7 @@ class SlaveManager(object):
 
     def shutdown(self):
         self.message('shutting down')
+        # shutdown is a request, so every buffered event reaches the master before it's acked
         self.send_event('shutdown')
         self.quit_signaled = True
 
@@ -0,0 +1,81 @@
+"""Records the outcome and duration of every test in the local result history
+
+The results are collected from the test reports and written to the
+:py:class:`utils.result_history.ResultHistory` in one transaction when the session finishes.
+In a parallelized session only the master records them, it gets the reports of all the slaves.
+
+"""
+from fixtures.artifactor_plugin import get_test_idents
+from fixtures.pytest_store import store
+from utils.log import logger
+from utils.result_history import ResultHistory
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('cfme')
+    group.addoption('--result-history', dest='result_history', default=None,
+        help='Path to the result history database, defaults to log/result_history.sqlite')
+    group.addoption('--no-result-history', dest='no_result_history', action='store_true',
+        default=False, help="Don't record the results of this session in the result history")
+
+
+def report_outcome(report):
+    """Outcome of a single test phase, in the terms the artifactor reports use"""
+    if hasattr(report, 'wasxfail'):
+        if report.skipped:
+            return 'xfailed'
+        elif report.passed:
+            return 'xpassed'
+    if report.skipped:
+        return 'skipped'
+    elif report.failed:
+        return 'failed' if report.when == 'call' else 'error'
+    return 'passed'
+
+
+def result_ident(item):
+    """Ident of a test item or report in the result history, ``None`` if it has no location"""
+    name, location = get_test_idents(item)
+    if name is None:
+        return None
+    return "{}/{}".format(location, name)
+
+
+class ResultRecorder(object):
+    def __init__(self, history):
+        self.history = history
+        # test ident -> [outcome, duration]
+        self.results = {}
+
+    def pytest_runtest_logreport(self, report):
+        test_ident = result_ident(report)
+        if test_ident is None:
+            return
+        result = self.results.setdefault(test_ident, ['passed', 0.0])
+        result[1] += getattr(report, 'duration', 0.0) or 0.0
+        outcome = report_outcome(report)
+        # the first phase which didn't pass decides the outcome of the test
+        if result[0] == 'passed':
+            result[0] = outcome
+
+    def pytest_sessionfinish(self, session):
+        if not self.results:
+            return
+        try:
+            build = store.current_appliance.build
+            stream = store.current_appliance.version.stream()
+        except Exception as e:
+            logger.warning('Not recording the result history, unable to get the build: %r', e)
+            return
+        self.history.record(
+            ((ident, outcome, duration) for ident, (outcome, duration) in self.results.items()),
+            build, stream)
+        self.history.close()
+        logger.info('Recorded %d results in the result history', len(self.results))
+
+
+def pytest_configure(config):
+    if config.getoption('no_result_history') or store.parallelizer_role == 'slave':
+        return
+    history = ResultHistory(config.getoption('result_history'))
+    config.pluginmanager.register(ResultRecorder(history), 'result_recorder')
@@ -1,6 +1,7 @@
 from fixtures.artifactor_plugin import get_test_idents
 from fixtures.pytest_store import store
 from utils.log import logger
+from utils.result_history import ResultHistory
 from utils.trackerbot import composite_uncollect
 
 
@@ -13,6 +14,37 @@ def pytest_addoption(parser):
                      help="Overrides the default template name which is obtained from trackerbot")
 
 
+def previous_outcomes(config, build):
+    """Get the latest outcome of the tests that already ran on this build, as ``{ident: outcome}``
+
+    The previous run is fetched from trackerbot, and the master stores it in the local result
+    history so that the slaves and the following sessions don't have to fetch it again. The
+    outcomes of local runs on the build, which are more recent, take precedence over it.
+
+    """
+    history = ResultHistory(config.getoption('result_history', None))
+    try:
+        if history.has_import(build, 'trackerbot'):
+            return history.last_outcomes(build)
+
+        pl = composite_uncollect(build)
+        outcomes = {}
+        if pl and pl['tests']:
+            # Here we pump into artifactor
+            # art_client.fire_hook('composite_pump', old_artifacts=pl['tests'])
+            if store.parallelizer_role != 'slave':
+                # recorded as older than any local run, so the local outcomes win
+                history.record_report(pl['tests'], build,
+                    store.current_appliance.version.stream(), timestamp=0, source='trackerbot')
+            outcomes = {test_ident: test['statuses']['overall']
+                        for test_ident, test in pl['tests'].iteritems()
+                        if test.get('statuses', {}).get('overall')}
+        outcomes.update(history.last_outcomes(build))
+        return outcomes
+    finally:
+        history.close()
+
+
 def pytest_collection_modifyitems(session, config, items):
     if not config.getvalue('composite_uncollect'):
         return
@@ -23,26 +55,16 @@ def pytest_collection_modifyitems(session, config, items):
 
     build = store.current_appliance.build
 
-    pl = composite_uncollect(build)
-
-    if pl:
-        for test in pl['tests']:
-            pl['tests'][test]['old'] = True
+    outcomes = previous_outcomes(config, build)
 
-        # Here we pump into artifactor
-        # art_client.fire_hook('composite_pump', old_artifacts=pl['tests'])
+    if outcomes:
         for item in items:
-            try:
-                name, location = get_test_idents(item)
-                test_ident = "{}/{}".format(location, name)
-                status = pl['tests'][test_ident]['statuses']['overall']
-
-                if status == 'passed':
-                    logger.info('Uncollecting {} as it passed last time'.format(item.name))
-                    continue
-                else:
-                    new_items.append(item)
-            except:
+            name, location = get_test_idents(item)
+            test_ident = "{}/{}".format(location, name)
+            if outcomes.get(test_ident) == 'passed':
+                logger.info('Uncollecting {} as it passed last time'.format(item.name))
+                continue
+            else:
                 new_items.append(item)
 
         items[:] = new_items
@@ -5,9 +5,11 @@ import datetime
 import pytz
 import re
 import sys
+import time
 from collections import defaultdict
 from dateutil import parser
-from threading import Lock, Thread
+from multiprocessing.pool import ThreadPool
+from threading import Lock, Thread, current_thread
 from tzlocal import get_localzone
 
 from utils.log import logger
@@ -28,6 +30,10 @@ def parse_cmd_line():
         '(varies by provider, default 24)')
     parser.add_argument('--provider', dest='providers', action='append', default=None,
         help='Provider(s) to inspect, can be used multiple times', metavar='PROVIDER')
+    parser.add_argument('--workers', type=int, default=8,
+        help='Number of VMs to inspect or delete at once on each provider (default 8)')
+    parser.add_argument('--dry-run', action='store_true', default=False,
+        help='Only report the VMs which would be deleted and how long each provider took')
     parser.add_argument('text_to_match', nargs='*', default=['^test_', '^jenkins', '^i-'],
         help='Regex in the name of vm to be affected, can be use multiple times'
         ' (Defaults to "^test_" and "^jenkins")')
@@ -43,105 +49,268 @@ def match(matchers, vm_name):
         return False
 
 
-def get_vm_config_modified_time(name, vm_name, datastore_url, provider_key):
-    try:
-        providers_data = cfme_data.get("management_systems", {})
-        hosts = providers_data[provider_key]['hosts']
-        hostname = [host['name'] for host in hosts if name in host['name']]
-        if not hostname:
-            hostname = re.findall(r'[0-9]+(?:\.[0-9]+){3}', name)
-        connect_kwargs = {
-            'username': credentials['host_default']['username'],
-            'password': credentials['host_default']['password'],
-            'hostname': hostname[0]
-        }
+def thread_mgmt(provider_key, clients):
+    """Management system client of the current thread for the provider
+
+    The provider clients are not safe to share between threads, so every worker gets its own.
+    They are kept in ``clients`` by thread, to disconnect them with :py:func:`disconnect_clients`
+    once the pool is done.
+    """
+    thread_id = current_thread().ident
+    if thread_id not in clients:
+        clients[thread_id] = get_mgmt(provider_key, cached=False)
+    return clients[thread_id]
+
+
+def disconnect_clients(clients):
+    for client in clients.values():
+        try:
+            client.disconnect()
+        except Exception as e:
+            logger.warning('Failed to disconnect %s: %r', client, e)
+    clients.clear()
+
+
+def get_host_ip(name, provider_key):
+    providers_data = cfme_data.get("management_systems", {})
+    hosts = providers_data[provider_key].get('hosts', [])
+    hostname = [host['name'] for host in hosts if name in host['name']]
+    if not hostname:
+        hostname = re.findall(r'[0-9]+(?:\.[0-9]+){3}', name)
+    return hostname[0]
+
+
+def parse_modified_time(output):
+    modified_time = parser.parse(output.rstrip())
+    modified_time = modified_time.astimezone(pytz.timezone(str(get_localzone())))
+    return modified_time.replace(tzinfo=None)
+
+
+def get_vm_config_modified_times(name, vm_datastores, provider_key):
+    """Modified times of the config files of many VMs on one ESX host, over one SSH session
+
+    Args:
+        name: Name of the host
+        vm_datastores: ``{vm_name: datastore_url}``
+        provider_key: Provider the host belongs to
+
+    Returns: ``{vm_name: modified time}``, VMs without a config file are left out
+    """
+    connect_kwargs = {
+        'username': credentials['host_default']['username'],
+        'password': credentials['host_default']['password'],
+        'hostname': get_host_ip(name, provider_key)
+    }
+    commands = []
+    for vm_name, datastore_url in vm_datastores.items():
         datastore_path = re.findall(r'([^ds:`/*].*)', str(datastore_url))
-        ssh_client = SSHClient(**connect_kwargs)
-        command = 'find ~/{}/{} -name {} | xargs  date -r'.format(
-            datastore_path[0], str(vm_name), str(vm_name) + '.vmx')
-        exit_status, output = ssh_client.run_command(command)
+        commands.append(
+            'echo "{vm}\t$(find ~/{path}/{vm} -name {vm}.vmx | xargs  date -r)"'.format(
+                vm=vm_name, path=datastore_path[0]))
+    ssh_client = SSHClient(**connect_kwargs)
+    try:
+        exit_status, output = ssh_client.run_command('; '.join(commands))
+    finally:
         ssh_client.close()
-        modified_time = parser.parse(output.rstrip())
-        modified_time = modified_time.astimezone(pytz.timezone(str(get_localzone())))
-        return modified_time.replace(tzinfo=None)
-    except Exception as e:
-        logger.error(e)
-        return False
+    modified_times = {}
+    for line in output.splitlines():
+        vm_name, _, modified = line.partition('\t')
+        if vm_name not in vm_datastores or not modified.strip():
+            continue
+        try:
+            modified_times[vm_name] = parse_modified_time(modified)
+        except Exception as e:
+            logger.error('Failed to parse the config file time of %s: %r', vm_name, e)
+    return modified_times
+
 
+def get_vsphere_powered_off_vms(provider, vm_names):
+    """Host and datastore URL of the powered off VMs, in one property request per object type
 
-def process_provider_vms(provider_key, provider_type, matchers, delta, vms_to_delete):
+    Returns: ``{vm_name: (host name, datastore url)}``
+    """
+    from psphere.managedobjects import VirtualMachine, HostSystem, Datastore
+    vm_names = set(vm_names)
+    host_names = {
+        host._mo_ref.value: host.name
+        for host in HostSystem.all(provider.api, properties=['name'])}
+    datastore_urls = {
+        datastore.name: datastore.summary.url
+        for datastore in Datastore.all(provider.api, properties=['name', 'summary'])}
+    powered_off = {}
+    for vm in VirtualMachine.all(provider.api, properties=['name', 'runtime', 'config']):
+        if vm.name not in vm_names or vm.runtime.powerState != 'poweredOff':
+            continue
+        # '[datastore] vm_name/vm_name.vmx'
+        datastore_name = re.match(r'\[([^\]]+)\]', vm.config.files.vmPathName).group(1)
+        powered_off[vm.name] = (
+            host_names[vm.runtime.host._mo_ref.value], datastore_urls[datastore_name])
+    return powered_off
+
+
+def get_vsphere_powered_off_vms_per_vm(provider_key, vm_names, pool, clients):
+    """Same as :py:func:`get_vsphere_powered_off_vms`, asking for every VM on its own"""
+    def _vm_details(vm_name):
+        provider = thread_mgmt(provider_key, clients)
+        try:
+            if provider.vm_status(vm_name) != 'poweredOff':
+                return None
+            vm_config_datastore = provider.get_vm_config_files_path(vm_name)
+            return vm_name, (
+                provider.get_vm_host_name(vm_name),
+                provider.get_vm_datastore_path(vm_name, vm_config_datastore))
+        except Exception as e:
+            logger.error('Failed to get the status of %s on %s: %r', vm_name, provider_key, e)
+            return None
+    return dict(details for details in pool.map(_vm_details, vm_names) if details)
+
+
+def get_vm_creation_times(provider_key, provider_type, vm_names, pool, clients):
+    """Creation (or last power on) times of the VMs, as ``{vm_name: datetime}``
+
+    vSphere doesn't know when a VM was created, so for the powered off ones the modified time of
+    their config file on the ESX host is used. The details of these are fetched in bulk and the
+    config files are checked with one SSH session per host. Everything else is asked for per VM,
+    ``pool`` bounds how many of these requests run at once, its threads keep their management
+    system clients in ``clients``, see :py:func:`thread_mgmt`.
+    """
+    creation_times = {}
+    remaining = list(vm_names)
+    if provider_type == 'virtualcenter' and remaining:
+        try:
+            powered_off = get_vsphere_powered_off_vms(
+                thread_mgmt(provider_key, clients), remaining)
+        except Exception as e:
+            logger.warning(
+                'Bulk VM details of %s failed (%r), asking for every VM', provider_key, e)
+            powered_off = get_vsphere_powered_off_vms_per_vm(
+                provider_key, remaining, pool, clients)
+        per_host = defaultdict(dict)
+        for vm_name, (host_name, datastore_url) in powered_off.items():
+            per_host[host_name][vm_name] = datastore_url
+
+        def _host_times(host_item):
+            host_name, vm_datastores = host_item
+            try:
+                return get_vm_config_modified_times(host_name, vm_datastores, provider_key)
+            except Exception as e:
+                logger.error('Failed to check the VM config files on %s: %r', host_name, e)
+                return {}
+
+        for host_times in pool.map(_host_times, per_host.items()):
+            creation_times.update(host_times)
+        # the powered off VMs without a config file time fall back to vm_creation_time
+        remaining = [vm_name for vm_name in remaining if vm_name not in creation_times]
+
+    def _creation_time(vm_name):
+        try:
+            return vm_name, thread_mgmt(provider_key, clients).vm_creation_time(vm_name)
+        except Exception as e:
+            logger.error(e)
+            logger.error('Failed to get creation/boot time for {} on {}'.format(
+                vm_name, provider_key))
+            return vm_name, None
+
+    for vm_name, creation_time in pool.map(_creation_time, remaining):
+        if creation_time:
+            creation_times[vm_name] = creation_time
+    return creation_times
+
+
+def process_provider_vms(provider_key, provider_type, matchers, delta, vms_to_delete,
+                         workers=8, timings=None):
     with lock:
         print('{} processing'.format(provider_key))
+    starttime = time.time()
+    pool = ThreadPool(workers)
+    clients = {}
     try:
         now = datetime.datetime.now()
         with lock:
             # Known conf issue :)
-            provider = get_mgmt(provider_key)
-        for vm_name in provider.list_vm():
-            if not match(matchers, vm_name):
-                continue
+            provider = thread_mgmt(provider_key, clients)
+        vm_names = [vm_name for vm_name in provider.list_vm() if match(matchers, vm_name)]
+        listed_time = time.time()
+        creation_times = get_vm_creation_times(
+            provider_key, provider_type, vm_names, pool, clients)
 
-            try:
-                if provider_type == 'virtualcenter' and provider.vm_status(vm_name) == 'poweredOff':
-                    hostname = provider.get_vm_host_name(vm_name)
-                    vm_config_datastore = provider.get_vm_config_files_path(vm_name)
-                    datastore_url = provider.get_vm_datastore_path(vm_name, vm_config_datastore)
-                    vm_creation_time = get_vm_config_modified_time(hostname, vm_name,
-                                                                   datastore_url, provider_key)
-                else:
-                    vm_creation_time = provider.vm_creation_time(vm_name)
-
-                if vm_creation_time + delta < now:
-                    vm_delta = now - vm_creation_time
-                    with lock:
-                        vms_to_delete[provider_key].add((vm_name, vm_delta))
-            except Exception as e:
-                logger.error(e)
-                logger.error('Failed to get creation/boot time for {} on {}'.format(
-                    vm_name, provider_key))
-                continue
+        for vm_name, vm_creation_time in creation_times.items():
+            if vm_creation_time + delta < now:
+                vm_delta = now - vm_creation_time
+                with lock:
+                    vms_to_delete[provider_key].add((vm_name, vm_delta))
 
         with lock:
             print('{} finished'.format(provider_key))
+            if timings is not None:
+                timings[provider_key] = {
+                    'matched': len(vm_names),
+                    'inspected': len(creation_times),
+                    'list_time': listed_time - starttime,
+                    'inspect_time': time.time() - listed_time,
+                }
     except Exception as ex:
         with lock:
             # Print out the error message too because logs in the job get deleted
             print('{} failed ({}: {})'.format(provider_key, type(ex).__name__, str(ex)))
         logger.error('failed to process vms from provider {}'.format(provider_key))
         logger.exception(ex)
+    finally:
+        pool.close()
+        pool.join()
+        disconnect_clients(clients)
 
 
-def delete_provider_vms(provider_key, vm_names):
+def delete_provider_vms(provider_key, vm_names, workers=8):
     with lock:
         print('Deleting VMs from {} ...'.format(provider_key))
 
+    clients = {}
     try:
         with lock:
-            provider = get_mgmt(provider_key)
+            thread_mgmt(provider_key, clients)
     except Exception as e:
         with lock:
             print("Could not retrieve the provider {}'s mgmt system ({}: {})".format(
                 provider_key, type(e).__name__, str(e)))
             logger.exception(e)
+        return
 
-    for vm_name in vm_names:
+    def _delete_vm(vm_name):
         with lock:
             print("Deleting {} from {}".format(vm_name, provider_key))
         try:
-            provider.delete_vm(vm_name)
+            thread_mgmt(provider_key, clients).delete_vm(vm_name)
         except Exception as e:
             with lock:
                 print('Failed to delete {} on {}'.format(vm_name, provider_key))
                 logger.exception(e)
+
+    pool = ThreadPool(workers)
+    try:
+        pool.map(_delete_vm, vm_names)
+    finally:
+        pool.close()
+        pool.join()
+        disconnect_clients(clients)
     with lock:
         print("{} is done!".format(provider_key))
 
 
-def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
+def print_timings(timings):
+    print('Provider timings:')
+    for provider_key, timing in sorted(timings.items()):
+        print(' {}: {} matching VMs listed in {:.1f}s, {} inspected in {:.1f}s'.format(
+            provider_key, timing['matched'], timing['list_time'], timing['inspected'],
+            timing['inspect_time']))
+
+
+def cleanup_vms(texts, max_hours=24, providers=None, prompt=True, workers=8, dry_run=False):
     providers = providers or list_providers()
     providers_data = cfme_data.get("management_systems", {})
     delta = datetime.timedelta(hours=int(max_hours))
     vms_to_delete = defaultdict(set)
+    timings = {}
     thread_queue = []
     # precompile regexes
     matchers = [re.compile(text) for text in texts]
@@ -149,7 +318,8 @@ def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
     for provider_key in providers:
         provider_type = providers_data[provider_key].get('type', None)
         thread = Thread(target=process_provider_vms,
-                        args=(provider_key, provider_type, matchers, delta, vms_to_delete))
+                        args=(provider_key, provider_type, matchers, delta, vms_to_delete,
+                              workers, timings))
         # Mark as daemon thread for easy-mode KeyboardInterrupt handling
         thread.daemon = True
         thread_queue.append(thread)
@@ -165,6 +335,11 @@ def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
             days, hours = vm_delta.days, vm_delta.seconds / 3600
             print(' {} is {} days, {} hours old'.format(vm_name, days, hours))
 
+    if dry_run:
+        print_timings(timings)
+        print('Dry run, not deleting anything.')
+        return 0
+
     if vms_to_delete and prompt:
         yesno = raw_input('Delete these VMs? [y/N]: ')
         if str(yesno).lower() != 'y':
@@ -177,7 +352,7 @@ def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
     thread_queue = []
     for provider_key, vm_set in vms_to_delete.items():
         thread = Thread(target=delete_provider_vms,
-            args=(provider_key, [name for name, t_delta in vm_set]))
+            args=(provider_key, [name for name, t_delta in vm_set], workers))
         # Mark as daemon thread for easy-mode KeyboardInterrupt handling
         thread.daemon = True
         thread_queue.append(thread)
@@ -190,4 +365,5 @@ def cleanup_vms(texts, max_hours=24, providers=None, prompt=True):
 
 if __name__ == "__main__":
     args = parse_cmd_line()
-    sys.exit(cleanup_vms(args.text_to_match, args.max_hours, args.providers, args.prompt))
+    sys.exit(cleanup_vms(args.text_to_match, args.max_hours, args.providers, args.prompt,
+        args.workers, args.dry_run))
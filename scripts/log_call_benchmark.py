@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmark for log calls through utils.log.logger
+
+Every message logged through the cfme logger adapter records the file and line it was logged
+from. This compares the log call throughput of the adapter finding that location with
+utils.log.nth_frame_info (how it was done before) and with utils.log.nth_frame_location.
+
+The calls are made from a stack of the given depth, since test code usually logs from deep
+inside pytest, and the cost of inspecting the whole stack grows with it. Messages are logged
+to a logger with a NullHandler, so the numbers are about the adapter, not the handlers.
+
+Example:
+
+    scripts/log_call_benchmark.py --calls 20000 --depth 60
+"""
+
+import argparse
+import logging
+from time import time
+
+from fixtures.artifactor_plugin import DummyClient
+from utils.log import ArtifactorLoggerAdapter, nth_frame_info, get_rel_path, safe_string
+
+
+class FrameInfoLoggerAdapter(ArtifactorLoggerAdapter):
+    """The logger adapter, finding the caller's location like it used to"""
+    def process(self, msg, kwargs):
+        msg = safe_string(msg)
+        frameinfo = nth_frame_info(3)
+        extra = kwargs.get('extra', {})
+        if not extra.get('source_file'):
+            if frameinfo.filename:
+                extra['source_file'] = get_rel_path(frameinfo.filename)
+                extra['source_lineno'] = frameinfo.lineno
+            else:
+                extra['source_file'] = 'unknown'
+                extra['source_lineno'] = 0
+        kwargs['extra'] = extra
+        return msg, kwargs
+
+
+def make_adapter(adapter_class):
+    bench_logger = logging.getLogger('log_call_benchmark')
+    bench_logger.addHandler(logging.NullHandler())
+    bench_logger.propagate = False
+    bench_logger.setLevel(logging.INFO)
+    adapter = adapter_class(bench_logger, {})
+    # don't talk to an artifactor, or import the rest of its plugin
+    adapter.artifactor = DummyClient()
+    adapter.slaveid = ''
+    return adapter
+
+
+def log_calls(adapter, calls, depth):
+    """Log ``calls`` messages ``depth`` frames deep, return the time it took"""
+    if depth > 0:
+        return log_calls(adapter, calls, depth - 1)
+    starttime = time()
+    for i in xrange(calls):
+        adapter.info('Log call %d', i)
+    return time() - starttime
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        epilog=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--calls', type=int, default=20000,
+        help='number of log calls to time for each adapter')
+    parser.add_argument('--depth', type=int, default=60,
+        help='depth of the stack the log calls are made from')
+    args = parser.parse_args()
+
+    results = []
+    for name, adapter_class in [('nth_frame_info', FrameInfoLoggerAdapter),
+                                ('nth_frame_location', ArtifactorLoggerAdapter)]:
+        elapsed = log_calls(make_adapter(adapter_class), args.calls, args.depth)
+        results.append(elapsed)
+        print('{:>20}: {} calls in {:.3f}s, {:.0f} calls/s'.format(
+            name, args.calls, elapsed, args.calls / elapsed))
+    print('Speedup: {:.1f}x'.format(results[0] / results[1]))
+
+
+if __name__ == "__main__":
+    exit(main())
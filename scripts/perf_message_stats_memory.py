@@ -0,0 +1,183 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+
+""" Memory benchmark for the perf message and page statistics records
+
+Generates a synthetic evm.log with the requested number of queue messages, and parses it with
+utils.perf_message_stats.evm_to_statistics and evm_to_statistics_parallel. These keep a
+MiqMsgStat record for every message in flight, so the log keeps a backlog of queued messages.
+A synthetic production.log is parsed with utils.pagestats.ProductionLogParser, keeping the
+PageStat record of every request, like the UI perf tests do.
+
+Every parser runs twice, each time in a fresh child process so the peak RSS of one run doesn't
+hide the other: once with the slotted records, and once with an equivalent dict-backed record
+class, which is how the records were stored before. With the parallel parser, the peak RSS is the
+one of the process merging the chunks, which is where the records are created.
+
+Example:
+
+    scripts/perf_message_stats_memory.py --messages 500000 --in-flight 50000
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import tempfile
+from time import time
+
+from utils import pagestats, perf_message_stats
+
+log_prefix = '[----] I, [2016-05-10T{:02d}:{:02d}:{:02d}.{:06d} #{}:b15814]  INFO -- : '
+commands = ['Vm.perf_capture', 'Host.perf_capture', 'Storage.scan', 'MiqServer.status_update']
+requests = ['GET "/vm_infra/explorer"', 'POST "/vm_infra/tree_select/?id=v-1"',
+    'GET "/dashboard/show"', 'POST "/ops/change_tab/?tab_id=settings_list"']
+
+
+def line_prefix(number):
+    second = number % 86400
+    return log_prefix.format(second / 3600, second / 60 % 60, second % 60, number % 1000000,
+        1000 + number % 50)
+
+
+def write_evm_log(evm_file, messages, in_flight):
+    """Write a log with put, get and delivered lines for every message, plus some noise
+
+    A message is only got off the queue and delivered once ``in_flight`` newer messages were put
+    on it, the last ones are never delivered.
+    """
+    with open(evm_file, 'w') as evm_log:
+        for msg_id in xrange(1, messages + 1):
+            prefix = line_prefix(msg_id)
+            evm_log.write(prefix + 'MIQ(MiqQueue.put) Message id: [{}], Command: [{}], '
+                'Args: ["2016-05-10T08:00:00Z", "realtime"]\n'.format(
+                    msg_id, commands[msg_id % len(commands)]))
+            done_id = msg_id - in_flight
+            if done_id < 1:
+                continue
+            evm_log.write(prefix + 'MIQ(MiqQueue.get_via_drb) Message id: [{}], Command: [{}], '
+                'Dequeued in: [0.{}] seconds\n'.format(
+                    done_id, commands[done_id % len(commands)], done_id % 1000))
+            evm_log.write(prefix + 'MIQ(VmOrTemplate#perf_capture) Capture for Vm name: '
+                '[vm-{}], Interval type: [realtime]\n'.format(done_id))
+            evm_log.write(prefix + 'MIQ(MiqQueue.delivered) Message id: [{}], State: [ok], '
+                'Delivered in [1.{}] seconds\n'.format(done_id, done_id % 1000))
+
+
+def write_production_log(production_file, pages):
+    """Write a log with a request of a few queries for every page"""
+    with open(production_file, 'w') as production_log:
+        for page in xrange(1, pages + 1):
+            prefix = line_prefix(page)
+            production_log.write(prefix + 'Started {} for 127.0.0.1 at 2016-05-10\n'.format(
+                requests[page % len(requests)]))
+            for query in xrange(page % 5 + 1):
+                production_log.write(prefix + '  Vm Load ({}.{}ms)  SELECT "vms".* FROM "vms"\n'
+                    .format(query, page % 10))
+            production_log.write(prefix + '  CACHE (0.0ms)  SELECT "vms".* FROM "vms"\n')
+            production_log.write(prefix + 'Completed 200 OK in {}ms (Views: {}.0ms | '
+                'ActiveRecord: {}.0ms)\n'.format(100 + page % 500, 50 + page % 100, page % 50))
+
+
+def unslotted(cls):
+    """Build a copy of a slotted record class which stores its fields in a __dict__"""
+    namespace = {name: value for name, value in vars(cls).items()
+        if name not in cls.__slots__ and name not in ('__slots__', '__dict__', '__weakref__')}
+    return type(cls.__name__, (object,), namespace)
+
+
+def parse_statistics(evm_file):
+    return perf_message_stats.evm_to_statistics(evm_file, {}).msg_count
+
+
+def parse_statistics_parallel(evm_file):
+    return perf_message_stats.evm_to_statistics_parallel(evm_file, {}).msg_count
+
+
+def parse_pages(production_file):
+    with open(production_file) as production_log:
+        return len(pagestats.ProductionLogParser(query_time_threshold=5).parse(production_log))
+
+
+def measure(parse, log_file, module, record_class):
+    """Parse the log in a child process with the record class patched into the module
+
+    Returns: (peak RSS in kB, parse time, number of records parsed)
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        setattr(module, record_class.__name__, record_class)
+        starttime = time()
+        count = parse(log_file)
+        parse_time = time() - starttime
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, '{} {} {}'.format(peak_rss, parse_time, count))
+        os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1024)
+    os.close(read_fd)
+    os.waitpid(pid, 0)
+    peak_rss, parse_time, count = result.split()
+    return int(peak_rss), float(parse_time), int(count)
+
+
+def compare(name, parse, log_file, module, record_class):
+    """Measure the parser with the dict-backed and the slotted records and print the results"""
+    results = [
+        ('dict records', measure(parse, log_file, module, unslotted(record_class))),
+        ('slotted records', measure(parse, log_file, module, record_class)),
+    ]
+    # ru_maxrss is in kilobytes on linux
+    print('{}:'.format(name))
+    for records, (peak_rss, parse_time, count) in results:
+        print('{:>18}: {} records, peak RSS {:.1f} MiB, parsed in {:.2f}s'.format(
+            records, count, peak_rss / 1024.0, parse_time))
+    before, after = results[0][1][0], results[1][1][0]
+    print('{:>18}: {:.1f} MiB ({:.0%})'.format(
+        'Peak RSS reduced', (before - after) / 1024.0, (before - after) / float(before)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        epilog=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--messages', type=int, default=200000,
+        help='number of queue messages in the synthetic evm.log')
+    parser.add_argument('--in-flight', type=int, default=20000,
+        help='number of messages on the queue at any time in the synthetic evm.log')
+    parser.add_argument('--pages', type=int, default=100000,
+        help='number of requests in the synthetic production.log')
+    parser.add_argument('--evm-log', default=None,
+        help='parse this evm.log instead of generating one')
+    parser.add_argument('--production-log', default=None,
+        help='parse this production.log instead of generating one')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        evm_file = args.evm_log
+        if not evm_file:
+            evm_file = os.path.join(tmp_dir, 'evm.log')
+            write_evm_log(evm_file, args.messages, args.in_flight)
+        production_file = args.production_log
+        if not production_file:
+            production_file = os.path.join(tmp_dir, 'production.log')
+            write_production_log(production_file, args.pages)
+
+        for log_file in (evm_file, production_file):
+            print('{} is {:.1f} MiB'.format(log_file, os.path.getsize(log_file) / 1048576.0))
+        compare('evm_to_statistics', parse_statistics, evm_file, perf_message_stats,
+            perf_message_stats.MiqMsgStat)
+        compare('evm_to_statistics_parallel', parse_statistics_parallel, evm_file,
+            perf_message_stats, perf_message_stats.MiqMsgStat)
+        compare('ProductionLogParser', parse_pages, production_file, pagestats,
+            pagestats.PageStat)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    exit(main())
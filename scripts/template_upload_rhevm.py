@@ -597,10 +597,10 @@ def upload_template(rhevip, sshname, sshpass, username, password,
         if provider_data:
             kwargs = make_kwargs_rhevm(provider_data, provider)
             providers = provider_data['management_systems']
-            api = get_mgmt(kwargs.get('provider'), providers=providers).api
+            api = get_mgmt(kwargs.get('provider'), providers=providers, cached=False).api
         else:
             kwargs = make_kwargs_rhevm(cfme_data, provider)
-            api = get_mgmt(kwargs.get('provider')).api
+            api = get_mgmt(kwargs.get('provider'), cached=False).api
         kwargs['image_url'] = image_url
         kwargs['template_name'] = template_name
         ovaname = get_ova_name(image_url)
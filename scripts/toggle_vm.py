@@ -32,7 +32,7 @@ def main():
     args = parser.parse_args()
 
     # Make sure the VM is off to start
-    provider = get_mgmt(args.provider_name)
+    provider = get_mgmt(args.provider_name, cached=False)
 
     if provider.is_vm_running(args.vm_name):
         provider.stop_vm(args.vm_name)
@@ -56,7 +56,7 @@ def main():
                     start_success = True
                     provider.disconnect()
                     time.sleep(args.uptime)
-                    provider = get_mgmt(args.provider_name)
+                    provider = get_mgmt(args.provider_name, cached=False)
                 except Exception:
                     time.sleep(60)
                     times_failed_counter += 1
@@ -76,7 +76,7 @@ def main():
                     stop_success = True
                     provider.disconnect()
                     time.sleep(args.downtime)
-                    provider = get_mgmt(args.provider_name)
+                    provider = get_mgmt(args.provider_name, cached=False)
                 except Exception:
                     time.sleep(60)
                     times_failed_counter += 1
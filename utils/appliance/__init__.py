@@ -1489,7 +1489,23 @@ class IPAppliance(object):
     @cached_property
     def db(self):
         # slightly crappy: anything that changes self.db_address should also del(self.db)
-        return db.Db(self.db_address)
+        return db.Db(self.db_address, schema_key=self.db_schema_key)
+
+    @cached_property
+    def db_schema_key(self):
+        """Key of the appliance's database schema in the :py:class:`utils.db.Db` schema cache
+
+        Upstream builds are all called ``master`` and their schema changes between them, so
+        their schema is not cached.
+        """
+        try:
+            if self.build == 'master':
+                return None
+            return '{}-{}'.format(self.version, self.build)
+        except Exception as exc:
+            self.log.warning('Unable to get the version and build for the db schema cache')
+            self.log.exception(exc)
+            return None
 
     @property
     def is_db_enabled(self):
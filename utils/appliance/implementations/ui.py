@@ -119,8 +119,44 @@ class MiqBrowser(Browser):
         return self.appliance.version
 
 
+#: Learned direct URLs of navigation destinations, ``{shortcut key: url}``. A ``None`` url means
+#: the destination can't be reached by its URL, e.g. because it depends on the state of a tree.
+url_shortcuts = {}
+
+_identity_types = (basestring, int, long, float, bool, type(None))
+
+
+def navigation_identity(obj):
+    """Hashable identity of the object navigated to, or ``None`` if it can't be told apart
+
+    Classes are their own identity. For instances it is made of the simple public attributes
+    (name, id, ...) and the names of the objects they refer to (provider, parent, ...).
+    """
+    if isinstance(obj, type):
+        return obj
+    try:
+        attributes = vars(obj)
+    except TypeError:
+        return None
+    identity = []
+    for attr, value in sorted(attributes.items()):
+        if attr.startswith('_') or attr == 'appliance':
+            continue
+        if not isinstance(value, _identity_types):
+            value = getattr(value, 'name', None)
+            if not isinstance(value, basestring):
+                continue
+            value = (attr, value)
+        identity.append((attr, value))
+    if not identity:
+        return None
+    return (type(obj), tuple(identity))
+
+
 class CFMENavigateStep(NavigateStep):
     VIEW = None
+    #: Whether the destination can be remembered by its URL and loaded directly next time
+    URL_SHORTCUT = True
 
     @cached_property
     def view(self):
@@ -141,6 +177,126 @@ class CFMENavigateStep(NavigateStep):
         except (AttributeError, NoSuchElementException):
             return False
 
+    PAGE_HEALTH = jsmin('''\
+        function isDisplayed(el) {
+            if (!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)) return false;
+            return window.getComputedStyle(el).visibility !== "hidden";
+        }
+
+        function anyDisplayed(nodes) {
+            for (var i = 0; i < nodes.length; i++) {
+                if (isDisplayed(nodes[i])) return true;
+            }
+            return false;
+        }
+
+        function xpathNodes(xpath) {
+            var result = document.evaluate(
+                xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var nodes = [];
+            for (var i = 0; i < result.snapshotLength; i++) nodes.push(result.snapshotItem(i));
+            return nodes;
+        }
+
+        function xpathText(xpath) {
+            var nodes = xpathNodes(xpath);
+            if (nodes.length === 0) return null;
+            return (nodes[0].innerText || nodes[0].textContent).trim();
+        }
+
+        try {
+            miqSparkleOff();
+        } catch(err) {
+            // miqSparkleOff undefined, so it's definitely off.
+        }
+
+        var railsError = null;
+        if (anyDisplayed(xpathNodes("//body[./h1 and ./p and ./hr and ./address]"))) {
+            var title = xpathText("//body/h1"), body = xpathText("//body/p");
+            if (title !== null && body !== null) railsError = title + ": " + body;
+        } else if (anyDisplayed(
+                xpathNodes("//h1[normalize-space(.)='Unexpected error encountered']"))) {
+            railsError = xpathText(
+                "//h1[normalize-space(.)='Unexpected error encountered']" +
+                "/following-sibling::h3[not(fieldset)]");
+        }
+
+        return {
+            blocked: (
+                anyDisplayed(xpathNodes("//div[@id='blocker_div' or @id='notification']")) ||
+                anyDisplayed(document.querySelectorAll(".modal-backdrop.fade.in"))),
+            modal: anyDisplayed(xpathNodes(
+                "//div[contains(@class, 'modal-dialog') and contains(@class, 'modal-lg')]")),
+            jquery: typeof jQuery !== "undefined",
+            rails_error: railsError
+        };
+        ''')
+
+    def page_health(self):
+        """Turn the sparkle off and check the state of the page, in one JavaScript call
+
+        Returns:
+            A dict with ``blocked`` (blocker div or modal backdrop displayed), ``modal`` (a large
+            modal dialog is open), ``jquery`` (jQuery is loaded) and ``rails_error`` (the text of
+            the displayed rails error, or ``None``), or ``None`` if the script failed to run.
+        """
+        try:
+            return self.appliance.browser.widgetastic.execute_script(self.PAGE_HEALTH)
+        except Exception as e:
+            logger.error("Checking the page health failed.")
+            logger.exception(e)
+            return None
+
+    @property
+    def shortcut_key(self):
+        """Key of the destination in :py:data:`url_shortcuts`, ``None`` if it can't have one"""
+        if not self.URL_SHORTCUT or self.VIEW is None:
+            # without a view, am_i_here can't confirm the shortcut led to the right page
+            return None
+        identity = navigation_identity(self.obj)
+        if identity is None:
+            return None
+        return (type(self), identity, self.appliance.address, str(self.appliance.version))
+
+    def go_by_url(self):
+        """Load the learned URL of the destination, return whether it led there"""
+        key = self.shortcut_key
+        url = url_shortcuts.get(key) if key is not None else None
+        if url is None:
+            return False
+        logger.info("[UI-NAV/{}/{}]: Going straight to {}".format(
+            self.obj.__class__.__name__, self._name, url))
+        br = self.appliance.browser.widgetastic
+        try:
+            br.selenium.get(url)
+            br.plugin.ensure_page_safe()
+            if self.am_i_here():
+                return True
+            landed_on = br.selenium.current_url
+        except Exception as e:
+            logger.info("[UI-NAV/{}/{}]: Exception raised [{}] whilst going straight there".format(
+                self.obj.__class__.__name__, self._name, e))
+            landed_on = None
+        if landed_on == url:
+            # the URL loaded fine but it is not the destination, don't try it again
+            logger.info("[UI-NAV/{}/{}]: Destination can't be reached by its URL".format(
+                self.obj.__class__.__name__, self._name))
+            url_shortcuts[key] = None
+        else:
+            # redirected, e.g. to the login page, or the browser broke; learn it again
+            url_shortcuts.pop(key, None)
+        return False
+
+    def remember_url(self):
+        """Remember the URL the navigation ended on, for :py:meth:`go_by_url`"""
+        key = self.shortcut_key
+        if key is None or (key in url_shortcuts and url_shortcuts[key] is None):
+            return
+        try:
+            url_shortcuts[key] = self.appliance.browser.widgetastic.selenium.current_url
+        except Exception:
+            pass
+
     def pre_navigate(self, _tries=0):
         if _tries > 2:
             # Need at least three tries:
@@ -158,35 +314,24 @@ class CFMENavigateStep(NavigateStep):
 
         br = self.appliance.browser
 
-        try:
-            br.widgetastic.execute_script('miqSparkleOff();')
-        except:  # Diaper OK (mfalesni)
-            # miqSparkleOff undefined, so it's definitely off.
-            pass
+        health = self.page_health()
 
         # Check if the page is blocked with blocker_div. If yes, let's headshot the browser right
         # here
-        if (
-                br.widgetastic.is_displayed("//div[@id='blocker_div' or @id='notification']") or
-                br.widgetastic.is_displayed(".modal-backdrop.fade.in")):
+        if health is not None and health['blocked']:
             logger.warning("Page was blocked with blocker div on start of navigation, recycling.")
             self.appliance.browser.quit_browser()
             self.go(_tries)
+            health = self.page_health()
 
         # Check if modal window is displayed
-        if (br.widgetastic.is_displayed(
-                "//div[contains(@class, 'modal-dialog') and contains(@class, 'modal-lg')]")):
+        if health is not None and health['modal']:
             logger.warning("Modal window was open; closing the window")
             br.widgetastic.click(
                 "//button[contains(@class, 'close') and contains(@data-dismiss, 'modal')]")
 
         # Check if jQuery present
-        try:
-            br.widgetastic.execute_script("jQuery")
-        except Exception as e:
-            if "jQuery" not in str(e):
-                logger.error("Checked for jQuery but got something different.")
-                logger.exception(e)
+        if health is None or not health['jquery']:
             # Restart some workers
             logger.warning("Restarting UI and VimBroker workers!")
             with self.appliance.ssh_client as ssh:
@@ -198,9 +343,10 @@ class CFMENavigateStep(NavigateStep):
             self.appliance.browser.quit_browser()
             self.appliance.browser.open_browser()
             self.go(_tries)
+            health = self.page_health()
 
         # Same with rails errors
-        rails_e = get_rails_error()
+        rails_e = health['rails_error'] if health is not None else get_rails_error()
         if rails_e is not None:
             logger.warning("Page was blocked by rails error, renavigating.")
             logger.error(rails_e)
@@ -348,10 +494,12 @@ class CFMENavigateStep(NavigateStep):
                 "[UI-NAV/{}/{}]: Already here".format(self.obj.__class__.__name__, self._name))
         else:
             logger.info("[UI-NAV/{}/{}]: Not here".format(self.obj.__class__.__name__, self._name))
-            self.prerequisite()
-            logger.info("[UI-NAV/{}/{}]: Heading to destination".format(
-                self.obj.__class__.__name__, self._name))
-            self.do_nav(_tries)
+            if not self.go_by_url():
+                self.prerequisite()
+                logger.info("[UI-NAV/{}/{}]: Heading to destination".format(
+                    self.obj.__class__.__name__, self._name))
+                self.do_nav(_tries)
+                self.remember_url()
         self.resetter()
         self.post_navigate(_tries)
         if self.VIEW is not None:
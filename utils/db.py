@@ -1,3 +1,6 @@
+import cPickle as pickle
+import os
+import tempfile
 from collections import Mapping
 from contextlib import contextmanager
 from itertools import izip
@@ -12,6 +15,21 @@ from sqlalchemy.pool import Pool
 from fixtures.pytest_store import store
 from utils import conf, ports, version
 from utils.log import logger
+from utils.path import log_path
+
+#: Directory holding the reflected schemas, one pickle per schema key
+schema_cache_path = log_path.join('db_schema_cache')
+
+#: Tables reflected together with the first table requested from a :py:class:`Db`
+preload_tables = (
+    'ems_clusters',
+    'ext_management_systems',
+    'hosts',
+    'miq_servers',
+    'storages',
+    'vms',
+    'zones',
+)
 
 
 @event.listens_for(Pool, "checkout")
@@ -78,8 +96,17 @@ class Db(Mapping):
         a latent connection, this can be extremely slow, which will affect methods that return
         tables, like the mapping interface or :py:meth:`values`.
 
+        To keep the number of round-trips down, the first table requested is reflected in one
+        pass together with :py:attr:`preload_tables`, and :py:meth:`reflect_tables` can reflect
+        any other set of tables at once. When a ``schema_key`` is given, the reflected schema is
+        also saved to :py:data:`schema_cache_path` and reused by every :py:class:`Db` with the
+        same key, including ones in later test runs and other slaves.
+
     """
-    def __init__(self, hostname=None, credentials=None):
+    #: Tables reflected together with the first table requested from this db
+    preload_tables = preload_tables
+
+    def __init__(self, hostname=None, credentials=None, schema_key=None):
         self._table_cache = {}
         if hostname is None:
             self.hostname = store.current_appliance.db_address
@@ -87,6 +114,7 @@ class Db(Mapping):
             self.hostname = hostname
 
         self.credentials = credentials or conf.credentials['database']
+        self.schema_key = schema_key
 
     def __getitem__(self, table_name):
         """Access tables as items contained in this db
@@ -144,8 +172,8 @@ class Db(Mapping):
             return default
 
     def copy(self):
-        """Copy this database instance, keeping the same credentials and hostname"""
-        return type(self)(self.hostname, self.credentials)
+        """Copy this database instance, keeping the same credentials, hostname and schema key"""
+        return type(self)(self.hostname, self.credentials, self.schema_key)
 
     def __eq__(self, other):
         """Check if this db is equal to another db"""
@@ -198,7 +226,12 @@ class Db(Mapping):
             use :py:meth:`reflect_table`.
 
         """
-        return MetaData(bind=self.engine)
+        metadata = self._schema_cache.get('metadata')
+        if metadata is None:
+            return MetaData(bind=self.engine)
+        # the engine is not pickled with the metadata
+        metadata.bind = self.engine
+        return metadata
 
     @cached_property
     def db_url(self):
@@ -212,7 +245,55 @@ class Db(Mapping):
     def table_names(self):
         """A sorted list of table names available in this database."""
         # rails table names follow similar rules as pep8 identifiers; expose them as such
-        return sorted(inspect(self.engine).get_table_names())
+        table_names = self._schema_cache.get('table_names')
+        if table_names is None:
+            table_names = sorted(inspect(self.engine).get_table_names())
+            self._schema_cache['table_names'] = table_names
+            self.save_schema_cache()
+        return table_names
+
+    @cached_property
+    def schema_cache_file(self):
+        """Path of the schema cache file for this db, ``None`` if there is no ``schema_key``"""
+        if self.schema_key is None:
+            return None
+        return schema_cache_path.join('{}.pickle'.format(self.schema_key))
+
+    @cached_property
+    def _schema_cache(self):
+        """The ``metadata`` and ``table_names`` loaded from the schema cache file"""
+        if self.schema_cache_file is None or not self.schema_cache_file.check():
+            return {}
+        try:
+            with self.schema_cache_file.open('rb') as cache_file:
+                return pickle.load(cache_file)
+        except Exception as exc:
+            # a broken or incompatible cache is just a cold cache, it gets rewritten
+            logger.warning('[DB] Unable to load schema cache %s: %s', self.schema_cache_file, exc)
+            return {}
+
+    def save_schema_cache(self):
+        """Write the reflected schema and table names to the schema cache file
+
+        The file is replaced atomically, so slaves sharing the cache never read a partial file.
+        Does nothing if this db has no ``schema_key``.
+
+        """
+        if self.schema_cache_file is None:
+            return
+        if 'metadata' in self.__dict__:
+            self._schema_cache['metadata'] = self.metadata
+        cache_dir = self.schema_cache_file.dirpath()
+        cache_dir.ensure(dir=True)
+        fd, tmp_name = tempfile.mkstemp(dir=cache_dir.strpath, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as cache_file:
+                pickle.dump(self._schema_cache, cache_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_name, self.schema_cache_file.strpath)
+        except Exception as exc:
+            logger.warning('[DB] Unable to save schema cache %s: %s', self.schema_cache_file, exc)
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
 
     @cached_property
     def session(self):
@@ -258,7 +339,27 @@ class Db(Mapping):
             table_name: The name of a table to reflect
 
         """
-        self.metadata.reflect(only=[table_name])
+        self.reflect_tables([table_name])
+
+    def reflect_tables(self, table_names=None):
+        """Populate :py:attr:`metadata` with information on several tables in one pass
+
+        Tables which were already reflected, or loaded from the schema cache, are skipped.
+        Newly reflected tables are saved to the schema cache.
+
+        Args:
+            table_names: Names of the tables to reflect, all tables in this db if not given
+
+        """
+        if table_names is None:
+            table_names = self.table_names
+        missing = [table_name for table_name in table_names
+            if table_name not in self.metadata.tables]
+        if not missing:
+            return
+        logger.info('[DB] Reflecting %d tables', len(missing))
+        self.metadata.reflect(only=missing)
+        self.save_schema_cache()
 
     def _table(self, table_name):
         """Retrieves, reflects, and caches table objects
@@ -268,7 +369,11 @@ class Db(Mapping):
         try:
             return self._table_cache[table_name]
         except KeyError:
-            self.reflect_table(table_name)
+            if table_name not in self.metadata.tables:
+                # reflect the preloaded tables along with the first table requested
+                preload = [name for name in self.preload_tables
+                    if name != table_name and name in self.table_names]
+                self.reflect_tables([table_name] + preload)
             table = self.metadata.tables[table_name]
             table_dict = {
                 '__table__': table,
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+from sqlalchemy import case, func
+
 from utils.db import cfmedb, Db
 
 
@@ -100,3 +102,35 @@ def check_domain_enabled(domain, ip_address=None, db=None):
         return list(q)[0].enabled
     except IndexError:
         raise KeyError("No such Domain: {}".format(domain))
+
+
+def get_sorted_position(table_name, value, column='name', db=None, **filters):
+    """Find out if a row exists and where it is in a list sorted by a column, in one query
+
+    The lists in the UI are sorted by name by default, so this tells on which page of a paginated
+    list an object is, without going through the pages.
+
+    Args:
+        table_name: Table to look in, e.g. ``'vms'``
+        value: Value of the column to look for
+        column: Column the list is sorted by, ``name`` by default
+        filters: Values of other columns the rows have to have, e.g. ``template=False``
+
+    Returns:
+        0-based index of the row among the rows matching the filters, sorted case-insensitively
+        by the column, or ``None`` if there is no such row
+    """
+    if db is None:
+        db = cfmedb()
+
+    table = db[table_name]
+    sort_column = getattr(table, column)
+    query = db.session.query(
+        func.count(case([(func.lower(sort_column) < func.lower(value), 1)])),
+        func.count(case([(sort_column == value, 1)])))
+    for name, filter_value in filters.items():
+        query = query.filter(getattr(table, name) == filter_value)
+    before, matching = query.one()
+    if not matching:
+        return None
+    return before
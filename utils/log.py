@@ -137,6 +137,8 @@ import sys
 import warnings
 import datetime as dt
 from logging.handlers import RotatingFileHandler, SysLogHandler
+from Queue import Empty, Queue
+from threading import Lock, Thread
 from time import time
 from traceback import extract_tb, format_tb
 
@@ -265,12 +267,24 @@ class _RelpathFilter(logging.Filter):
     record attributes if they aren't found.
 
     """
+    def __init__(self, name=''):
+        logging.Filter.__init__(self, name)
+        # path -> relative path, records from the same file share the lookup
+        self._rel_paths = {}
+
+    def _rel_path(self, path):
+        try:
+            return self._rel_paths[path]
+        except KeyError:
+            relpath = self._rel_paths[path] = get_rel_path(path)
+            return relpath
+
     def filter(self, record):
         try:
-            relpath = get_rel_path(record.source_file)
+            relpath = self._rel_path(record.source_file)
             lineno = record.source_lineno
         except AttributeError:
-            relpath = get_rel_path(record.pathname)
+            relpath = self._rel_path(record.pathname)
             lineno = record.lineno
         if lineno:
             record.source = "{}:{}".format(relpath, lineno)
@@ -468,8 +482,103 @@ def nth_frame_info(n):
     return inspect.getframeinfo(inspect.stack(1)[n][0])
 
 
+# code object -> project-relative path of the file it was compiled from
+_code_rel_paths = {}
+
+
+def nth_frame_location(n):
+    """
+    Determine the project-relative filename and lineno of the code running at the "n"th frame
+
+    Args:
+        n: Number of the stack frame to inspect, counted like in :py:func:`nth_frame_info`
+
+    Raises ValueError if the stack doesn't contain the nth frame (the caller should know this)
+
+    Returns a ``(filename, lineno)`` tuple, the filename is ``None`` if the frame's code has no
+    filename.
+
+    Unlike :py:func:`nth_frame_info`, only the frames up to the "n"th one are looked at, no source
+    is read, and the relative filename is only computed once for every code object, so this is
+    cheap enough to call on every log message.
+
+    """
+    frame = sys._getframe(n)
+    code = frame.f_code
+    try:
+        filename = _code_rel_paths[code]
+    except KeyError:
+        filename = _code_rel_paths[code] = get_rel_path(code.co_filename) or None
+    return filename, frame.f_lineno
+
+
+class ArtifactorLogShipper(object):
+    """Sends log records to the artifactor in batches, from a background thread
+
+    Records are put on a bounded queue, logging only blocks if the queue is full. The shipping
+    thread sends whatever records are queued, up to :py:attr:`batch_size` at once, with the
+    ``log_messages`` hook of the artifactor logger plugin.
+
+    Args:
+        art_client: The artifactor client to fire the hooks with
+        slaveid: The slave id the records come from
+        logger: Logger for errors in the shipping thread
+
+    """
+    #: Most log records sent in one hook
+    batch_size = 500
+    #: Most log records waiting to be sent
+    max_queued = 10000
+
+    def __init__(self, art_client, slaveid, logger):
+        self.art_client = art_client
+        self.slaveid = slaveid
+        self.logger = logger
+        self.queue = Queue(self.max_queued)
+        self._thread = None
+        self._thread_lock = Lock()
+
+    def put(self, log_record):
+        """Queue a log record to be sent to the artifactor"""
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = Thread(target=self._ship, name='artifactor-log-shipper')
+                    self._thread.daemon = True
+                    self._thread.start()
+        self.queue.put(log_record)
+
+    def flush(self):
+        """Wait until all the records queued so far were sent to the artifactor"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def _ship(self):
+        while True:
+            log_records = [self.queue.get()]
+            try:
+                while len(log_records) < self.batch_size:
+                    log_records.append(self.queue.get_nowait())
+            except Empty:
+                pass
+            try:
+                self.art_client.fire_hook(
+                    'log_messages', log_records=log_records, slaveid=self.slaveid)
+            except Exception as e:
+                self.logger.error('Could not send %d log records to the artifactor because of %r',
+                    len(log_records), e)
+            finally:
+                for __ in log_records:
+                    self.queue.task_done()
+
+
 class ArtifactorLoggerAdapter(logging.LoggerAdapter):
-    """Logger Adapter that hands messages off to the artifactor before logging"""
+    """Logger Adapter that hands messages off to the artifactor before logging
+
+    The messages are sent to the artifactor in the background by an
+    :py:class:`ArtifactorLogShipper`, use :py:meth:`flush_artifactor` to wait for them to be sent.
+
+    """
     @cached_property
     def artifactor(self):
         from fixtures.artifactor_plugin import art_client
@@ -480,7 +589,19 @@ class ArtifactorLoggerAdapter(logging.LoggerAdapter):
         from fixtures.artifactor_plugin import SLAVEID
         return SLAVEID or ""
 
+    @cached_property
+    def log_shipper(self):
+        return ArtifactorLogShipper(self.artifactor, self.slaveid, self.logger)
+
+    def flush_artifactor(self):
+        """Wait until all the messages logged so far were sent to the artifactor"""
+        if 'log_shipper' in self.__dict__:
+            self.log_shipper.flush()
+
     def art_log(self, level_name, message, args, kwargs):
+        if not self.artifactor:
+            # No artifactor to send the message to
+            return
         if args:
             # Try the string formatting only if args passed
             try:
@@ -498,7 +619,7 @@ class ArtifactorLoggerAdapter(logging.LoggerAdapter):
             'message': formatted_message,
             'extra': kwargs.get('extra', '')
         }
-        self.artifactor.fire_hook('log_message', log_record=art_log_record, slaveid=self.slaveid)
+        self.log_shipper.put(art_log_record)
 
     def log(self, lvl, msg, *args, **kwargs):
         level_name = logging.getLevelName(lvl).lower()
@@ -544,18 +665,18 @@ class ArtifactorLoggerAdapter(logging.LoggerAdapter):
 
     def process(self, msg, kwargs):
         # frames
-        # 0: call to nth_frame_info
+        # 0: call to nth_frame_location
         # 1: adapter process method (this method)
         # 2: adapter logging method
         # 3: original logging call
         msg = safe_string(msg)
-        frameinfo = nth_frame_info(3)
         extra = kwargs.get('extra', {})
         # add extra data if needed
         if not extra.get('source_file'):
-            if frameinfo.filename:
-                extra['source_file'] = get_rel_path(frameinfo.filename)
-                extra['source_lineno'] = frameinfo.lineno
+            filename, lineno = nth_frame_location(3)
+            if filename:
+                extra['source_file'] = filename
+                extra['source_lineno'] = lineno
             else:
                 # calling frame didn't have a filename
                 extra['source_file'] = 'unknown'
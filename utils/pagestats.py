@@ -21,6 +21,15 @@ import csv
 import numpy
 import re
 
+# "[----] I, [2016-05-10T09:00:00.123456 #1234:2ab0c4]  INFO -- : [request id] message", the
+# request id tag is only there if rails is configured to log it
+production_line_re = re.compile(
+    r'#(\d+)(?::(\w+))?\]\s+\w+ -- : (?:\[([0-9a-fA-F-]{8,})\] )?(.*)$')
+# Regular Expressions to find the ruby production completed time and select query time
+status_re = re.compile(r'Completed\s([0-9]*\s[a-zA-Z]*)\sin\s([0-9\.]*)ms')
+completed_timing_re = re.compile(r'(Views|ActiveRecord):\s([0-9\.]*)ms')
+select_query_time_re = re.compile(r'\s\(([0-9\.]*)ms\)')
+
 
 def analyze_page_stat(pages, soft_assert):
     for page in pages:
@@ -318,14 +327,92 @@ def perf_bench_read_tree(tree):
     return tree_contents, seleniumtime
 
 
-def perf_click(uiworker_pid, tailer, measure_sel_time, clickable, *args):
-    # Regular Expressions to find the ruby production completed time and select query time
-    status_re = re.compile(r'Completed\s([0-9]*\s[a-zA-Z]*)\sin\s([0-9\.]*)ms')
-    views_re = re.compile(r'Views:\s([0-9\.]*)ms')
-    activerecord_re = re.compile(r'ActiveRecord:\s([0-9\.]*)ms')
-    select_query_time_re = re.compile(r'\s\(([0-9\.]*)ms\)')
-    worker_pid = '#' + uiworker_pid
+class ProductionLogParser(object):
+    """Builds :py:class:`PageStat` objects from production.log lines
+
+    Every line is matched once against a precompiled pattern, which splits it into the worker
+    pid, the thread, the optional request id and the message, and is then handled according to
+    the start of the message. SQL statements are attributed to the request they belong to by
+    request id if rails logs one, or else by the pid and thread of the worker, so requests served
+    concurrently don't mix their statistics.
+
+    Args:
+        worker_pid: Only parse lines of this worker, all workers if ``None``
+        query_time_threshold: Select queries slower than this (ms) are added to the
+            ``slowselects`` of their page, defaults to the ui ``query_time`` threshold
+
+    Usage:
+
+        parser = ProductionLogParser(worker_pid)
+        for line in tailer:
+            pgstat = parser.feed(line)
+            if pgstat is not None:
+                ...
+
+    """
+    def __init__(self, worker_pid=None, query_time_threshold=None):
+        self.worker_pid = str(worker_pid).lstrip('#') if worker_pid is not None else None
+        if query_time_threshold is None:
+            query_time_threshold = perf_tests['ui']['threshold']['query_time']
+        self.query_time_threshold = query_time_threshold
+        self.line_count = 0
+        # request id or (pid, thread) -> PageStat of the request in progress
+        self.requests = {}
+
+    def feed(self, line):
+        """Parse a line, returns the :py:class:`PageStat` of a request it completed, or ``None``"""
+        self.line_count += 1
+        match = production_line_re.search(line)
+        if match is None:
+            return None
+        pid, thread, request_id, message = match.groups()
+        if self.worker_pid is not None and pid != self.worker_pid:
+            return None
+        key = request_id or (pid, thread)
+        try:
+            pgstat = self.requests[key]
+        except KeyError:
+            pgstat = self.requests[key] = PageStat()
+
+        if message.startswith('Started'):
+            # Obtain method and requested page
+            for_idx = message.rfind(' for ')
+            pgstat.request = message[8:for_idx + 1] if for_idx > 0 else message[8:]
+        elif message.startswith('Completed'):
+            # Obtain status code and total render time
+            status_result = status_re.match(message)
+            if status_result:
+                pgstat.status = status_result.group(1)
+                pgstat.completedintime = float(status_result.group(2))
+            pgstat.uncachedcount = pgstat.selectcount - pgstat.cachedcount
+            # Redirects don't always have a view timing
+            for timing, value in completed_timing_re.findall(message):
+                if timing == 'Views':
+                    pgstat.viewstime = float(value)
+                else:
+                    pgstat.activerecordtime = float(value)
+            del self.requests[key]
+            return pgstat
+        elif 'SELECT' in message:
+            pgstat.selectcount += 1
+            if message.lstrip().startswith('CACHE'):
+                pgstat.cachedcount += 1
+            selecttime = select_query_time_re.search(message)
+            if selecttime and float(selecttime.group(1)) > self.query_time_threshold:
+                pgstat.slowselects.append(line)
+        return None
+
+    def parse(self, lines):
+        """Parse lines, returns the list of :py:class:`PageStat` of the requests they completed"""
+        pgstats = []
+        for line in lines:
+            pgstat = self.feed(line)
+            if pgstat is not None:
+                pgstats.append(pgstat)
+        return pgstats
+
 
+def perf_click(uiworker_pid, tailer, measure_sel_time, clickable, *args):
     # Time the selenium transaction from "click"
     seleniumtime = 0
     if clickable:
@@ -333,59 +420,25 @@ def perf_click(uiworker_pid, tailer, measure_sel_time, clickable, *args):
         clickable(*args)
         seleniumtime = int((time() - starttime) * 1000)
 
-    pgstats = []
-    pgstat = PageStat()
-    line_count = 0
+    parser = ProductionLogParser(uiworker_pid)
     starttime = time()
-
-    for line in tailer:
-        line_count += 1
-        if worker_pid in line:
-            if 'SELECT' in line:
-                pgstat.selectcount += 1
-                selecttime = select_query_time_re.search(line)
-                if selecttime:
-                    if float(selecttime.group(1)) > perf_tests['ui']['threshold']['query_time']:
-                        pgstat.slowselects.append(line)
-            if 'CACHE' in line:
-                pgstat.cachedcount += 1
-            if 'INFO -- : Started' in line:
-                # Obtain method and requested page
-                started_idx = line.index('Started') + 8
-                pgstat.request = line[started_idx:line.index('for', 72)]
-            if 'INFO -- : Completed' in line:
-                # Obtain status code and total render time
-                status_result = status_re.search(line)
-                if status_result:
-                    pgstat.status = status_result.group(1)
-                    pgstat.completedintime = float(status_result.group(2))
-
-                pgstat.uncachedcount = pgstat.selectcount - pgstat.cachedcount
-
-                # Redirects don't always have a view timing
-                views_result = views_re.search(line)
-                if views_result:
-                    pgstat.viewstime = float(views_result.group(1))
-                activerecord_result = activerecord_re.search(line)
-                if activerecord_result:
-                    pgstat.activerecordtime = float(activerecord_result.group(1))
-                pgstats.append(pgstat)
-                pgstat = PageStat()
+    pgstats = parser.parse(tailer)
     if pgstats:
         if measure_sel_time:
             pgstats[-1].seleniumtime = seleniumtime
     timediff = time() - starttime
-    logger.debug('Parsed (%s) lines in %s', line_count, timediff)
+    logger.debug('Parsed (%s) lines in %s', parser.line_count, timediff)
     return pgstats
 
 
 class PageStat(object):
     """Object that represents page statistics and a list of any associated slow queries."""
+    headers = ['request', 'status', 'seleniumtime', 'completedintime', 'viewstime',
+        'activerecordtime', 'selectcount', 'cachedcount', 'uncachedcount']
+    __slots__ = headers + ['slowselects']
 
     def __init__(self, request='', status='', seleniumtime=0, completedintime=0, viewstime=0,
             activerecordtime=0, selectcount=0, cachedcount=0, uncachedcount=0):
-        self.headers = ['request', 'status', 'seleniumtime', 'completedintime', 'viewstime',
-            'activerecordtime', 'selectcount', 'cachedcount', 'uncachedcount']
         self.request = request
         self.status = status
         self.seleniumtime = seleniumtime
@@ -6,40 +6,64 @@ import numpy
 import time
 
 
-def collect_log(ssh_client, log_prefix, local_file_name, strip_whitespace=False):
+# Finds the "[2016-05-10T08:59:58.100000 #100:b15814]" timestamps of the rails logs
+_log_timestamp_awk = r'match($0, /\[[0-9]+-[0-9]+-[0-9]+T[0-9:]+/)'
+
+
+def collect_log(ssh_client, log_prefix, local_file_name, strip_whitespace=False, start_time=None,
+        end_time=None):
     """Collects all of the logs associated with a single log prefix (ex. evm or top_output) and
-    combines to single gzip log file.  The log file is then scp-ed back to the host.
+    combines to single gzip log file, which is streamed back to the host.
+
+    The rotated logs are decompressed and concatenated with the current log in one remote
+    pipeline, and the gzipped output is written straight to ``local_file_name`` over the same
+    channel, nothing is stored on the appliance.
+
+    Args:
+        ssh_client: :py:class:`utils.ssh.SSHClient` of the appliance
+        log_prefix: Name of the log in ``/var/www/miq/vmdb/log/``, without ``.log``
+        local_file_name: Where to write the gzipped log
+        strip_whitespace: Strip leading and trailing whitespace and empty lines
+        start_time: If given, drop the lines logged before this :py:class:`datetime.datetime`
+        end_time: If given, drop the lines logged after this :py:class:`datetime.datetime`
+
+    The time window only applies to logs with rails style ``[2016-05-10T08:59:58.100000 ...]``
+    timestamps, lines without a timestamp (like backtraces) are kept or dropped along with the
+    last timestamped line before them.
     """
     log_dir = '/var/www/miq/vmdb/log/'
-
-    log_file = '{}{}.log'.format(log_dir, log_prefix)
-    dest_file = '{}{}.perf.log'.format(log_dir, log_prefix)
-    dest_file_gz = '{}{}.perf.log.gz'.format(log_dir, log_prefix)
-
-    ssh_client.run_command('rm -f {}'.format(dest_file_gz))
-
-    status, out = ssh_client.run_command('ls -1 {}-*'.format(log_file))
-    if status == 0:
-        files = out.strip().split('\n')
-        for lfile in sorted(files):
-            ssh_client.run_command('cp {} {}-2.gz'.format(lfile, lfile))
-            ssh_client.run_command('gunzip {}-2.gz'.format(lfile))
-            if strip_whitespace:
-                ssh_client.run_command('sed -i  \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\' '
-                    '{}-2'.format(lfile))
-            ssh_client.run_command('cat {}-2 >> {}'.format(lfile, dest_file))
-            ssh_client.run_command('rm {}-2'.format(lfile))
-
-    ssh_client.run_command('cp {} {}-2'.format(log_file, log_file))
+    log_file = '{}.log'.format(log_prefix)
+
+    rotated = 'for f in $(ls -1 {}-* 2>/dev/null | sort); do '.format(log_file)
+    if start_time is not None:
+        # rotated logs are named after the day they were rotated, the older ones can't have
+        # anything from the test interval in them
+        rotated += 'd=${{f#{}-}}; [[ "${{d:0:8}}" < "{}" ]] && continue; '.format(
+            log_file, start_time.strftime('%Y%m%d'))
+    rotated += 'zcat -f "$f"; done'
+    pipeline = ['cd {}'.format(log_dir), '{{ {}; cat {}; }}'.format(rotated, log_file)]
     if strip_whitespace:
-        ssh_client.run_command('sed -i  \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\' '
-            '{}-2'.format(log_file))
-    ssh_client.run_command('cat {}-2 >> {}'.format(log_file, dest_file))
-    ssh_client.run_command('rm {}-2'.format(log_file))
-    ssh_client.run_command('gzip {}{}.perf.log'.format(log_dir, log_prefix))
-
-    ssh_client.get_file(dest_file_gz, local_file_name)
-    ssh_client.run_command('rm -f {}'.format(dest_file_gz))
+        pipeline.append('sed \'s/^ *//; s/ *$//; /^$/d; /^\s*$/d\'')
+    if start_time is not None or end_time is not None:
+        conditions = []
+        if start_time is not None:
+            conditions.append('ts >= "{}"'.format(start_time.strftime('%Y-%m-%dT%H:%M:%S')))
+        if end_time is not None:
+            conditions.append('ts <= "{}"'.format(end_time.strftime('%Y-%m-%dT%H:%M:%S')))
+        pipeline.append(
+            "awk '{} {{ ts = substr($0, RSTART + 1, 19); keep = ({}) }} keep'".format(
+                _log_timestamp_awk, ' && '.join(conditions)))
+    pipeline.append('gzip -c')
+    command = '{} && {}'.format(pipeline[0], ' | '.join(pipeline[1:]))
+
+    starttime = time.time()
+    result = ssh_client.run_command_to_file('set -o pipefail; {}'.format(command),
+        local_file_name)
+    if result.rc != 0:
+        logger.error('Collecting %s failed (%d): %s', log_prefix, result.rc, result.output)
+    else:
+        logger.info('Collected %s in %.2fs', log_prefix, time.time() - starttime)
+    return result
 
 
 def convert_top_mem_to_mib(top_mem):
@@ -56,6 +80,8 @@ def convert_top_mem_to_mib(top_mem):
 def generate_statistics(the_list, decimals=2):
     """Returns comma seperated statistics over a list of numbers.
 
+    The list can also be a numpy array, which is used without copying it.
+
     Returns:  list of samples(runs), minimum, average, median, maximum,
               stddev, 90th(percentile),
               99th(percentile)
@@ -63,16 +89,12 @@ def generate_statistics(the_list, decimals=2):
     if len(the_list) == 0:
         return [0, 0, 0, 0, 0, 0, 0, 0]
     else:
-        numpy_arr = numpy.array(the_list)
-        minimum = round(numpy.amin(numpy_arr), decimals)
-        average = round(numpy.average(numpy_arr), decimals)
-        median = round(numpy.median(numpy_arr), decimals)
-        maximum = round(numpy.amax(numpy_arr), decimals)
-        stddev = round(numpy.std(numpy_arr), decimals)
-        percentile90 = round(numpy.percentile(numpy_arr, 90), decimals)
-        percentile99 = round(numpy.percentile(numpy_arr, 99), decimals)
-        return [len(the_list), minimum, average, median, maximum, stddev, percentile90,
-            percentile99]
+        numpy_arr = numpy.asarray(the_list, dtype=numpy.float64)
+        # all percentiles from a single sort of the data
+        median, percentile90, percentile99 = numpy.percentile(numpy_arr, [50, 90, 99])
+        return [len(the_list)] + [round(stat, decimals) for stat in (numpy_arr.min(),
+            numpy_arr.mean(), median, numpy_arr.max(), numpy_arr.std(), percentile90,
+            percentile99)]
 
 
 def get_worker_pid(worker_type):
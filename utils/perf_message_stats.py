@@ -10,7 +10,10 @@ from datetime import datetime
 import dateutil.parser as du_parser
 from datetime import timedelta
 from time import time
+from array import array
+from multiprocessing import Pool
 import csv
+import gzip
 import numpy
 import os
 import pygal
@@ -35,6 +38,9 @@ miqmsg_deq = re.compile(r'Dequeued\sin:\s\[([0-9\.]*)\]\sseconds')
 # Delivered in [ * ] seconds
 miqmsg_del = re.compile(r'Delivered\sin\s\[([0-9\.]*)\]\sseconds')
 
+# Size of the byte ranges of evm logs parsed by each process in evm_to_statistics_parallel
+EVM_CHUNK_SIZE = 32 * 1024 * 1024
+
 # Worker related regular expressions:
 # MIQ(PriorityWorker) ID [15], PID [6461]
 miqwkr = re.compile(r'MIQ\(([A-Za-z]*)\)\sID\s\[([0-9]*)\],\sPID\s\[([0-9]*)\]')
@@ -42,6 +48,11 @@ miqwkr = re.compile(r'MIQ\(([A-Za-z]*)\)\sID\s\[([0-9]*)\],\sPID\s\[([0-9]*)\]')
 miqwkr_id = re.compile(r'with\sID:\s\[([0-9]*)\]')
 # For use with workers exiting, such as authentication failures:
 miqwkr_id_2 = re.compile(r'ID\s\[([0-9]*)\]')
+# Lines relevant to workers, the same lines evm_to_workers greps for:
+# MIQ(PriorityWorker) ID
+miqwkr_line = re.compile(r'MIQ\([A-Za-z]*\)\sID')
+miqwkr_line_markers = ('Interrupt', '"evm_worker_uptime_exceeded', '"evm_worker_memory_exceeded',
+    '"evm_worker_stop', 'Worker exiting.')
 
 # top regular expressions
 # Cpu(s): 13.7%us,  1.2%sy,  2.1%ni, 80.0%id,  1.7%wa,  0.0%hi,  0.1%si,  1.3%st
@@ -134,7 +145,7 @@ def evm_to_messages(evm_file, filters):
         if (line_count % 100000) == 0:
             timediff = time() - runningtime
             runningtime = time()
-            logger.info('Count {} : Parsed 100000 lines in %s', line_count, timediff)
+            logger.info('Count %s : Parsed 100000 lines in %s', line_count, timediff)
 
         evm_log_line = evmlogfile.readline()
 
@@ -173,68 +184,128 @@ def evm_to_workers(evm_file):
 
     evmlines = greppedevmlog.split('\n')
 
-    workers = {}
-    wkr_upt_exc = 0
-    wkr_mem_exc = 0
-    wkr_stp = 0
-    wkr_int = 0
-    wkr_ext = 0
+    evm_stats = EvmLogStatistics({})
     for evm_log_line in evmlines:
-        ts, pid = get_msg_timestamp_pid(evm_log_line)
+        evm_stats.feed_worker_line(evm_log_line)
 
-        miqwkr_result = miqwkr.search(evm_log_line)
-        if miqwkr_result:
-            workerid = int(miqwkr_result.group(2))
-            if workerid not in workers:
-                workers[workerid] = MiqWorker()
-                workers[workerid].worker_type = miqwkr_result.group(1)
-                workers[workerid].pid = miqwkr_result.group(3)
-                workers[workerid].worker_id = int(workerid)
-                workers[workerid].start_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'evm_worker_uptime_exceeded' in evm_log_line:
-            miqwkr_id_result = miqwkr_id.search(evm_log_line)
-            if miqwkr_id_result:
-                workerid = int(miqwkr_id_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_upt_exc += 1
-                        workers[workerid].terminated = 'evm_worker_uptime_exceeded'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'evm_worker_memory_exceeded' in evm_log_line:
-            miqwkr_id_result = miqwkr_id.search(evm_log_line)
-            if miqwkr_id_result:
-                workerid = int(miqwkr_id_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_mem_exc += 1
-                        workers[workerid].terminated = 'evm_worker_memory_exceeded'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'evm_worker_stop' in evm_log_line:
-            miqwkr_id_result = miqwkr_id.search(evm_log_line)
-            if miqwkr_id_result:
-                workerid = int(miqwkr_id_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_stp += 1
-                        workers[workerid].terminated = 'evm_worker_stop'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'Interrupt' in evm_log_line:
-            for workerid in workers:
-                if not workers[workerid].end_ts:
-                    wkr_int += 1
-                    workers[workerid].terminated = 'Interrupted'
-                    workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-        elif 'Worker exiting.' in evm_log_line:
-            miqwkr_id_2_result = miqwkr_id_2.search(evm_log_line)
-            if miqwkr_id_2_result:
-                workerid = int(miqwkr_id_2_result.group(1))
-                if workerid in workers:
-                    if not workers[workerid].terminated:
-                        wkr_ext += 1
-                        workers[workerid].terminated = 'Worker Exited'
-                        workers[workerid].end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+    return (evm_stats.workers, evm_stats.wkr_mem_exc, evm_stats.wkr_upt_exc, evm_stats.wkr_stp,
+        evm_stats.wkr_int, evm_stats.wkr_ext, len(evmlines))
+
+
+def evm_to_statistics(evm_files, filters, rawdata_csv_file_name=None):
+    """Parses evm logs for messages and workers in a single pass
+
+    Args:
+        evm_files: Path to an evm log, or a list of paths to rotated evm logs, oldest first.
+            Gzipped logs (``.gz``) are decompressed on the fly.
+        filters: Message args patterns to append to the message command, see
+            :py:func:`perf_process_evm`
+        rawdata_csv_file_name: If set, raw data of each message is written to this csv file as
+            soon as the message is delivered
+
+    Returns: :py:class:`EvmLogStatistics` with the folded statistics
+    """
+    evm_stats = EvmLogStatistics(filters, rawdata_csv_file_name)
+    runningtime = time()
+    try:
+        for evm_log_line in open_evm_logs(evm_files):
+            evm_stats.feed(evm_log_line)
+            if (evm_stats.line_count % 100000) == 0:
+                timediff = time() - runningtime
+                runningtime = time()
+                logger.info('Count %s : Parsed 100000 lines in %s', evm_stats.line_count, timediff)
+    finally:
+        evm_stats.finish()
+    return evm_stats
+
+
+def evm_to_statistics_parallel(evm_files, filters, rawdata_csv_file_name=None, processes=None,
+        chunk_size=EVM_CHUNK_SIZE):
+    """Parses evm logs for messages and workers, in chunks parsed by a pool of processes
+
+    The logs are split into byte ranges on line boundaries, see :py:func:`evm_log_chunks`. Each
+    process parses a chunk into the partial messages seen in it, and the partial messages are
+    merged in log order, so a message put on the queue in one chunk and delivered in another
+    is still joined. Gzipped logs can't be split, so each of them is parsed as a single chunk.
+
+    Args:
+        evm_files: Same as :py:func:`evm_to_statistics`
+        filters: Same as :py:func:`evm_to_statistics`
+        rawdata_csv_file_name: Same as :py:func:`evm_to_statistics`
+        processes: Number of processes to parse with, defaults to the number of cpus
+        chunk_size: Approximate size of the chunks in bytes
+
+    Returns: :py:class:`EvmLogStatistics` with the folded statistics
+    """
+    if isinstance(evm_files, basestring):
+        evm_files = [evm_files]
+    chunks = [chunk for evm_file in evm_files for chunk in evm_log_chunks(evm_file, chunk_size)]
+    evm_stats = EvmLogStatistics(filters, rawdata_csv_file_name)
+    pool = Pool(processes)
+    runningtime = time()
+    try:
+        for chunk_number, chunk in enumerate(pool.imap(parse_evm_chunk, chunks), 1):
+            evm_stats.merge_chunk(chunk)
+            timediff = time() - runningtime
+            runningtime = time()
+            logger.info('Chunk %s/%s : Merged %s lines in %s', chunk_number, len(chunks),
+                chunk.line_count, timediff)
+    finally:
+        pool.terminate()
+        evm_stats.finish()
+    return evm_stats
+
+
+def evm_log_chunks(evm_file, chunk_size=EVM_CHUNK_SIZE):
+    """Splits an evm log into ``(evm_file, start, end)`` byte ranges ending on line boundaries
+
+    A gzipped log is a single ``(evm_file, 0, None)`` range.
+    """
+    evm_file = str(evm_file)
+    if evm_file.endswith('.gz'):
+        yield evm_file, 0, None
+        return
+    size = os.path.getsize(evm_file)
+    with open(evm_file, 'rb') as evmlogfile:
+        start = 0
+        while start < size:
+            evmlogfile.seek(min(start + chunk_size, size))
+            # finish the line the chunk ends in
+            evmlogfile.readline()
+            end = evmlogfile.tell()
+            yield evm_file, start, end
+            start = end
+
+
+def parse_evm_chunk(chunk):
+    """Parses a byte range of an evm log, see :py:func:`evm_to_statistics_parallel`
+
+    Returns: :py:class:`EvmLogChunk`
+    """
+    evm_file, start, end = chunk
+    evm_chunk = EvmLogChunk()
+    if end is None:
+        for evm_log_line in open_evm_logs(evm_file):
+            evm_chunk.feed(evm_log_line)
+    else:
+        with open(evm_file, 'rb') as evmlogfile:
+            evmlogfile.seek(start)
+            for evm_log_line in evmlogfile.read(end - start).splitlines():
+                evm_chunk.feed(evm_log_line)
+    return evm_chunk
+
+
+def fold_msg_into_lists(msg_lists, msg):
+    """Adds the timings of a message no longer in flight to the :py:class:`MiqMsgColumns` of its
+    command in ``msg_lists``, a :py:class:`MiqMsgColumnStore`
 
-    return workers, wkr_mem_exc, wkr_upt_exc, wkr_stp, wkr_int, wkr_ext, len(evmlines)
+    The hourly buckets are aggregated from the same columns, see
+    :py:meth:`MiqMsgColumnStore.hourly_buckets`.
+    """
+    msg_columns = msg_lists.commands.get(msg.msg_cmd)
+    if msg_columns is None:
+        msg_columns = msg_lists.commands[msg.msg_cmd] = MiqMsgColumns(msg.msg_cmd)
+    msg_columns.add(msg_lists.hour_id(msg.puttime), msg_lists.hour_id(msg.gettime), msg)
 
 
 def split_appliance_charts(top_appliance, charts_dir):
@@ -479,75 +550,22 @@ def line_chart_render(title, xtitle, ytitle, x_labels, lines, fname, stacked=Fal
 
 
 def messages_to_hourly_buckets(messages, test_start, test_end):
-    hr_bkt = {}
     # Hour buckets look like: hr_bkt[msg_cmd][msg_date][msg_hour] = MiqMsgBucket()
+    msg_columns = MiqMsgColumnStore()
     for msg in messages:
-        # put on queue, deals with queuing:
-        msg_cmd = messages[msg].msg_cmd
-        putdate = messages[msg].puttime[:10]
-        puthour = messages[msg].puttime[11:13]
-        if msg_cmd not in hr_bkt:
-            hr_bkt[msg_cmd] = provision_hour_buckets(test_start, test_end)
-
-        hr_bkt[msg_cmd][putdate][puthour].total_put += 1
-        hr_bkt[msg_cmd][putdate][puthour].sum_deq += messages[msg].deq_time
-        if (hr_bkt[msg_cmd][putdate][puthour].min_deq == 0 or
-                hr_bkt[msg_cmd][putdate][puthour].min_deq > messages[msg].deq_time):
-            hr_bkt[msg_cmd][putdate][puthour].min_deq = messages[msg].deq_time
-        if (hr_bkt[msg_cmd][putdate][puthour].max_deq == 0 or
-                hr_bkt[msg_cmd][putdate][puthour].max_deq < messages[msg].deq_time):
-            hr_bkt[msg_cmd][putdate][puthour].max_deq = messages[msg].deq_time
-        hr_bkt[msg_cmd][putdate][puthour].avg_deq = \
-            hr_bkt[msg_cmd][putdate][puthour].sum_deq / hr_bkt[msg_cmd][putdate][puthour].total_put
-
-        # Get time is when the message is delivered
-        getdate = messages[msg].gettime[:10]
-        gethour = messages[msg].gettime[11:13]
-
-        hr_bkt[msg_cmd][getdate][gethour].total_get += 1
-        hr_bkt[msg_cmd][getdate][gethour].sum_del += messages[msg].del_time
-        if (hr_bkt[msg_cmd][getdate][gethour].min_del == 0 or
-                hr_bkt[msg_cmd][getdate][gethour].min_del > messages[msg].del_time):
-            hr_bkt[msg_cmd][getdate][gethour].min_del = messages[msg].del_time
-        if (hr_bkt[msg_cmd][getdate][gethour].max_del == 0 or
-                hr_bkt[msg_cmd][getdate][gethour].max_del < messages[msg].del_time):
-            hr_bkt[msg_cmd][getdate][gethour].max_del = messages[msg].del_time
-
-        hr_bkt[msg_cmd][getdate][gethour].avg_del = \
-            hr_bkt[msg_cmd][getdate][gethour].sum_del / hr_bkt[msg_cmd][getdate][gethour].total_get
-    return hr_bkt
+        fold_msg_into_lists(msg_columns, messages[msg])
+    return msg_columns.hourly_buckets(test_start, test_end)
 
 
 def messages_to_statistics_csv(messages, statistics_file_name):
-    all_statistics = []
+    msg_columns = MiqMsgColumnStore()
     for msg_id in messages:
-        msg = messages[msg_id]
-
-        added = False
-        if len(all_statistics) > 0:
-            for msg_statistics in all_statistics:
-                if msg_statistics.cmd == msg.msg_cmd:
-
-                    if msg.del_time > 0:
-                        msg_statistics.delivertimes.append(float(msg.del_time))
-                        msg_statistics.gets += 1
-                    msg_statistics.dequeuetimes.append(float(msg.deq_time))
-                    msg_statistics.totaltimes.append(float(msg.total_time))
-                    msg_statistics.puts += 1
-                    added = True
-                    break
-
-        if not added:
-            msg_statistics = MiqMsgLists()
-            msg_statistics.cmd = msg.msg_cmd
-            if msg.del_time > 0:
-                msg_statistics.delivertimes.append(float(msg.del_time))
-                msg_statistics.gets = 1
-            msg_statistics.dequeuetimes.append(float(msg.deq_time))
-            msg_statistics.totaltimes.append(float(msg.total_time))
-            msg_statistics.puts = 1
-            all_statistics.append(msg_statistics)
+        fold_msg_into_lists(msg_columns, messages[msg_id])
+    msg_lists_to_statistics_csv(msg_columns.commands, statistics_file_name)
+
 
+def msg_lists_to_statistics_csv(msg_lists, statistics_file_name):
+    all_statistics = msg_lists.values()
     csvdata_path = log_path.join('csv_output', statistics_file_name)
     outputfile = csvdata_path.open('w', ensure=True)
 
@@ -607,12 +625,29 @@ def provision_hour_buckets(test_start, test_end, init=True):
         else:
             for hr in range(24):
                 buckets[date][str(hr).zfill(2)] = hour_bucket_init(init)
-    if init:
-        buckets[''] = {}
-        buckets[''][''] = MiqMsgBucket()
     return buckets
 
 
+def open_evm_logs(evm_files):
+    """Iterates over the lines of evm logs, in the order the files are given
+
+    Args:
+        evm_files: A path, or a list of paths. Paths ending with ``.gz`` are read with gzip.
+    """
+    if isinstance(evm_files, basestring):
+        evm_files = [evm_files]
+    for evm_file in evm_files:
+        if str(evm_file).endswith('.gz'):
+            evmlogfile = gzip.open(str(evm_file), 'rb')
+        else:
+            evmlogfile = open(str(evm_file), 'r')
+        try:
+            for evm_log_line in evmlogfile:
+                yield evm_log_line
+        finally:
+            evmlogfile.close()
+
+
 def top_to_appliance(top_file):
     # Find first miqtop log line
     miqtop_time, timezone_offset = get_first_miqtop(top_file)
@@ -701,7 +736,7 @@ def top_to_appliance(top_file):
         if (line_count % 20000) == 0:
             timediff = time() - runningtime
             runningtime = time()
-            logger.info('Count {} : Parsed 20000 lines in %s', line_count, timediff)
+            logger.info('Count %s : Parsed 20000 lines in %s', line_count, timediff)
     return top_app, len(top_lines)
 
 
@@ -795,7 +830,15 @@ def top_to_workers(workers, top_file):
     return top_workers, len(top_lines)
 
 
-def perf_process_evm(evm_file, top_file):
+def perf_process_evm(evm_file, top_file, processes=1):
+    """Parses evm and top_output logs, and generates the message/worker charts and csv files
+
+    Args:
+        evm_file: Path to the evm log, or a list of paths to rotated evm logs, oldest first;
+            gzipped logs are supported
+        top_file: Path to the top_output log
+        processes: Number of processes to parse the evm log with, None for the number of cpus
+    """
     msg_filters = {
         '-hourly': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"hourly\"'),
         '-daily': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"daily\"'),
@@ -808,22 +851,25 @@ def perf_process_evm(evm_file, top_file):
     starttime = time()
     initialtime = starttime
 
-    logger.info('----------- Parsing evm log file for messages -----------')
-    messages, msg_cmds, test_start, test_end, msg_lc = evm_to_messages(evm_file, msg_filters)
+    logger.info('----------- Parsing evm log file for messages and workers -----------')
+    if processes == 1:
+        evm_stats = evm_to_statistics(evm_file, msg_filters, 'queue-rawdata.csv')
+    else:
+        evm_stats = evm_to_statistics_parallel(evm_file, msg_filters, 'queue-rawdata.csv',
+            processes)
+    msg_cmds, hr_bkt, workers = evm_stats.msg_cmds, evm_stats.hourly_buckets, evm_stats.workers
+    test_start, test_end = evm_stats.test_start, evm_stats.test_end
+    msg_lc, msg_count = evm_stats.line_count, evm_stats.msg_count
+    wkr_mem_exc, wkr_upt_exc, wkr_stp, wkr_int, wkr_ext, wkr_lc = (evm_stats.wkr_mem_exc,
+        evm_stats.wkr_upt_exc, evm_stats.wkr_stp, evm_stats.wkr_int, evm_stats.wkr_ext,
+        evm_stats.wkr_line_count)
     timediff = time() - starttime
     logger.info('----------- Completed Parsing evm log file -----------')
-    logger.info('Parsed %s lines of evm log file for messages in %s', msg_lc, timediff)
-    logger.info('Total # of Messages: %d', len(messages))
+    logger.info('Parsed %s lines of evm log file in %s', msg_lc, timediff)
+    logger.info('Total # of Messages: %d', msg_count)
     logger.info('Total # of Commands: %d', len(msg_cmds))
     logger.info('Start Time: %s', test_start)
     logger.info('End Time: %s', test_end)
-
-    logger.info('----------- Parsing evm log file for workers -----------')
-    starttime = time()
-    workers, wkr_mem_exc, wkr_upt_exc, wkr_stp, wkr_int, wkr_ext, wkr_lc = evm_to_workers(evm_file)
-    timediff = time() - starttime
-    logger.info('----------- Completed Parsing evm log for workers -----------')
-    logger.info('Parsed %s lines of evm log file for workers in %s', wkr_lc, timediff)
     logger.info('Total # of Workers: %d', len(workers))
     logger.info('# Workers Memory Exceeded: %s', wkr_mem_exc)
     logger.info('# Workers Uptime Exceeded: %s', wkr_upt_exc)
@@ -852,17 +898,11 @@ def perf_process_evm(evm_file, top_file):
 
     logger.info('----------- Generating Raw Data csv files -----------')
     starttime = time()
-    generate_raw_data_csv(messages, 'queue-rawdata.csv')
+    # queue-rawdata.csv was written while parsing
     generate_raw_data_csv(workers, 'workers-rawdata.csv')
     timediff = time() - starttime
     logger.info('Generated Raw Data csv files in: %s', timediff)
 
-    logger.info('----------- Generating Hourly Buckets -----------')
-    starttime = time()
-    hr_bkt = messages_to_hourly_buckets(messages, test_start, test_end)
-    timediff = time() - starttime
-    logger.info('Generated Hourly Buckets in: %s', timediff)
-
     logger.info('----------- Generating Hourly Charts and csvs -----------')
     starttime = time()
     generate_hourly_charts_and_csvs(hr_bkt, charts_dir)
@@ -889,7 +929,7 @@ def perf_process_evm(evm_file, top_file):
 
     logger.info('----------- Generating Message Statistics -----------')
     starttime = time()
-    messages_to_statistics_csv(messages, 'queue-statistics.csv')
+    msg_lists_to_statistics_csv(evm_stats.msg_lists, 'queue-statistics.csv')
     timediff = time() - starttime
     logger.info('Generated Message Statistics in: %s', timediff)
 
@@ -923,7 +963,7 @@ def perf_process_evm(evm_file, top_file):
     html_menu.write('Parsed {} lines for messages<br>'.format(msg_lc))
     html_menu.write('Start Time: {}<br>'.format(test_start))
     html_menu.write('End Time: {}<br>'.format(test_end))
-    html_menu.write('Message Count: {}<br>'.format(len(messages)))
+    html_menu.write('Message Count: {}<br>'.format(msg_count))
     html_menu.write('Command Count: {}<br>'.format(len(msg_cmds)))
 
     html_menu.write('Parsed {} lines for workers<br>'.format(wkr_lc))
@@ -944,11 +984,11 @@ def perf_process_evm(evm_file, top_file):
             'target="showframe">{}</a><br>'.format(cmd, cmd))
         html_menu.write('<a href="charts/{}-total.svg" target="showframe">'
             'Total Messages: {} </a><br>'.format(cmd, len(msg_cmds[cmd]['total'])))
+        # messages still on the queue have no hourly get bucket, so they're only counted here
+        cmd_msgs = evm_stats.msg_lists[cmd]
+        html_menu.write('Not Delivered: {}<br>'.format(cmd_msgs.puts - cmd_msgs.gets))
         for dt in sorted(hr_bkt[cmd].keys()):
-            if dt == '':
-                html_menu.write('Queued:&nbsp;')
-            else:
-                html_menu.write('{}:&nbsp;'.format(dt))
+            html_menu.write('{}:&nbsp;'.format(dt))
             html_menu.write('<a href="charts/{}-{}-cmdcnt.svg" target="showframe">'
                 'cnt</a>&nbsp;|&nbsp;'.format(cmd, dt))
             html_menu.write('<a href="charts/{}-{}-dequeue.svg" target="showframe">'
@@ -975,7 +1015,7 @@ def perf_process_evm(evm_file, top_file):
     html_wkr_menu.write('Parsed {} lines for messages<br>'.format(msg_lc))
     html_wkr_menu.write('Start Time: {}<br>'.format(test_start))
     html_wkr_menu.write('End Time: {}<br>'.format(test_end))
-    html_wkr_menu.write('Message Count: {}<br>'.format(len(messages)))
+    html_wkr_menu.write('Message Count: {}<br>'.format(msg_count))
     html_wkr_menu.write('Command Count: {}<br>'.format(len(msg_cmds)))
 
     html_wkr_menu.write('Parsed {} lines for workers<br>'.format(wkr_lc))
@@ -1029,10 +1069,12 @@ def perf_process_evm(evm_file, top_file):
 
 
 class MiqMsgStat(object):
+    # created for every message in the log, so instances have no __dict__
+    headers = ['msg_id', 'msg_cmd', 'msg_args', 'pid_put', 'pid_get', 'puttime', 'gettime',
+        'deq_time', 'del_time', 'total_time']
+    __slots__ = headers
 
     def __init__(self):
-        self.headers = ['msg_id', 'msg_cmd', 'msg_args', 'pid_put', 'pid_get', 'puttime', 'gettime',
-            'deq_time', 'del_time', 'total_time']
         self.msg_id = ''
         self.msg_cmd = ''
         self.msg_args = ''
@@ -1060,15 +1102,178 @@ class MiqMsgLists(object):
         self.cmd = ''
         self.puts = 0
         self.gets = 0
-        self.dequeuetimes = []
-        self.delivertimes = []
-        self.totaltimes = []
+        self.dequeuetimes = array('d')
+        self.delivertimes = array('d')
+        self.totaltimes = array('d')
+
+
+class MiqMsgColumns(object):
+    """Timings of the messages of one command, in columns
+
+    Has the same statistics interface as :py:class:`MiqMsgLists`, with the timings as numpy arrays.
+    The hours the messages were put on and got off the queue are ids of
+    :py:class:`MiqMsgColumnStore` hours.
+    """
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.put_hours = array('i')
+        self.get_hours = array('i')
+        self.deq_times = array('d')
+        self.del_times = array('d')
+        self.total_times = array('d')
+
+    def add(self, put_hour, get_hour, msg):
+        self.put_hours.append(put_hour)
+        self.get_hours.append(get_hour)
+        self.deq_times.append(msg.deq_time)
+        self.del_times.append(msg.del_time)
+        self.total_times.append(msg.total_time)
+
+    @staticmethod
+    def column(values, dtype=numpy.float64):
+        # a single memory copy, instead of converting the values one by one
+        if not values:
+            return numpy.array([], dtype=dtype)
+        return numpy.frombuffer(values, dtype=dtype).copy()
+
+    @property
+    def puts(self):
+        return len(self.deq_times)
+
+    @property
+    def gets(self):
+        return int(numpy.count_nonzero(self.column(self.del_times) > 0))
+
+    @property
+    def dequeuetimes(self):
+        return self.column(self.deq_times)
+
+    @property
+    def delivertimes(self):
+        del_times = self.column(self.del_times)
+        return del_times[del_times > 0]
+
+    @property
+    def totaltimes(self):
+        return self.column(self.total_times)
+
+
+class MiqMsgColumnStore(object):
+    """Message timings in columns keyed by command and hour, aggregated with numpy
+
+    Hours are ``'YYYY-MM-DD HH'`` prefixes of the message timestamps, stored as ids into
+    :py:attr:`hours`; an empty timestamp, for a message which never got off the queue, is the
+    ``''`` hour, which is left out of the hourly buckets.
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.hours = []
+        self._hour_ids = {}
+
+    def hour_id(self, timestamp):
+        """Id of the hour of a timestamp, the hour is added to :py:attr:`hours` if it is new"""
+        hour = timestamp[:13]
+        hour_id = self._hour_ids.get(hour)
+        if hour_id is None:
+            hour_id = self._hour_ids[hour] = len(self.hours)
+            self.hours.append(hour)
+        return hour_id
+
+    def total_times(self):
+        """Per command rounded timings of the delivered messages, for the total time charts"""
+        msg_cmds = {}
+        for cmd, msg_columns in self.commands.iteritems():
+            total_times = msg_columns.totaltimes
+            delivered = total_times != 0
+            msg_cmds[cmd] = {
+                'total': numpy.round(total_times[delivered], 2).tolist(),
+                'queue': numpy.round(msg_columns.dequeuetimes[delivered], 2).tolist(),
+                'execute': numpy.round(msg_columns.column(msg_columns.del_times)[delivered],
+                    2).tolist(),
+            }
+        return msg_cmds
+
+    @staticmethod
+    def group_by_hour(hour_ids, values):
+        """Aggregates values by hour id
+
+        Returns: hour ids, counts, sums, minimums and maximums of each group. Timings of 0 mean
+            the message didn't get that far, so they are left out of the minimums.
+        """
+        order = numpy.argsort(hour_ids, kind='mergesort')
+        hour_ids = hour_ids[order]
+        values = values[order]
+        starts = numpy.flatnonzero(numpy.r_[True, hour_ids[1:] != hour_ids[:-1]])
+        counts = numpy.diff(numpy.r_[starts, len(hour_ids)])
+        sums = numpy.add.reduceat(values, starts)
+        maximums = numpy.maximum.reduceat(values, starts)
+        minimums = numpy.minimum.reduceat(numpy.where(values > 0, values, numpy.inf), starts)
+        minimums[numpy.isinf(minimums)] = 0
+        return hour_ids[starts], counts, sums, minimums, maximums
+
+    def hourly_buckets(self, test_start=None, test_end=None):
+        """Aggregates the timings into ``hr_bkt[msg_cmd][msg_date][msg_hour] = MiqMsgBucket()``
+
+        If ``test_start`` and ``test_end`` are given, every hour between them gets a bucket,
+        even if no messages were put on or got off the queue during that hour. Messages which
+        never got off the queue only count in the bucket of the hour they were put on the queue.
+        """
+        undelivered_hour_id = self._hour_ids.get('')
+        hr_bkt = {}
+        for cmd, msg_columns in self.commands.iteritems():
+            if test_start and test_end:
+                cmd_bkt = hr_bkt[cmd] = provision_hour_buckets(test_start, test_end)
+            else:
+                cmd_bkt = hr_bkt[cmd] = {}
+            if not msg_columns.puts:
+                continue
+
+            def bucket(hour_id):
+                hour = self.hours[hour_id]
+                hours = cmd_bkt.setdefault(hour[:10], {})
+                if hour[11:13] not in hours:
+                    hours[hour[11:13]] = MiqMsgBucket()
+                return hours[hour[11:13]]
+
+            # put on queue, deals with queuing:
+            for hour_id, count, sum_deq, min_deq, max_deq in zip(*(column.tolist()
+                    for column in self.group_by_hour(
+                        msg_columns.column(msg_columns.put_hours, numpy.intc),
+                        msg_columns.dequeuetimes))):
+                bk = bucket(hour_id)
+                bk.total_put = count
+                bk.sum_deq = sum_deq
+                bk.min_deq = min_deq
+                bk.max_deq = max_deq
+                bk.avg_deq = sum_deq / count
+
+            # Get time is when the message is delivered
+            get_hours = msg_columns.column(msg_columns.get_hours, numpy.intc)
+            del_times = msg_columns.column(msg_columns.del_times)
+            if undelivered_hour_id is not None:
+                delivered = get_hours != undelivered_hour_id
+                get_hours, del_times = get_hours[delivered], del_times[delivered]
+            if not len(get_hours):
+                continue
+            for hour_id, count, sum_del, min_del, max_del in zip(*(column.tolist()
+                    for column in self.group_by_hour(get_hours, del_times))):
+                bk = bucket(hour_id)
+                bk.total_get = count
+                bk.sum_del = sum_del
+                bk.min_del = min_del
+                bk.max_del = max_del
+                bk.avg_del = sum_del / count
+        return hr_bkt
 
 
 class MiqMsgBucket(object):
+    headers = ['date', 'hour', 'total_put', 'total_get', 'sum_deq', 'min_deq', 'max_deq',
+        'avg_deq', 'sum_del', 'min_del', 'max_del', 'avg_del']
+    __slots__ = headers
+
     def __init__(self):
-        self.headers = ['date', 'hour', 'total_put', 'total_get', 'sum_deq', 'min_deq', 'max_deq',
-            'avg_deq', 'sum_del', 'min_del', 'max_del', 'avg_del']
         self.date = ''
         self.hour = ''
         self.total_put = 0
@@ -1094,9 +1299,10 @@ class MiqMsgBucket(object):
 
 
 class MiqWorker(object):
+    headers = ['worker_id', 'worker_type', 'pid', 'start_ts', 'end_ts', 'terminated']
+    __slots__ = headers
 
     def __init__(self):
-        self.headers = ['worker_id', 'worker_type', 'pid', 'start_ts', 'end_ts', 'terminated']
         self.worker_id = 0
         self.worker_type = ''
         self.pid = ''
@@ -1111,3 +1317,306 @@ class MiqWorker(object):
     def __str__(self):
         return self.worker_id + ' : ' + self.worker_type + ' : ' + self.pid + ' : ' + \
             str(self.start_ts) + ' : ' + str(self.end_ts) + ' : ' + self.terminated
+
+
+class EvmLogStatistics(object):
+    """Message and worker statistics folded from evm log lines in a single pass
+
+    Lines are fed one at a time with :py:meth:`feed`. A message is only kept in memory while it is
+    in flight; once delivered, it's folded into the hourly buckets and per command timings, and
+    written to the raw data csv. :py:meth:`finish` folds the messages which were never delivered.
+
+    Args:
+        filters: Message args patterns to append to the message command, see
+            :py:func:`perf_process_evm`
+        rawdata_csv_file_name: If set, raw data of each message is written to this csv file
+    """
+
+    def __init__(self, filters, rawdata_csv_file_name=None):
+        self.filters = filters
+        # in flight messages, by message id
+        self.messages = {}
+        self.msg_count = 0
+        # timings of the messages no longer in flight
+        self.msg_columns = MiqMsgColumnStore()
+        # aggregated from msg_columns by finish():
+        # per command rounded timings, for charts: msg_cmds[msg_cmd]['total'|'queue'|'execute']
+        self.msg_cmds = {}
+        # per command MiqMsgColumns, for statistics
+        self.msg_lists = {}
+        # hr_bkt[msg_cmd][msg_date][msg_hour] = MiqMsgBucket()
+        self.hourly_buckets = {}
+        self.test_start = ''
+        self.test_end = ''
+        self.line_count = 0
+
+        self.workers = {}
+        self.wkr_mem_exc = 0
+        self.wkr_upt_exc = 0
+        self.wkr_stp = 0
+        self.wkr_int = 0
+        self.wkr_ext = 0
+        self.wkr_line_count = 0
+
+        if rawdata_csv_file_name:
+            csv_rawdata_path = log_path.join('csv_output', rawdata_csv_file_name)
+            self._rawdata_file = csv_rawdata_path.open('w', ensure=True)
+            self._rawdata_csv = csv.DictWriter(self._rawdata_file,
+                fieldnames=MiqMsgStat().headers, delimiter=',', quotechar='\'',
+                quoting=csv.QUOTE_MINIMAL)
+            self._rawdata_csv.writeheader()
+        else:
+            self._rawdata_file = self._rawdata_csv = None
+
+    def feed(self, evm_log_line):
+        """Folds a single evm log line"""
+        self.line_count += 1
+        evm_log_line = evm_log_line.strip()
+
+        # most lines are not logged from MIQ(), don't even start the regex on those
+        miqmsg_result = 'MIQ(' in evm_log_line and miqmsg.search(evm_log_line)
+        if miqmsg_result:
+            self.feed_msg_line(evm_log_line, miqmsg_result.group(1))
+
+        if (miqwkr_line.search(evm_log_line) or
+                any(marker in evm_log_line for marker in miqwkr_line_markers)):
+            self.wkr_line_count += 1
+            self.feed_worker_line(evm_log_line)
+
+    def feed_msg_line(self, evm_log_line, miqmsg_name):
+        """Folds an evm log line logged from ``MIQ(miqmsg_name)``"""
+        # Obtains the first timestamp in the log file
+        if self.test_start == '':
+            ts, pid = get_msg_timestamp_pid(evm_log_line)
+            self.test_start = ts
+
+        # A message was first put on the queue, this starts its queuing time
+        if miqmsg_name == 'MiqQueue.put':
+            msg_id = get_msg_id(evm_log_line)
+            if msg_id:
+                ts, pid = get_msg_timestamp_pid(evm_log_line)
+                self.test_end = ts
+                msg = self.messages[msg_id] = MiqMsgStat()
+                msg.msg_id = '\'' + msg_id + '\''
+                msg.msg_cmd = get_msg_cmd(evm_log_line)
+                msg.pid_put = pid
+                msg.puttime = ts
+                msg_args = get_msg_args(evm_log_line)
+                if msg_args is False:
+                    logger.debug('Could not obtain message args line #: %s', self.line_count)
+                else:
+                    msg.msg_args = msg_args
+            else:
+                logger.error('Could not obtain message id, line #: %s', self.line_count)
+
+        elif miqmsg_name == 'MiqQueue.get_via_drb':
+            msg_id = get_msg_id(evm_log_line)
+            if msg_id:
+                if msg_id in self.messages:
+                    ts, pid = get_msg_timestamp_pid(evm_log_line)
+                    self.test_end = ts
+                    msg = self.messages[msg_id]
+                    msg.pid_get = pid
+                    msg.gettime = ts
+                    msg.deq_time = get_msg_deq(evm_log_line)
+                else:
+                    logger.error('Message ID not in dictionary: %s', msg_id)
+            else:
+                logger.error('Could not obtain message id, line #: %s', self.line_count)
+
+        elif miqmsg_name == 'MiqQueue.delivered':
+            msg_id = get_msg_id(evm_log_line)
+            if msg_id:
+                ts, pid = get_msg_timestamp_pid(evm_log_line)
+                self.test_end = ts
+                if msg_id in self.messages:
+                    msg = self.messages.pop(msg_id)
+                    msg.del_time = get_msg_del(evm_log_line)
+                    msg.total_time = msg.deq_time + msg.del_time
+                    self.fold_msg(msg)
+                else:
+                    logger.error('Message ID not in dictionary: %s', msg_id)
+            else:
+                logger.error('Could not obtain message id, line #: %s', self.line_count)
+
+    def feed_worker_line(self, evm_log_line):
+        """Folds an evm log line about a worker starting or terminating"""
+        ts, pid = get_msg_timestamp_pid(evm_log_line)
+
+        miqwkr_result = miqwkr.search(evm_log_line)
+        if miqwkr_result:
+            workerid = int(miqwkr_result.group(2))
+            if workerid not in self.workers:
+                worker = self.workers[workerid] = MiqWorker()
+                worker.worker_type = miqwkr_result.group(1)
+                worker.pid = miqwkr_result.group(3)
+                worker.worker_id = workerid
+                worker.start_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+        elif 'evm_worker_uptime_exceeded' in evm_log_line:
+            if self._terminate_worker(miqwkr_id, evm_log_line, ts, 'evm_worker_uptime_exceeded'):
+                self.wkr_upt_exc += 1
+        elif 'evm_worker_memory_exceeded' in evm_log_line:
+            if self._terminate_worker(miqwkr_id, evm_log_line, ts, 'evm_worker_memory_exceeded'):
+                self.wkr_mem_exc += 1
+        elif 'evm_worker_stop' in evm_log_line:
+            if self._terminate_worker(miqwkr_id, evm_log_line, ts, 'evm_worker_stop'):
+                self.wkr_stp += 1
+        elif 'Interrupt' in evm_log_line:
+            for worker in self.workers.itervalues():
+                if not worker.end_ts:
+                    self.wkr_int += 1
+                    worker.terminated = 'Interrupted'
+                    worker.end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+        elif 'Worker exiting.' in evm_log_line:
+            if self._terminate_worker(miqwkr_id_2, evm_log_line, ts, 'Worker Exited'):
+                self.wkr_ext += 1
+
+    def _terminate_worker(self, worker_id_re, evm_log_line, ts, reason):
+        # Returns True if a running worker was terminated
+        miqwkr_id_result = worker_id_re.search(evm_log_line)
+        if miqwkr_id_result:
+            worker = self.workers.get(int(miqwkr_id_result.group(1)))
+            if worker is not None and not worker.terminated:
+                worker.terminated = reason
+                worker.end_ts = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
+                return True
+        return False
+
+    def fold_msg(self, msg):
+        """Folds a message which is no longer in flight into the statistics"""
+        # Filtering over messages, we can better display what is occuring under the covers, as a
+        # daily rollup is picked up off the queue different than a hourly rollup, etc
+        msg_args = msg.msg_args.strip()
+        for p_filter in self.filters:
+            if self.filters[p_filter].search(msg_args):
+                msg.msg_cmd = '{}{}'.format(msg.msg_cmd, p_filter)
+                break
+        fold_msg_into_lists(self.msg_columns, msg)
+        if self._rawdata_csv is not None:
+            self._rawdata_csv.writerow(dict(msg))
+        self.msg_count += 1
+
+    def merge_chunk(self, evm_chunk):
+        """Merges the partial messages of an :py:class:`EvmLogChunk` which follows the lines
+        already parsed or merged"""
+        self.line_count += evm_chunk.line_count
+        if self.test_start == '':
+            self.test_start = evm_chunk.test_start
+        if evm_chunk.test_end:
+            self.test_end = evm_chunk.test_end
+
+        for partial_msg in evm_chunk.partial_messages:
+            (msg_id, msg_cmd, msg_args, pid_put, puttime, pid_get, gettime, deq_time,
+                del_time) = partial_msg
+            if puttime:
+                msg = self.messages[msg_id] = MiqMsgStat()
+                msg.msg_id = '\'' + msg_id + '\''
+                msg.msg_cmd = msg_cmd
+                msg.msg_args = msg_args
+                msg.pid_put = pid_put
+                msg.puttime = puttime
+            elif msg_id in self.messages:
+                msg = self.messages[msg_id]
+            else:
+                logger.error('Message ID not in dictionary: %s', msg_id)
+                continue
+            if gettime:
+                msg.pid_get = pid_get
+                msg.gettime = gettime
+                msg.deq_time = deq_time
+            if del_time is not None:
+                del self.messages[msg_id]
+                msg.del_time = del_time
+                msg.total_time = msg.deq_time + msg.del_time
+                self.fold_msg(msg)
+
+        for evm_log_line in evm_chunk.worker_lines:
+            self.wkr_line_count += 1
+            self.feed_worker_line(evm_log_line)
+
+    def finish(self):
+        """Folds the messages still in flight, and aggregates the statistics"""
+        for msg_id in sorted(self.messages):
+            self.fold_msg(self.messages[msg_id])
+        self.messages.clear()
+
+        self.msg_lists = self.msg_columns.commands
+        self.msg_cmds = self.msg_columns.total_times()
+        if self.test_start and self.test_end:
+            self.hourly_buckets = self.msg_columns.hourly_buckets(self.test_start, self.test_end)
+        else:
+            self.hourly_buckets = self.msg_columns.hourly_buckets()
+
+        if self._rawdata_file is not None:
+            self._rawdata_file.close()
+            self._rawdata_file = self._rawdata_csv = None
+
+
+class EvmLogChunk(EvmLogStatistics):
+    """Partial messages and worker lines parsed from a chunk of an evm log
+
+    Parsed in a worker process of :py:func:`evm_to_statistics_parallel`, and merged with
+    :py:meth:`EvmLogStatistics.merge_chunk`. Instead of being folded, the messages seen in the
+    chunk are kept as compact tuples in :py:attr:`partial_messages`, in the order they were first
+    seen: ``(msg_id, msg_cmd, msg_args, pid_put, puttime, pid_get, gettime, deq_time, del_time)``.
+    Parts of a message not seen in the chunk are empty strings, or None for ``del_time``.
+    Worker lines are kept as they are, to be folded in order when merged.
+    """
+
+    def __init__(self):
+        super(EvmLogChunk, self).__init__({})
+        # msg_id -> index of the message in partial_messages
+        self._partial_index = {}
+        self.partial_messages = []
+        self.worker_lines = []
+
+    def _partial_msg(self, msg_id):
+        if msg_id not in self._partial_index:
+            self._partial_index[msg_id] = len(self.partial_messages)
+            self.partial_messages.append([msg_id, '', '', '', '', '', '', 0.0, None])
+        return self.partial_messages[self._partial_index[msg_id]]
+
+    def feed_msg_line(self, evm_log_line, miqmsg_name):
+        if self.test_start == '':
+            ts, pid = get_msg_timestamp_pid(evm_log_line)
+            self.test_start = ts
+
+        if miqmsg_name not in ('MiqQueue.put', 'MiqQueue.get_via_drb', 'MiqQueue.delivered'):
+            return
+        msg_id = get_msg_id(evm_log_line)
+        if not msg_id:
+            logger.error('Could not obtain message id, chunk line #: %s', self.line_count)
+            return
+        ts, pid = get_msg_timestamp_pid(evm_log_line)
+        self.test_end = ts
+        if miqmsg_name == 'MiqQueue.put':
+            if msg_id in self._partial_index:
+                # the message id is reused, the previous message was put on the queue again
+                del self._partial_index[msg_id]
+            partial_msg = self._partial_msg(msg_id)
+            partial_msg[1] = get_msg_cmd(evm_log_line)
+            msg_args = get_msg_args(evm_log_line)
+            if msg_args is not False:
+                partial_msg[2] = msg_args
+            partial_msg[3] = pid
+            partial_msg[4] = ts
+        elif miqmsg_name == 'MiqQueue.get_via_drb':
+            partial_msg = self._partial_msg(msg_id)
+            partial_msg[5] = pid
+            partial_msg[6] = ts
+            partial_msg[7] = get_msg_deq(evm_log_line)
+        else:
+            self._partial_msg(msg_id)[8] = get_msg_del(evm_log_line)
+
+    def feed_worker_line(self, evm_log_line):
+        self.worker_lines.append(evm_log_line)
+
+    def __getstate__(self):
+        # only what merge_chunk needs is sent back from the worker process
+        return {
+            'line_count': self.line_count,
+            'test_start': self.test_start,
+            'test_end': self.test_end,
+            'partial_messages': map(tuple, self.partial_messages),
+            'worker_lines': self.worker_lines,
+        }
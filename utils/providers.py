@@ -5,7 +5,13 @@ To quickly add all providers::
     setup_providers(validate=False)
 
 """
+import datetime
+import json
+import os
 import random
+import sys
+import threading
+import time
 from collections import Mapping
 
 import cfme.fixtures.pytest_selenium as sel
@@ -18,7 +24,10 @@ from cfme.infrastructure import provider as infrastructure_providers  # NOQA
 from cfme.middleware import provider as middleware_providers  # NOQA
 from fixtures.prov_filter import filtered
 from utils import conf
+from utils.api import rest_api
+from utils.db import cfmedb
 from utils.log import logger, perflog
+from utils.wait import wait_for
 
 
 providers_data = conf.cfme_data.get("management_systems", {})
@@ -26,6 +35,111 @@ providers_data = conf.cfme_data.get("management_systems", {})
 # This is a global variable. Not the most ideal way to do things but how can we track bad providers?
 problematic_providers = set([])
 
+#: Cached management system clients unused for longer than this are dropped (seconds)
+MGMT_CACHE_MAX_IDLE = 30 * 60
+#: Cached management system clients unused for longer than this are checked before reuse (seconds)
+MGMT_CACHE_CHECK_AFTER = 60
+
+
+class MgmtClientCache(object):
+    """Process-wide cache of the management system clients :py:func:`get_mgmt` creates
+
+    Logging in to VMware, RHEV or OpenStack takes a while, so a client is created once for every
+    provider and set of credentials and then reused. The clients are not thread safe, so every
+    thread gets its own. A client which was not used for ``check_after`` seconds is checked
+    before it is handed out again and replaced if the check fails, clients unused for
+    ``max_idle`` seconds are dropped. Replaced and dropped clients are disconnected. The cache is
+    emptied in a forked process, which can't share the connections of its parent.
+    """
+    def __init__(self, max_idle=MGMT_CACHE_MAX_IDLE, check_after=MGMT_CACHE_CHECK_AFTER):
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # (thread, key) -> [client, last used]
+        self._clients = {}
+        # (thread, key) -> lock held while the client is being created or checked
+        self._key_locks = {}
+
+    @staticmethod
+    def key(provider_kwargs):
+        """Hashable fingerprint of the arguments a client is created with"""
+        return json.dumps(
+            {k: v for k, v in provider_kwargs.items() if k != 'logger'},
+            sort_keys=True, default=repr)
+
+    @staticmethod
+    def is_healthy(client):
+        """Whether the client can still talk to its provider, by asking it for the system info"""
+        try:
+            info = client.info
+            if callable(info):
+                info()
+        except (AttributeError, NotImplementedError):
+            # nothing cheap to check with, assume it still works
+            return True
+        except Exception as e:
+            logger.info('Cached %s client failed its health check: %r', type(client).__name__, e)
+            return False
+        return True
+
+    @staticmethod
+    def disconnect(client):
+        """Disconnect a client which is dropped from the cache, it may be broken already"""
+        try:
+            client.disconnect()
+        except Exception as e:
+            logger.info('Dropped %s client failed to disconnect: %r', type(client).__name__, e)
+
+    def _key_lock(self, key):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._pid = os.getpid()
+                self._clients.clear()
+                self._key_locks.clear()
+            idle = self._evict_idle()
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        for client in idle:
+            self.disconnect(client)
+        return key_lock
+
+    def _evict_idle(self):
+        now = time.time()
+        idle = []
+        for key, (client, last_used) in self._clients.items():
+            if now - last_used > self.max_idle:
+                del self._clients[key]
+                idle.append(client)
+        return idle
+
+    def get(self, key, create):
+        """Return the cached client of this thread for the key, create it with ``create()`` if
+        there is none"""
+        key = (threading.current_thread().ident, key)
+        with self._key_lock(key):
+            entry = self._clients.get(key)
+            if entry is not None:
+                client, last_used = entry
+                if time.time() - last_used > self.check_after and not self.is_healthy(client):
+                    self.disconnect(client)
+                    entry = None
+            if entry is None:
+                entry = [create(), time.time()]
+                with self._lock:
+                    self._clients[key] = entry
+            entry[1] = time.time()
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            clients = [client for client, last_used in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            self.disconnect(client)
+
+
+mgmt_cache = MgmtClientCache()
+
 
 def list_providers(allowed_types=None):
     """ Returns list of providers of selected type from configuration.
@@ -48,10 +162,14 @@ def list_providers(allowed_types=None):
     return providers
 
 
-def get_mgmt(provider_key, providers=None, credentials=None):
+def get_mgmt(provider_key, providers=None, credentials=None, cached=True):
     """
     Provides a ``mgmtsystem`` object, based on the request.
 
+    The clients are cached in :py:data:`mgmt_cache` for every thread and reused by later calls, so
+    don't ``disconnect()`` a client you got from the cache. Ask for an uncached one if you need a
+    session of your own.
+
     Args:
         provider_key: The name of a provider, as supplied in the yaml configuration files.
             You can also use the dictionary if you want to pass the provider data directly.
@@ -60,6 +178,8 @@ def get_mgmt(provider_key, providers=None, credentials=None):
             locations. Expects a dict.
         credentials: A set of credentials in the same format as the ``credentials`` yamls files.
             If ``None`` then credentials are loaded from the default locations. Expects a dict.
+        cached: Whether to reuse the cached client for this provider and credentials. With
+            ``False`` a new client is created, and it is not cached.
     Return: A provider instance of the appropriate ``mgmtsystem.MgmtSystemAPIBase``
         subclass
     """
@@ -86,7 +206,11 @@ def get_mgmt(provider_key, providers=None, credentials=None):
         provider_kwargs['provider_key'] = provider_key
     provider_kwargs['logger'] = logger
 
-    return _get_provider_class_by_type(provider['type']).mgmt_class(**provider_kwargs)
+    mgmt_class = _get_provider_class_by_type(provider['type']).mgmt_class
+    if not cached:
+        return mgmt_class(**provider_kwargs)
+    return mgmt_cache.get(
+        mgmt_cache.key(provider_kwargs), lambda: mgmt_class(**provider_kwargs))
 
 
 def _get_provider_class_by_type(prov_type):
@@ -264,13 +388,19 @@ def setup_provider_by_name(provider_name, *args, **kwargs):
     return setup_provider(get_provider_key(provider_name), *args, **kwargs)
 
 
-def setup_providers(prov_classes=('cloud', 'infra'), validate=True, check_existing=True):
+def setup_providers(prov_classes=('cloud', 'infra'), validate=True, check_existing=True,
+                    rest=False):
     """Run :py:func:`setup_provider` for every provider (cloud and infra only, by default)
 
+    The providers are added first and then validated all at once with
+    :py:func:`wait_for_providers_refreshed`, so the setup takes as long as the slowest refresh.
+
     Args:
         prov_classes: list of provider classes to setup ('cloud', 'infra' and 'container')
         validate: see description in :py:func:`setup_provider`
         check_existing: see description in :py:func:`setup_provider`
+        rest: Create the providers which support it in one REST API request, instead of going
+            through the UI
 
     Returns:
         A list of provider object for the created providers, cloud and infrastructure.
@@ -281,37 +411,54 @@ def setup_providers(prov_classes=('cloud', 'infra'), validate=True, check_existi
     added_providers = []
 
     # Defer validation
-    setup_kwargs = {'validate': False, 'check_existing': check_existing}
+    setup_kwargs = {'validate': False, 'check_existing': check_existing, 'rest': rest}
     for pclass in prov_classes:
         added_providers.extend(_setup_providers(pclass, **setup_kwargs))
 
     if validate:
-        for provider in added_providers:
-            provider.validate()
+        wait_for_providers_refreshed(added_providers)
 
     perflog.stop('utils.providers.setup_providers')
 
     return added_providers
 
 
-def _setup_providers(prov_class, validate, check_existing):
+def _setup_providers(prov_class, validate, check_existing, rest=False):
     """Helper to set up all cloud, infra or container providers, and then validate them
 
     Args:
         prov_class: Provider class - 'cloud, 'infra', 'container' or 'middleware' (a string)
         validate: see description in :py:func:`setup_provider`
         check_existing: see description in :py:func:`setup_provider`
+        rest: see description in :py:func:`setup_providers`
 
     Returns:
         A list of provider objects that have been created.
 
     """
 
-    # Check for existing providers all at once, to prevent reloading
-    # the providers page for every provider in cfme_data
+    # Check for existing providers all at once in the database, to prevent going through
+    # the providers pages for every provider in cfme_data
     if not list_providers(BaseProvider.type_mapping[prov_class].provider_types.keys()):
         return []
     if check_existing:
+        try:
+            existing_names = existing_provider_names()
+        except Exception as e:
+            if rest:
+                raise
+            # Fall back to looking for the quadicons on every page
+            logger.warning('Unable to get the existing providers from the database: %r', e)
+            existing_names = None
+    if check_existing and existing_names is not None:
+        add_providers = []
+        for provider_key in list_providers(
+                BaseProvider.type_mapping[prov_class].provider_types.keys()):
+            if providers_data[provider_key]['name'] in existing_names:
+                logger.debug('Provider %s exists, skipping', provider_key)
+            else:
+                add_providers.append(provider_key)
+    elif check_existing:
         navigate = "{}_providers".format(
             BaseProvider.type_mapping[prov_class].page_name)
         sel.force_navigate(navigate)
@@ -337,18 +484,104 @@ def _setup_providers(prov_class, validate, check_existing):
     # Save the provider objects for validation and return
     added_providers = []
 
+    if rest and add_providers and 'create' in rest_api().collections.providers.action.all:
+        rest_providers = [
+            provider for provider in map(get_crud, add_providers) if provider.db_type]
+        if rest_providers:
+            create_providers_rest(rest_providers)
+            added_providers.extend(rest_providers)
+            rest_keys = {provider.key for provider in rest_providers}
+            add_providers = [key for key in add_providers if key not in rest_keys]
+
     for provider_name in add_providers:
         # Don't validate in this step; add all providers, then go back and validate in order
         provider = setup_provider(provider_name, validate=False, check_existing=False)
         added_providers.append(provider)
 
     if validate:
-        for provider in added_providers:
-            provider.validate()
+        wait_for_providers_refreshed(added_providers)
 
     return added_providers
 
 
+def existing_provider_names():
+    """Names of all the providers in the appliance, from the database"""
+    db = cfmedb()
+    ems = db['ext_management_systems']
+    return {name for name, in db.session.query(ems.name)}
+
+
+def create_providers_rest(providers):
+    """Create the providers in one REST API request
+
+    Args:
+        providers: Provider objects which have a ``db_type``, see
+            :py:meth:`cfme.common.provider.BaseProvider.rest_data`
+    """
+    logger.info(
+        'Creating providers through the REST API: %s',
+        ', '.join(provider.name for provider in providers))
+    return rest_api().collections.providers.action.create(
+        *[provider.rest_data() for provider in providers])
+
+
+def wait_for_providers_refreshed(providers, num_sec=1000, delay=30, time_for_refresh=300):
+    """Wait until all the providers are refreshed, like the ``validate()`` of each of them
+
+    One query of ``ext_management_systems`` checks the ``last_refresh_date`` of all the providers
+    still waiting in every round, so the wait takes as long as the slowest refresh, not as long as
+    all of them together. A provider counts as refreshed when its last refresh is at most
+    10 minutes old; the refresh of the providers still waiting is requested again every
+    ``time_for_refresh`` seconds. If they are not all refreshed in time, the details page of each
+    provider still waiting is loaded, so the screenshot shows its possible errors.
+
+    Args:
+        providers: Provider objects to wait for
+        num_sec: How long to wait in total
+        delay: How long to wait between the checks
+        time_for_refresh: How often to request a refresh of the providers still waiting
+    """
+    pending = {provider.name: provider for provider in providers}
+    if not pending:
+        return
+    db = cfmedb()
+    ems = db['ext_management_systems']
+    last_refresh_request = {'time': time.time()}
+
+    def _all_refreshed():
+        now = store.current_appliance.utc_time().replace(tzinfo=None)
+        refresh_dates = dict(
+            db.session.query(ems.name, ems.last_refresh_date).filter(ems.name.in_(list(pending))))
+        for name, refresh_date in refresh_dates.items():
+            if refresh_date is not None and now - refresh_date <= datetime.timedelta(0, 600):
+                logger.info('Provider %s is refreshed', name)
+                del pending[name]
+        if pending and time.time() - last_refresh_request['time'] > time_for_refresh:
+            for provider in pending.values():
+                logger.info('Requesting another refresh of provider %s', provider.name)
+                try:
+                    provider.refresh_provider_relationships()
+                except Exception as e:
+                    logger.warning('Refresh of provider %s failed: %r', provider.name, e)
+            last_refresh_request['time'] = time.time()
+        return not pending
+
+    perflog.start('utils.providers.wait_for_providers_refreshed')
+    try:
+        wait_for(_all_refreshed, message='providers refreshed', num_sec=num_sec, delay=delay,
+                 handle_exception=True)
+    except Exception:
+        exc_info = sys.exc_info()
+        # To see the possible errors, like validate() does
+        for provider in pending.values():
+            try:
+                provider.load_details(refresh=True)
+            except Exception as e:
+                logger.warning('Unable to load the details of provider %s: %r', provider.name, e)
+        raise exc_info[0], exc_info[1], exc_info[2]
+    perflog.stop('utils.providers.wait_for_providers_refreshed')
+
+
 def destroy_vm(provider_mgmt, vm_name):
     """Given a provider backend and VM name, destroy an instance with logging and error guards
 
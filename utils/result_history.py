@@ -0,0 +1,179 @@
+"""Local history of test results, kept in a SQLite database
+
+Every test session records the outcome and duration of its tests, together with the build and
+stream of the appliance they ran against (see :py:mod:`fixtures.result_history`). The history is
+indexed by test ident (``"{location}/{name}"``, like the artifactor and composite reports use),
+build and stream, so questions like "did this test pass on this build already" or "which tests
+flip between passing and failing" are answered without going to the network.
+
+Usage:
+
+    history = ResultHistory()
+    outcomes = history.last_outcomes(build)
+    if outcomes.get(test_ident) == 'passed':
+        ...
+
+"""
+import sqlite3
+import time
+from contextlib import closing
+
+from py.path import local
+
+from utils.path import log_path
+
+#: Default location of the result history database
+default_history_path = log_path.join('result_history.sqlite')
+
+_schema = """
+CREATE TABLE IF NOT EXISTS results (
+    ident TEXT NOT NULL,
+    build TEXT NOT NULL,
+    stream TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    duration REAL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_ident_build ON results (ident, build, timestamp);
+CREATE INDEX IF NOT EXISTS results_build ON results (build, timestamp);
+CREATE INDEX IF NOT EXISTS results_stream ON results (stream, ident, timestamp);
+CREATE TABLE IF NOT EXISTS imports (
+    build TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS imports_build ON imports (build, source);
+"""
+
+
+class ResultHistory(object):
+    """Test outcomes and durations from previous runs
+
+    Args:
+        path: Path to the SQLite database, defaults to :py:data:`default_history_path`
+
+    """
+    #: Seconds to wait for another process (e.g. a slave) to release the database
+    lock_timeout = 30
+
+    def __init__(self, path=None):
+        self.path = local(path) if path else default_history_path
+        self.path.dirpath().ensure(dir=True)
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path.strpath, timeout=self.lock_timeout)
+            self._connection.executescript(_schema)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def record(self, results, build, stream, timestamp=None):
+        """Add the results of a run to the history, in a single transaction
+
+        Args:
+            results: Iterable of ``(ident, outcome, duration)`` tuples, duration may be ``None``
+            build: Build of the appliance the tests ran against
+            stream: Stream of the appliance the tests ran against
+            timestamp: When the tests ran, defaults to now
+
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO results (ident, build, stream, outcome, duration, timestamp) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((ident, build, stream, outcome, duration, timestamp)
+                    for ident, outcome, duration in results))
+
+    def record_report(self, tests, build, stream, timestamp=None, source=None):
+        """Add the tests of a composite/artifactor report to the history
+
+        Args:
+            tests: The ``tests`` of a report, ``{ident: {'statuses': {'overall': ...}, ...}}``
+            source: Where the report comes from (e.g. ``'trackerbot'``), if given the import is
+                remembered, see :py:meth:`has_import`
+
+        Tests without an overall status are skipped.
+
+        """
+        results = []
+        for ident, test in tests.iteritems():
+            outcome = test.get('statuses', {}).get('overall')
+            if not outcome:
+                continue
+            duration = None
+            if test.get('start_time') and test.get('finish_time'):
+                duration = test['finish_time'] - test['start_time']
+            results.append((ident, outcome, duration))
+        self.record(results, build, stream, timestamp)
+        if source is not None:
+            with self.connection:
+                self.connection.execute(
+                    'INSERT INTO imports (build, source, timestamp) VALUES (?, ?, ?)',
+                    (build, source, time.time()))
+        return len(results)
+
+    def has_build(self, build):
+        """Whether there are any results for this build"""
+        with closing(self.connection.execute(
+                'SELECT 1 FROM results WHERE build = ? LIMIT 1', (build,))) as cursor:
+            return cursor.fetchone() is not None
+
+    def has_import(self, build, source):
+        """Whether a report for this build was imported from the source"""
+        with closing(self.connection.execute(
+                'SELECT 1 FROM imports WHERE build = ? AND source = ? LIMIT 1',
+                (build, source))) as cursor:
+            return cursor.fetchone() is not None
+
+    def last_outcomes(self, build):
+        """The latest outcome of every test that ran on this build, as ``{ident: outcome}``"""
+        outcomes = {}
+        with closing(self.connection.execute(
+                'SELECT ident, outcome FROM results WHERE build = ? ORDER BY timestamp',
+                (build,))) as cursor:
+            for ident, outcome in cursor:
+                outcomes[ident] = outcome
+        return outcomes
+
+    def flaky_tests(self, stream, last_runs=10):
+        """Tests which both passed and failed in their last runs on this stream
+
+        Args:
+            stream: Stream to look at
+            last_runs: How many of the latest results of each test to look at
+
+        Returns: ``{ident: (passed count, failed count)}``
+
+        """
+        outcomes = {}
+        with closing(self.connection.execute(
+                'SELECT ident, outcome FROM results WHERE stream = ? '
+                'ORDER BY ident, timestamp DESC', (stream,))) as cursor:
+            for ident, outcome in cursor:
+                test_outcomes = outcomes.setdefault(ident, [])
+                if len(test_outcomes) < last_runs:
+                    test_outcomes.append(outcome)
+        flaky = {}
+        for ident, test_outcomes in outcomes.iteritems():
+            passed = sum(1 for outcome in test_outcomes if outcome in {'passed', 'xfailed'})
+            failed = sum(1 for outcome in test_outcomes if outcome in {'failed', 'error'})
+            if passed and failed:
+                flaky[ident] = (passed, failed)
+        return flaky
+
+    def durations(self, stream=None):
+        """Average duration of every test, on one stream or overall, as ``{ident: seconds}``"""
+        query = 'SELECT ident, AVG(duration) FROM results WHERE duration IS NOT NULL'
+        args = ()
+        if stream is not None:
+            query += ' AND stream = ?'
+            args = (stream,)
+        with closing(self.connection.execute(query + ' GROUP BY ident', args)) as cursor:
+            return dict(cursor.fetchall())
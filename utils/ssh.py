@@ -6,6 +6,8 @@ import socket
 import sys
 from collections import namedtuple
 from os import path as os_path
+from select import select
+from time import time
 from urlparse import urlparse
 
 import paramiko
@@ -25,6 +27,15 @@ from utils.timeutil import parsetime
 # in seconds (float)
 RUNCMD_TIMEOUT = 1200.0
 
+# How much command output is read from the channel at once, in bytes
+RECV_CHUNK_SIZE = 32768
+# Longest line kept in the buffer while waiting for its newline; longer lines are passed on
+# in pieces of this size
+MAX_LINE_LENGTH = 1048576
+# Longest wait for the channel to become readable before checking the command status again,
+# in seconds
+SELECT_INTERVAL = 1.0
+
 
 class SSHResult(namedtuple("SSHResult", ["rc", "output"])):
     """Allows rich comparison for more convenient testing.
@@ -81,6 +92,24 @@ _ssh_pubkey_file = project_path.join('.generated_ssh_key.pub')
 _client_session = []
 
 
+class SSHCommandOutput(object):
+    """Output lines of a running command, returned by :py:meth:`SSHClient.iter_command`
+
+    Iterating yields the stdout and stderr lines of the command, including their newlines.
+    :py:attr:`rc` is the exit status of the command, ``None`` until all the output was read.
+    """
+    def __init__(self, session, lines):
+        self._session = session
+        self._lines = lines
+        self.rc = None
+
+    def __iter__(self):
+        for line, is_stderr in self._lines:
+            yield line
+        self.rc = self._session.recv_exit_status()
+        self._session.close()
+
+
 class SSHClient(paramiko.SSHClient):
     """paramiko.SSHClient wrapper
 
@@ -197,7 +226,7 @@ class SSHClient(paramiko.SSHClient):
             self.connect()
         return super(SSHClient, self).get_transport(*args, **kwargs)
 
-    def run_command(self, command, timeout=RUNCMD_TIMEOUT, reraise=False, ensure_host=False):
+    def _wrap_command(self, command, ensure_host=False):
         if isinstance(command, dict):
             command = version.pick(command)
         logger.info("Running command `%s`", command)
@@ -206,33 +235,99 @@ class SSHClient(paramiko.SSHClient):
                 'source /etc/default/evm; ' + command))
             logger.info("Actually running command `%s`", command)
         template = '{}\n'
-        command = template.format(command)
-
-        output = ''
-        try:
-            session = self.get_transport().open_session()
-            if timeout:
-                session.settimeout(float(timeout))
-            session.exec_command(command)
-            stdout = session.makefile()
-            stderr = session.makefile_stderr()
+        return template.format(command)
+
+    def _exec_command(self, command, timeout):
+        session = self.get_transport().open_session()
+        if timeout:
+            session.settimeout(float(timeout))
+        session.exec_command(command)
+        return session
+
+    def _command_output(self, session, timeout):
+        """Yields ``(data, is_stderr)`` for the raw output of a running command, as it arrives
+
+        Waits for output with ``select`` on the channel instead of polling it, and raises
+        :py:class:`socket.timeout` if the command produces no output and doesn't finish for
+        ``timeout`` seconds. Both streams are read as the data arrives, so neither of them can
+        fill up and block the command.
+        """
+        readers = ((False, session.recv_ready, session.recv),
+                   (True, session.recv_stderr_ready, session.recv_stderr))
+        last_output = time()
+        while True:
+            for is_stderr, ready, recv in readers:
+                while ready():
+                    data = recv(RECV_CHUNK_SIZE)
+                    if not data:
+                        break
+                    last_output = time()
+                    yield data, is_stderr
+            if session.recv_ready() or session.recv_stderr_ready():
+                continue
+            if session.exit_status_ready() or session.closed:
+                break
+            if timeout and time() - last_output > float(timeout):
+                raise socket.timeout('No output from the command for {} seconds'.format(timeout))
+            select([session], [], [], SELECT_INTERVAL)
+        # The last output can arrive together with the exit status, after the streams were found
+        # empty. recv blocks until the end of the output, and returns '' there.
+        for is_stderr, ready, recv in readers:
             while True:
-                if session.recv_ready:
-                    for line in stdout:
-                        output += line
-                        if self._streaming:
-                            sys.stdout.write(line)
-
-                if session.recv_stderr_ready:
-                    for line in stderr:
-                        output += line
-                        if self._streaming:
-                            sys.stderr.write(line)
-
-                if session.exit_status_ready():
+                data = recv(RECV_CHUNK_SIZE)
+                if not data:
                     break
+                yield data, is_stderr
+
+    def _command_lines(self, session, timeout):
+        """Yields ``(line, is_stderr)`` for the output of a running command, as it arrives
+
+        See :py:meth:`_command_output`. Only an incomplete line is kept buffered for each stream,
+        and at most :py:data:`MAX_LINE_LENGTH` of it.
+        """
+        partial = {False: '', True: ''}
+        for data, is_stderr in self._command_output(session, timeout):
+            lines = (partial[is_stderr] + data).split('\n')
+            partial[is_stderr] = lines.pop()
+            for line in lines:
+                yield line + '\n', is_stderr
+            if len(partial[is_stderr]) >= MAX_LINE_LENGTH:
+                yield partial[is_stderr], is_stderr
+                partial[is_stderr] = ''
+        # output that didn't end with a newline
+        for is_stderr in (False, True):
+            if partial[is_stderr]:
+                yield partial[is_stderr], is_stderr
+
+    def run_command(self, command, timeout=RUNCMD_TIMEOUT, reraise=False, ensure_host=False,
+            line_callback=None):
+        """Run a command and wait for it to finish
+
+        Args:
+            command: The command to run, or a dict of commands to :py:func:`utils.version.pick`
+            timeout: Seconds to wait for output from the command before giving up
+            reraise: Raise :py:class:`paramiko.SSHException` instead of returning a failed result
+            ensure_host: Run the command on the host, even if the appliance is in a container
+            line_callback: Called with every line of the output (stdout and stderr) as soon as it
+                arrives, the line includes its newline
+
+        Returns: :py:class:`SSHResult` with the exit status and the complete output
+        """
+        command = self._wrap_command(command, ensure_host)
+        output = []
+        try:
+            session = self._exec_command(command, timeout)
+            for line, is_stderr in self._command_lines(session, timeout):
+                output.append(line)
+                if self._streaming:
+                    if is_stderr:
+                        sys.stderr.write(line)
+                    else:
+                        sys.stdout.write(line)
+                if line_callback is not None:
+                    line_callback(line)
             exit_status = session.recv_exit_status()
-            return SSHResult(exit_status, output)
+            return SSHResult(exit_status, ''.join(output))
         except paramiko.SSHException as exc:
             if reraise:
                 raise
@@ -241,12 +336,60 @@ class SSHClient(paramiko.SSHClient):
         except socket.timeout as e:
             logger.error("Command `%s` timed out.", command)
             logger.exception(e)
-            logger.error("Output of the command before it failed was:\n%s", output)
+            logger.error("Output of the command before it failed was:\n%s", ''.join(output))
             raise
 
         # Returning two things so tuple unpacking the return works even if the ssh client fails
         return SSHResult(1, None)
 
+    def run_command_to_file(self, command, local_file, timeout=RUNCMD_TIMEOUT, ensure_host=False):
+        """Run a command and write its raw stdout to a local file as it arrives
+
+        The output is written unchanged, so this can transfer binary output like a compressed
+        stream, without storing it on the remote side first.
+
+        Args:
+            command: The command to run
+            local_file: Path of the local file to write the output to
+            timeout: Seconds to wait for output from the command before giving up
+            ensure_host: Run the command on the host, even if the appliance is in a container
+
+        Returns: :py:class:`SSHResult` with the exit status and the stderr output of the command
+        """
+        command = self._wrap_command(command, ensure_host)
+        session = self._exec_command(command, timeout)
+        try:
+            stderr = []
+            with open(local_file, 'wb') as output_file:
+                for data, is_stderr in self._command_output(session, timeout):
+                    if is_stderr:
+                        stderr.append(data)
+                    else:
+                        output_file.write(data)
+            exit_status = session.recv_exit_status()
+            return SSHResult(exit_status, ''.join(stderr))
+        finally:
+            session.close()
+
+    def iter_command(self, command, timeout=RUNCMD_TIMEOUT, ensure_host=False):
+        """Run a command and iterate over its output lines as they arrive
+
+        Unlike :py:meth:`run_command`, the output is not kept, so this is suitable for commands
+        with a lot of output. The exit status is available once all the lines were read.
+
+        Usage:
+
+            output = ssh_client.iter_command('tail -n 1000 /var/www/miq/vmdb/log/evm.log')
+            for line in output:
+                print(line.rstrip())
+            print(output.rc)
+
+        Returns: :py:class:`SSHCommandOutput`
+        """
+        command = self._wrap_command(command, ensure_host)
+        session = self._exec_command(command, timeout)
+        return SSHCommandOutput(session, self._command_lines(session, timeout))
+
     def cpu_spike(self, seconds=60, cpus=2, **kwargs):
         """Creates a CPU spike of specific length and processes.
 
@@ -448,37 +591,92 @@ class SSHClient(paramiko.SSHClient):
 
 
 class SSHTail(SSHClient):
+    """Iterates over the lines appended to a remote file since the previous iteration
 
+    Every iteration runs a single command over the client's persistent transport, which checks
+    the inode and size of the file and streams everything past the offset read so far. The data
+    is read in large chunks and split into lines locally, an incomplete last line is held back
+    until the rest of it is written. If the file was rotated (its inode changed) or truncated
+    (it's smaller than the offset), it's read again from its beginning.
+
+    The first iteration only finds the end of the file, unless :py:meth:`set_initial_file_end`
+    was called before.
+    """
     def __init__(self, remote_filename, **connect_kwargs):
         super(SSHTail, self).__init__(stream_output=False, **connect_kwargs)
         self._remote_filename = remote_filename
-        self._sftp_client = None
         self._remote_file_size = None
+        self._remote_file_inode = None
+        self._partial_line = ''
 
-    def __iter__(self):
-        with self as sshtail:
-            fstat = sshtail._sftp_client.stat(self._remote_filename)
-            if self._remote_file_size is not None:
-                if self._remote_file_size < fstat.st_size:
-                    remote_file = self._sftp_client.open(self._remote_filename, 'r')
-                    remote_file.seek(self._remote_file_size, 0)
-                    while (remote_file.tell() < fstat.st_size):
-                        line = remote_file.readline().rstrip()
-                        yield line
-            self._remote_file_size = fstat.st_size
+    def _stat_command(self):
+        # the status of the assignment is the status of stat, unlike the status of ``set``
+        return 'f={}; s=$(stat -L -c "%i %s" "$f") || exit 1; set -- $s'.format(
+            quote(self._remote_filename))
 
-    def __enter__(self):
-        self.connect(**self._connect_kwargs)
-        self._sftp_client = self.open_sftp()
-        return self
-
-    def __exit__(self, *args, **kwargs):
-        self._sftp_client.close()
+    def __iter__(self):
+        if self._remote_file_size is None:
+            self.set_initial_file_end()
+            return
+        command = (
+            '{stat}; if [ "$1" = "{inode}" ] && [ "$2" -ge {offset} ]; '
+            'then echo append; tail -c +{start} "$f"; else echo "reset $1"; cat "$f"; fi').format(
+                stat=self._stat_command(), inode=self._remote_file_inode,
+                offset=self._remote_file_size, start=self._remote_file_size + 1)
+        session = self._exec_command(command, RUNCMD_TIMEOUT)
+        try:
+            header = None
+            data = ''
+            while True:
+                chunk = session.recv(RECV_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if header is None:
+                    data += chunk
+                    if '\n' not in data:
+                        continue
+                    header, data = data.split('\n', 1)
+                    header_fields = header.split()
+                    if header_fields == ['append']:
+                        pass
+                    elif len(header_fields) == 2 and header_fields[0] == 'reset':
+                        logger.debug('%s was rotated or truncated, reading it from the start',
+                            self._remote_filename)
+                        if self._partial_line:
+                            yield self._partial_line.rstrip()
+                        self._partial_line = ''
+                        self._remote_file_size = 0
+                        self._remote_file_inode = header_fields[1]
+                    else:
+                        logger.warning('Unable to tail %s, unexpected output %r',
+                            self._remote_filename, header)
+                        return
+                else:
+                    data = chunk
+                self._remote_file_size += len(data)
+                lines = (self._partial_line + data).split('\n')
+                self._partial_line = lines.pop()
+                for line in lines:
+                    yield line.rstrip()
+            if session.recv_exit_status() != 0:
+                logger.warning('Unable to tail %s', self._remote_filename)
+        finally:
+            session.close()
 
     def set_initial_file_end(self):
-        with self as sshtail:
-            fstat = sshtail._sftp_client.stat(self._remote_filename)
-            self._remote_file_size = fstat.st_size  # Seed initial size of file
+        """Find the current end of the file, the next iteration starts from there"""
+        result = self.run_command('{}; echo "$1 $2"'.format(self._stat_command()),
+            ensure_host=True)
+        if result.rc != 0:
+            raise IOError('Unable to stat {}: {}'.format(self._remote_filename, result.output))
+        try:
+            inode, size = result.output.split()
+            size = int(size)
+        except ValueError:
+            raise IOError('Unable to stat {}: {!r}'.format(self._remote_filename, result.output))
+        self._remote_file_inode = inode
+        self._remote_file_size = size  # Seed initial size of file
+        self._partial_line = ''
 
 
 def keygen():
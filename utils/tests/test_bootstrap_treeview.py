@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from widgetastic_patternfly import BootstrapTreeview
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class FakeTree(object):
+    """Renders items like the bootstrap treeview, children of a clicked node load lazily"""
+    def __init__(self, nodes):
+        # nodeid -> (text, children nodeids)
+        self.nodes = nodes
+        self.expanded = set()
+        self.loading = set()
+        self.clicks = []
+        # nodeid -> how many of its clicks get lost
+        self.dropped = {}
+
+    def dump(self):
+        items = []
+
+        def render(nodeid, indent):
+            text, children = self.nodes[nodeid]
+            items.append({
+                'nodeid': nodeid, 'text': text, 'indent': indent, 'expandable': bool(children),
+                'expanded': nodeid in self.expanded, 'loading': nodeid in self.loading,
+                'checked': None,
+                'image': 'background-image: url("/assets/100/folder-8dd9a0a1.png");'})
+            if nodeid in self.expanded:
+                for child in children:
+                    render(child, indent + 1)
+
+        for nodeid in sorted(self.nodes):
+            if '.' not in nodeid:
+                render(nodeid, 0)
+        # the nodes clicked before this read finish loading
+        self.expanded.update(self.loading)
+        self.loading.clear()
+        return items
+
+    def click(self, nodeids):
+        self.clicks.append(nodeids)
+        for nodeid in nodeids:
+            if self.dropped.get(nodeid):
+                self.dropped[nodeid] -= 1
+            elif nodeid in self.expanded:
+                self.expanded.remove(nodeid)
+            else:
+                self.loading.add(nodeid)
+
+
+@pytest.fixture
+def tree():
+    return FakeTree({
+        '0': ('Datacenters', ['0.0', '0.1']),
+        '0.0': ('Cluster', ['0.0.0']),
+        '0.0.0': ('host', []),
+        '0.1': ('Empty', []),
+        '1': ('Templates', ['1.0']),
+        '1.0': ('template', []),
+    })
+
+
+def test_expand_items_by_levels(tree):
+    items = BootstrapTreeview.expand_items(tree.dump, tree.click, '0', delay=0)
+    assert [item['nodeid'] for item in items] == ['0', '0.0', '0.0.0', '0.1']
+    # one click call per level of the subtree
+    assert tree.clicks == [['0'], ['0.0']]
+    assert BootstrapTreeview.nest_items(items) == [
+        ['Datacenters', [['Cluster', ['host']], 'Empty']]]
+
+    BootstrapTreeview.collapse_items(tree.dump, tree.click, items, delay=0)
+    assert tree.clicks[-1] == ['0.0', '0']
+    assert not tree.expanded
+
+
+def test_expand_whole_tree(tree):
+    items = BootstrapTreeview.expand_items(tree.dump, tree.click, None, delay=0)
+    assert BootstrapTreeview.nest_items(items) == [
+        ['Datacenters', [['Cluster', ['host']], 'Empty']],
+        ['Templates', ['template']]]
+    assert BootstrapTreeview.nest_items(
+        BootstrapTreeview.subtree_items(items, '1'), include_images=True) == [
+            [('folder', 'Templates'), [('folder', 'template')]]]
+    assert BootstrapTreeview.subtree_items(items, '2') == []
+
+
+def test_expand_items_dropped_click(tree):
+    tree.dropped['0.0'] = 1
+    items = BootstrapTreeview.expand_items(tree.dump, tree.click, '0', delay=0)
+    assert [item['nodeid'] for item in items] == ['0', '0.0', '0.0.0', '0.1']
+    assert tree.clicks == [['0'], ['0.0'], ['0.0']]
+
+
+def test_expand_items_never_expanded(tree):
+    tree.dropped['0.0'] = 3
+    with pytest.raises(Exception) as excinfo:
+        BootstrapTreeview.expand_items(tree.dump, tree.click, '0', delay=0)
+    assert 'nodes 0.0 after 3 clicks' in str(excinfo.value)
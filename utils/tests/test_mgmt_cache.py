@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from utils.providers import MgmtClientCache
+
+pytestmark = [pytest.mark.nondestructive, pytest.mark.skip_selenium]
+
+
+class FakeClient(object):
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.connected = True
+
+    def info(self):
+        if not self.healthy:
+            raise IOError('Session expired')
+        return 'Fake system 1.0'
+
+    def disconnect(self):
+        if not self.healthy:
+            raise IOError('Session expired')
+        self.connected = False
+
+
+def test_client_reused():
+    cache = MgmtClientCache()
+    key = cache.key({'hostname': 'vsphere', 'username': 'admin', 'logger': object()})
+    client = cache.get(key, FakeClient)
+    assert cache.get(key, FakeClient) is client
+    other_key = cache.key({'hostname': 'vsphere', 'username': 'other'})
+    assert cache.get(other_key, FakeClient) is not client
+
+
+def test_unhealthy_client_replaced():
+    cache = MgmtClientCache(check_after=0)
+    client = cache.get('key', FakeClient)
+    client.healthy = False
+    new_client = cache.get('key', FakeClient)
+    assert new_client is not client
+    assert cache.get('key', FakeClient) is new_client
+    # the failing disconnect of the broken client is ignored
+    assert client.connected
+
+
+def test_idle_client_evicted():
+    cache = MgmtClientCache(max_idle=-1)
+    client = cache.get('key', FakeClient)
+    assert cache.get('key', FakeClient) is not client
+    assert not client.connected
+
+
+def test_client_per_thread():
+    cache = MgmtClientCache()
+    client = cache.get('key', FakeClient)
+    thread_clients = []
+
+    def get_twice():
+        thread_clients.append(cache.get('key', FakeClient))
+        assert cache.get('key', FakeClient) is thread_clients[-1]
+
+    threads = [threading.Thread(target=get_twice) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(thread_clients) == 10
+    assert client not in thread_clients
+    assert cache.get('key', FakeClient) is client
+
+    cache.clear()
+    assert not client.connected
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils.appliance.implementations.ui import navigation_identity
+
+pytestmark = [pytest.mark.nondestructive, pytest.mark.skip_selenium]
+
+
+class Provider(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class Vm(object):
+    def __init__(self, name, provider):
+        self.name = name
+        self.provider = provider
+        self.appliance = object()
+        self._cache = {}
+
+
+def test_class_identity():
+    assert navigation_identity(Vm) is Vm
+
+
+def test_instance_identity():
+    vm = Vm('vm1', Provider('vsphere'))
+    assert navigation_identity(vm) == navigation_identity(Vm('vm1', Provider('vsphere')))
+    assert navigation_identity(vm) != navigation_identity(Vm('vm1', Provider('rhevm')))
+    assert navigation_identity(vm) != navigation_identity(Vm('vm2', Provider('vsphere')))
+    hash(navigation_identity(vm))
+
+
+def test_no_identity():
+    assert navigation_identity(object()) is None
+    assert navigation_identity(Provider.__new__(Provider)) is None
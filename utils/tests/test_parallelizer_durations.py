@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from fixtures.parallelizer.durations import DurationHistory, SlaveReservations
+from utils.result_history import ResultHistory
+
+pytestmark = [pytest.mark.nondestructive, pytest.mark.skip_selenium]
+
+
+@pytest.fixture
+def results(request, tmpdir):
+    results = ResultHistory(tmpdir.join('result_history.sqlite').strpath)
+    request.addfinalizer(results.close)
+    return results
+
+
+@pytest.fixture
+def history(results):
+    return DurationHistory(results)
+
+
+def test_duration_history_streams(results):
+    results.record([('a.py/test_a', 'passed', 10.0), ('a.py/test_b', 'passed', 4.0)],
+        '5.8.0.1', '5.8')
+    results.record([('a.py/test_a', 'failed', 18.0)], '5.8.0.2', '5.8')
+    results.record([('a.py/test_a', 'passed', 100.0), ('a.py/test_c', 'passed', 6.0)],
+        '5.7.0.1', '5.7')
+    history = DurationHistory(results, stream='5.8')
+    history.idents = {'a.py::test_a': 'a.py/test_a', 'a.py::test_c': 'a.py/test_c'}
+    history.load()
+    # the average of the runs on the stream
+    assert history.estimate('a.py::test_a') == 14.0
+    # never ran on the stream
+    assert history.estimate('a.py::test_c') == 6.0
+
+    history = DurationHistory(results)
+    history.load()
+    assert history.estimate('a.py/test_a') == 128.0 / 3
+
+
+def test_duration_history_default_duration(results, history):
+    history.load()
+    assert history.estimate('test_unknown') == DurationHistory.fallback_duration
+    results.record([('test_a', 'passed', 2.0), ('test_b', 'passed', 4.0)], '5.8.0.1', '5.8')
+    history.load()
+    assert history.estimate('test_unknown') == 3.0
+    assert history.group_estimate(['test_a', 'test_unknown']) == 5.0
+
+
+def test_reservations_chunk(history):
+    history.durations = {'test_a': 100.0, 'test_b': 250.0, 'test_c': 100.0, 'test_d': 10.0}
+    reservations = SlaveReservations(history, chunk_seconds=300)
+    reservations.reserve('gw0', ['test_a', 'test_b', 'test_c', 'test_d'])
+    assert reservations.chunk('gw0') == ['test_a', 'test_b']
+    assert reservations.chunk('gw0') == ['test_c', 'test_d']
+    assert 'gw0' not in reservations
+    assert reservations.chunk('gw0') == []
+
+
+def test_reservations_steal(history):
+    reservations = SlaveReservations(history, chunk_seconds=300)
+    reservations.reserve('gw0', ['test_a', 'test_b'])
+    reservations.reserve('gw1', ['test_{}'.format(i) for i in range(6)])
+    assert reservations.steal('gw2', lambda test: True) == ('gw1', 3)
+    assert reservations.chunk('gw2') == ['test_3', 'test_4', 'test_5']
+    assert reservations.release('gw1') == ['test_0', 'test_1', 'test_2']
+
+
+def test_reservations_steal_only_allowed(history):
+    reservations = SlaveReservations(history, chunk_seconds=300)
+    reservations.reserve('gw0', ['test_a[rhevm]', 'test_b[vsphere]', 'test_c[vsphere]'])
+    reservations.reserve('gw1', ['test_d[ec2]'] * 4)
+
+    # nothing of the largest reservation is allowed, the next one is stolen from
+    def can_take(test):
+        return 'vsphere' in test
+
+    assert reservations.steal('gw2', can_take) == ('gw0', 2)
+    assert reservations.release('gw2') == ['test_b[vsphere]', 'test_c[vsphere]']
+    assert reservations.release('gw0') == ['test_a[rhevm]']
+    assert reservations.steal('gw2', lambda test: False) == (None, 0)
+    assert reservations.release('gw1') == ['test_d[ec2]'] * 4
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from fixtures.parallelizer.durations import DurationHistory, SlaveReservations
+from fixtures.parallelizer.pool import ProviderGroupPool, allocate_provider, group_provider
+
+pytestmark = [pytest.mark.nondestructive, pytest.mark.skip_selenium]
+
+providers = ['vsphere55', 'vsphere', 'rhevm', 'ec2']
+
+
+@pytest.fixture
+def pool():
+    return ProviderGroupPool([
+        ['test_a.py::test_a[vsphere]', 'test_a.py::test_b[vsphere]'],
+        ['test_a.py::test_a[rhevm]'],
+        ['test_b.py::test_c'],
+        ['test_a.py::test_a[ec2]'],
+        ['test_c.py::test_d[vsphere55]'],
+        ['test_b.py::test_e[rhevm]'],
+    ], providers)
+
+
+def test_group_provider():
+    assert group_provider(['test_a.py::test_a[vsphere55]'], providers) == 'vsphere55'
+    assert group_provider(['test_a.py::test_a[vsphere]'], providers) == 'vsphere'
+    assert group_provider(['test_a.py::test_a[small]'], providers) is None
+    assert group_provider(['test_a.py::test_a', 'test_a.py::test_b[ec2]'], providers) is None
+
+
+def test_pool_order(pool):
+    assert len(pool) == 6
+    assert pool.used_providers == set(providers)
+    assert pool.first() == (0, 'vsphere')
+    assert pool.take(0) == ['test_a.py::test_a[vsphere]', 'test_a.py::test_b[vsphere]']
+    assert pool.first() == (1, 'rhevm')
+    assert pool.first(['ec2', 'vsphere55']) == (3, 'ec2')
+    assert pool.first(['vsphere']) == (None, None)
+    assert len(pool) == 5
+
+
+def test_pool_affinity(pool):
+    # below the limit, the slave gets the next group whatever its provider
+    assert pool.first_allowed(['ec2'], limit=2) == (0, 'vsphere')
+    # at the limit, the next group for its providers or without a provider
+    assert pool.first_allowed(['ec2', 'rhevm'], limit=2) == (1, 'rhevm')
+    pool.take(1)
+    assert pool.first_allowed(['ec2', 'rhevm'], limit=2) == (2, None)
+    pool.take(2)
+    assert pool.first_allowed(['ec2', 'rhevm'], limit=2) == (3, 'ec2')
+    pool.take(3)
+    assert pool.first_allowed(['ec2', 'rhevm'], limit=2) == (5, 'rhevm')
+    pool.take(5)
+    # only groups for other providers are left, the appliance has to be cleansed
+    assert pool.first_allowed(['ec2', 'rhevm'], limit=2) == (None, None)
+    assert pool.first_allowed([], limit=2) == (0, 'vsphere')
+
+
+def test_allocate_provider():
+    allocation = ['vsphere']
+    assert allocate_provider(allocation, None, limit=2)
+    assert allocate_provider(allocation, 'vsphere', limit=2)
+    assert allocation == ['vsphere']
+    assert allocate_provider(allocation, 'rhevm', limit=2)
+    assert allocation == ['vsphere', 'rhevm']
+    assert not allocate_provider(allocation, 'ec2', limit=2)
+    assert allocation == ['vsphere', 'rhevm']
+
+
+def test_steal_across_providers():
+    reservations = SlaveReservations(DurationHistory(None), chunk_seconds=300)
+    reservations.reserve('gw0', [
+        'test_a[vsphere]', 'test_b[vsphere]', 'test_c[vsphere]', 'test_d[vsphere]',
+        'test_a[ec2]', 'test_a[rhevm]', 'test_e', 'test_b[ec2]'])
+    allocation = ['vsphere']
+
+    def can_take(test):
+        return allocate_provider(allocation, group_provider([test], providers), limit=2)
+
+    # the second half: the first new provider fits under the limit, the next one doesn't
+    assert reservations.steal('gw1', can_take) == ('gw0', 3)
+    assert allocation == ['vsphere', 'ec2']
+    assert reservations.release('gw1') == ['test_a[ec2]', 'test_e', 'test_b[ec2]']
+    assert reservations.release('gw0') == [
+        'test_a[vsphere]', 'test_b[vsphere]', 'test_c[vsphere]', 'test_d[vsphere]',
+        'test_a[rhevm]']
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import gzip
+
+import pytest
+
+from utils.perf_message_stats import (MiqMsgColumnStore, MiqMsgStat, evm_to_statistics,
+    evm_to_statistics_parallel, fold_msg_into_lists)
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+log_prefix = '[----] I, [2016-05-10T{} #{}:b15814]  INFO -- : '
+
+evm_log_lines = [
+    log_prefix.format('08:59:58.100000', 100) +
+    'MIQ(PriorityWorker) ID [15], PID [6461], GUID [abc] started',
+    log_prefix.format('08:59:59.100000', 200) +
+    'MIQ(MiqQueue.put) Message id: [1], Command: [Vm.perf_capture], Args: ["2016-05-10T08:00:00Z", '
+    '"hourly"]',
+    log_prefix.format('09:00:01.100000', 200) +
+    'MIQ(MiqQueue.put) Message id: [2], Command: [Vm.scan], Args: []',
+    log_prefix.format('09:00:02.100000', 6461) +
+    'MIQ(MiqQueue.get_via_drb) Message id: [1], Command: [Vm.perf_capture], '
+    'Dequeued in: [3.0] seconds',
+    log_prefix.format('09:00:04.100000', 6461) +
+    'MIQ(MiqQueue.delivered) Message id: [1], State: [ok], Delivered in [2.0] seconds',
+    log_prefix.format('10:30:00.100000', 100) +
+    'MIQ(MiqServer.validate_worker) Worker [PriorityWorker] with ID: [15], '
+    'process [6461] exceeded "evm_worker_memory_exceeded"',
+]
+
+
+@pytest.fixture
+def evm_log(tmpdir):
+    evm_file = tmpdir.join('evm.log')
+    evm_file.write('\n'.join(evm_log_lines) + '\n')
+    return evm_file.strpath
+
+
+@pytest.fixture
+def filters():
+    import re
+    return {'-hourly': re.compile(r'\"[0-9\-]*T[0-9\:]*Z\",\s\"hourly\"')}
+
+
+def test_evm_to_statistics_messages(evm_log, filters):
+    evm_stats = evm_to_statistics(evm_log, filters)
+    assert evm_stats.line_count == len(evm_log_lines)
+    assert evm_stats.msg_count == 2
+    # nothing is left in flight once the log is finished
+    assert not evm_stats.messages
+    # the first MIQ() line starts the test, even if it's not a message
+    assert evm_stats.test_start == '2016-05-10 08:59:58.100000'
+    assert evm_stats.test_end == '2016-05-10 09:00:04.100000'
+
+    assert list(evm_stats.msg_cmds['Vm.perf_capture-hourly']['total']) == [5.0]
+    # undelivered messages have no total time
+    assert list(evm_stats.msg_cmds['Vm.scan']['total']) == []
+    assert evm_stats.msg_lists['Vm.scan'].puts == 1
+    assert evm_stats.msg_lists['Vm.scan'].gets == 0
+
+    buckets = evm_stats.hourly_buckets['Vm.perf_capture-hourly']
+    assert buckets['2016-05-10']['08'].total_put == 1
+    assert buckets['2016-05-10']['08'].avg_deq == 3.0
+    assert buckets['2016-05-10']['09'].total_get == 1
+    assert buckets['2016-05-10']['09'].max_del == 2.0
+    # undelivered messages only count in the hour they were put on the queue
+    scan_buckets = evm_stats.hourly_buckets['Vm.scan']
+    assert '' not in scan_buckets
+    assert sum(bk.total_put for hours in scan_buckets.values() for bk in hours.values()) == 1
+    assert sum(bk.total_get for hours in scan_buckets.values() for bk in hours.values()) == 0
+
+
+def test_evm_to_statistics_workers(evm_log, filters):
+    evm_stats = evm_to_statistics(evm_log, filters)
+    assert evm_stats.wkr_line_count == 2
+    assert evm_stats.wkr_mem_exc == 1
+    worker = evm_stats.workers[15]
+    assert worker.worker_type == 'PriorityWorker'
+    assert worker.pid == '6461'
+    assert worker.terminated == 'evm_worker_memory_exceeded'
+
+
+def test_evm_to_statistics_rotated_gzip(evm_log, filters, tmpdir):
+    # the same log, split into a gzipped rotated log and the current log
+    rotated_file = tmpdir.join('evm.log-20160510.gz').strpath
+    rotated_log = gzip.open(rotated_file, 'wb')
+    rotated_log.write('\n'.join(evm_log_lines[:3]) + '\n')
+    rotated_log.close()
+    current_file = tmpdir.join('evm.log.current')
+    current_file.write('\n'.join(evm_log_lines[3:]) + '\n')
+
+    evm_stats = evm_to_statistics([rotated_file, current_file.strpath], filters)
+    single_stats = evm_to_statistics(evm_log, filters)
+    assert evm_stats.line_count == single_stats.line_count
+    assert evm_stats.msg_count == single_stats.msg_count
+    assert (list(evm_stats.msg_cmds['Vm.perf_capture-hourly']['total']) ==
+        list(single_stats.msg_cmds['Vm.perf_capture-hourly']['total']))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 300, 100000])
+def test_evm_to_statistics_parallel(evm_log, filters, chunk_size):
+    # messages put and delivered in different chunks must still be joined
+    evm_stats = evm_to_statistics_parallel(evm_log, filters, processes=2, chunk_size=chunk_size)
+    single_stats = evm_to_statistics(evm_log, filters)
+    assert evm_stats.line_count == single_stats.line_count
+    assert evm_stats.msg_count == single_stats.msg_count
+    assert evm_stats.test_start == single_stats.test_start
+    assert evm_stats.test_end == single_stats.test_end
+    assert sorted(evm_stats.msg_cmds) == sorted(single_stats.msg_cmds)
+    for cmd in single_stats.msg_cmds:
+        assert (list(evm_stats.msg_cmds[cmd]['total']) ==
+            list(single_stats.msg_cmds[cmd]['total']))
+    assert evm_stats.wkr_mem_exc == single_stats.wkr_mem_exc
+    assert evm_stats.workers[15].terminated == single_stats.workers[15].terminated
+
+
+def test_column_store_hourly_buckets():
+    msg_columns = MiqMsgColumnStore()
+    for deq_time, del_time in [(1.0, 4.0), (3.0, 0.0), (2.0, 2.0)]:
+        msg = MiqMsgStat()
+        msg.msg_cmd = 'Vm.scan'
+        msg.puttime = '2016-05-10 09:10:00.000000'
+        msg.gettime = '2016-05-10 10:10:00.000000'
+        msg.deq_time = deq_time
+        msg.del_time = del_time
+        msg.total_time = deq_time + del_time
+        fold_msg_into_lists(msg_columns, msg)
+
+    hr_bkt = msg_columns.hourly_buckets('2016-05-10 08:00:00.000000', '2016-05-10 10:59:00.000000')
+    buckets = hr_bkt['Vm.scan']['2016-05-10']
+    assert sorted(buckets) == ['08', '09', '10']
+    assert buckets['08'].total_put == 0
+    assert buckets['09'].total_put == 3
+    assert buckets['09'].sum_deq == 6.0
+    assert buckets['09'].min_deq == 1.0
+    assert buckets['09'].max_deq == 3.0
+    assert buckets['09'].avg_deq == 2.0
+    assert buckets['10'].total_get == 3
+    # a message which wasn't delivered doesn't count as the fastest delivery
+    assert buckets['10'].min_del == 2.0
+    assert buckets['10'].max_del == 4.0
+
+    msg_lists = msg_columns.commands['Vm.scan']
+    assert msg_lists.puts == 3
+    assert msg_lists.gets == 2
+    assert list(msg_lists.delivertimes) == [4.0, 2.0]
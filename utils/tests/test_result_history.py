@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils.result_history import ResultHistory
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+@pytest.fixture
+def history(request, tmpdir):
+    history = ResultHistory(tmpdir.join('result_history.sqlite').strpath)
+    request.addfinalizer(history.close)
+    return history
+
+
+def test_last_outcomes(history):
+    history.record([('a.py/test_a', 'failed', 2.0), ('a.py/test_b', 'passed', 1.0)],
+        '5.8.0.1', '5.8', timestamp=1)
+    history.record([('a.py/test_a', 'passed', 4.0)], '5.8.0.1', '5.8', timestamp=2)
+    history.record([('a.py/test_b', 'failed', 1.0)], '5.8.0.2', '5.8', timestamp=3)
+    assert history.has_build('5.8.0.1')
+    assert not history.has_build('5.7.0.1')
+    assert history.last_outcomes('5.8.0.1') == {'a.py/test_a': 'passed', 'a.py/test_b': 'passed'}
+    assert history.last_outcomes('5.8.0.2') == {'a.py/test_b': 'failed'}
+
+
+def test_flaky_tests_and_durations(history):
+    for timestamp, outcome in enumerate(['passed', 'failed', 'passed']):
+        history.record([('a.py/test_a', outcome, 2.0 * timestamp), ('a.py/test_b', 'passed', 1.0)],
+            '5.8.0.{}'.format(timestamp), '5.8', timestamp=timestamp)
+    history.record([('a.py/test_b', 'failed', None)], '5.7.0.1', '5.7', timestamp=10)
+    assert history.flaky_tests('5.8') == {'a.py/test_a': (2, 1)}
+    # only the latest run is looked at
+    assert history.flaky_tests('5.8', last_runs=1) == {}
+    assert history.durations('5.8') == {'a.py/test_a': 2.0, 'a.py/test_b': 1.0}
+
+
+def test_record_report(history):
+    tests = {
+        'a.py/test_a': {'statuses': {'overall': 'passed'}, 'start_time': 10, 'finish_time': 15},
+        'a.py/test_b': {'statuses': {'overall': 'skipped'}},
+        'a.py/test_c': {'statuses': {}},
+    }
+    assert history.record_report(tests, '5.8.0.1', '5.8') == 2
+    assert history.last_outcomes('5.8.0.1') == {'a.py/test_a': 'passed', 'a.py/test_b': 'skipped'}
+    assert history.durations() == {'a.py/test_a': 5.0}
+
+
+def test_imported_report(history):
+    # a local run on the build doesn't count as an import
+    history.record([('a.py/test_a', 'failed', 1.0)], '5.8.0.1', '5.8', timestamp=5)
+    assert not history.has_import('5.8.0.1', 'trackerbot')
+    tests = {
+        'a.py/test_a': {'statuses': {'overall': 'passed'}},
+        'a.py/test_b': {'statuses': {'overall': 'passed'}},
+    }
+    history.record_report(tests, '5.8.0.1', '5.8', timestamp=0, source='trackerbot')
+    assert history.has_import('5.8.0.1', 'trackerbot')
+    assert not history.has_import('5.8.0.2', 'trackerbot')
+    # the local run is more recent than the imported report
+    assert history.last_outcomes('5.8.0.1') == {'a.py/test_a': 'failed', 'a.py/test_b': 'passed'}
@@ -15,6 +15,23 @@ def test_ssh_client_run_command(ssh_client):
     assert 'Testing!' in output
 
 
+def test_ssh_client_run_command_line_callback(ssh_client):
+    # Lines from both stdout and stderr are passed to the callback as they arrive
+    lines = []
+    exit_status, output = ssh_client.run_command(
+        'echo first; echo second >&2; printf third', line_callback=lines.append)
+    assert exit_status == 0
+    assert sorted(lines) == ['first\n', 'second\n', 'third']
+    assert ''.join(sorted(lines)) == ''.join(sorted(output.splitlines(True)))
+
+
+def test_ssh_client_iter_command(ssh_client):
+    output = ssh_client.iter_command('seq 1 1000; exit 3')
+    assert output.rc is None
+    assert [line.rstrip() for line in output] == [str(i) for i in range(1, 1001)]
+    assert output.rc == 3
+
+
 def test_ssh_client_copies(ssh_client):
     ssh_client_kwargs = {
         'username': fauxfactory.gen_alphanumeric(8),
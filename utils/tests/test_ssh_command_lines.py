@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils.ssh import SSHClient
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class LateChannel(object):
+    """Channel of a command writing its last output right before exiting
+
+    The output arrives with the exit status, after both streams were found empty.
+    """
+    def __init__(self, output, errors):
+        self.late = {False: output, True: errors}
+        self.buffers = {False: '', True: ''}
+        self.closed = False
+
+    def exit_status_ready(self):
+        if self.late:
+            self.buffers, self.late = self.late, None
+        return True
+
+    def recv_exit_status(self):
+        return 0
+
+    def _recv(self, is_stderr, size):
+        data = self.buffers[is_stderr]
+        self.buffers[is_stderr] = data[size:]
+        return data[:size]
+
+    def recv(self, size):
+        return self._recv(False, size)
+
+    def recv_stderr(self, size):
+        return self._recv(True, size)
+
+    def recv_ready(self):
+        return bool(self.buffers[False])
+
+    def recv_stderr_ready(self):
+        return bool(self.buffers[True])
+
+
+class PipeChannel(LateChannel):
+    """Channel of a command writing its output in chunks to both streams
+
+    Like with full pipes, the next chunk is only written once the previous one was read.
+    """
+    def __init__(self, chunks):
+        super(PipeChannel, self).__init__('', '')
+        self.late = None
+        self.chunks = list(chunks)
+        self._next_chunk()
+
+    def _next_chunk(self):
+        if self.chunks:
+            is_stderr, data = self.chunks.pop(0)
+            self.buffers[is_stderr] = data
+
+    def exit_status_ready(self):
+        return not (self.chunks or any(self.buffers.values()))
+
+    def _recv(self, is_stderr, size):
+        data = super(PipeChannel, self)._recv(is_stderr, size)
+        if not any(self.buffers.values()):
+            self._next_chunk()
+        return data
+
+    def close(self):
+        self.closed = True
+
+
+class PipeClient(SSHClient):
+    def __init__(self, chunks):
+        super(PipeClient, self).__init__(hostname='localhost')
+        self.chunks = chunks
+
+    def _exec_command(self, command, timeout):
+        return PipeChannel(self.chunks)
+
+
+def test_command_lines_output_with_exit_status():
+    client = SSHClient(hostname='localhost')
+    session = LateChannel('first\nlast', 'error\n')
+    assert list(client._command_lines(session, timeout=10)) == [
+        ('first\n', False), ('error\n', True), ('last', False)]
+
+
+def test_run_command_to_file_reads_both_streams(tmpdir):
+    client = PipeClient([
+        (False, 'out1\n'), (True, 'err1\n'), (True, 'err2\n'), (False, 'out2\n')])
+    output_file = tmpdir.join('output')
+    result = client.run_command_to_file('command', output_file.strpath)
+    assert result.rc == 0
+    assert result.output == 'err1\nerr2\n'
+    assert output_file.read() == 'out1\nout2\n'
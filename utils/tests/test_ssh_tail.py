@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+
+import pytest
+
+from utils.ssh import SSHResult, SSHTail
+
+pytestmark = [
+    pytest.mark.nondestructive,
+    pytest.mark.skip_selenium,
+]
+
+
+class LocalSession(object):
+    """Runs a command in a local shell, with the parts of the channel interface SSHTail uses"""
+    def __init__(self, command):
+        self.process = subprocess.Popen(['sh', '-c', command], stdout=subprocess.PIPE)
+
+    def recv(self, size):
+        return os.read(self.process.stdout.fileno(), size)
+
+    def recv_exit_status(self):
+        return self.process.wait()
+
+    def close(self):
+        self.process.stdout.close()
+
+
+class LocalTail(SSHTail):
+    """SSHTail running its commands locally"""
+    def _exec_command(self, command, timeout):
+        return LocalSession(command)
+
+    def run_command(self, command, **kwargs):
+        process = subprocess.Popen(['sh', '-c', command], stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT)
+        output = process.communicate()[0]
+        return SSHResult(process.returncode, output)
+
+
+@pytest.fixture
+def tailed_file(tmpdir):
+    tailed_file = tmpdir.join('evm.log')
+    tailed_file.write('first\nsecond\n')
+    return tailed_file
+
+
+def test_ssh_tail_append(tailed_file):
+    tail = LocalTail(tailed_file.strpath, hostname='localhost')
+    # the first iteration only finds the end of the file
+    assert list(tail) == []
+    tailed_file.write('third\nfou', mode='a')
+    assert list(tail) == ['third']
+    tailed_file.write('rth\n', mode='a')
+    assert list(tail) == ['fourth']
+    assert list(tail) == []
+
+
+def test_ssh_tail_reset(tailed_file):
+    tail = LocalTail(tailed_file.strpath, hostname='localhost')
+    tail.set_initial_file_end()
+    # truncated
+    tailed_file.write('new\n')
+    assert list(tail) == ['new']
+    # rotated, the old file keeps its inode
+    tailed_file.rename(tailed_file.dirpath().join('evm.log.1'))
+    tailed_file.write('rotated\n')
+    assert list(tail) == ['rotated']
+
+
+def test_ssh_tail_missing_file(tailed_file):
+    tail = LocalTail(tailed_file.dirpath().join('missing.log').strpath, hostname='localhost')
+    with pytest.raises(IOError):
+        tail.set_initial_file_end()
+
+    tail = LocalTail(tailed_file.strpath, hostname='localhost')
+    tail.set_initial_file_end()
+    # missing in the middle of a rotation
+    tailed_file.remove()
+    assert list(tail) == []
+    tailed_file.write('recreated\n')
+    assert list(tail) == ['recreated']
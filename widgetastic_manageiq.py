@@ -14,6 +14,8 @@ from widgetastic.widget import (
 from widgetastic.xpath import quote
 from widgetastic_patternfly import Accordion as PFAccordion, CandidateNotFound, BootstrapTreeview
 
+from cfme.js import read_table
+
 
 class DynaTree(Widget):
     """ A class directed at CFME Tree elements
@@ -419,6 +421,39 @@ class Table(VanillaTable):
         self.check_all()
         self.browser.click(self.checkbox_all)
 
+    def bulk_read(self, hrefs=False, checkboxes=False):
+        """Read the header and all the rows of the table in one JavaScript call
+
+        Args:
+            hrefs: Whether to read the target of the first link in every cell too
+            checkboxes: Whether to read the state of the checkbox in every cell too
+
+        Returns: ``{'headers': [text, ...], 'rows': [{'element': ..., 'cells': [text, ...]}]}``,
+            rows have ``hrefs`` and ``checked`` lists if asked for, with ``None`` for the cells
+            without a link or checkbox. The texts are only stripped, like ``browser.text`` does,
+            whitespace inside them is kept.
+        """
+        table = self.__element__()
+        return self.browser.execute_script(
+            read_table, table, self.HEADERS, table, self.ROWS,
+            {'hrefs': hrefs, 'checkboxes': checkboxes, 'keep_whitespace': True})
+
+    def read(self):
+        """Read the texts of all the rows in one JavaScript call
+
+        Tables with column widgets are read row by row, as the widgets have to read themselves.
+        """
+        if self.column_widgets:
+            return super(Table, self).read()
+        data = self.bulk_read()
+        headers = [header or None for header in data['headers']]
+        result = []
+        for row in data['rows']:
+            result.append({
+                (header if header is not None else index): text
+                for index, (header, text) in enumerate(zip(headers, row['cells']))})
+        return result
+
 
 class Accordion(PFAccordion):
     @property
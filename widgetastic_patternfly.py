@@ -5,6 +5,7 @@ import re
 import six
 import time
 from cached_property import cached_property
+from jsmin import jsmin
 
 from widgetastic.exceptions import NoSuchElementException, UnexpectedAlertPresentException
 from widgetastic.widget import ClickableMixin, TextInput, Widget, View, do_not_read_this_widget
@@ -643,6 +644,63 @@ class BootstrapTreeview(Widget):
     IS_CHECKED = './span[contains(@class, "check-icon") and contains(@class, "fa-check-square-o")]'
     IS_LOADING = './span[contains(@class, "expand-icon") and contains(@class, "fa-spinner")]'
     INDENT = './span[contains(@class, "indent")]'
+    # Reads all the rendered items of the tree (arguments[0]) in one go, in document order,
+    # which is the order of a depth-first walk of the tree
+    DUMP_ITEMS = jsmin("""\
+    var tree = arguments[0];
+
+    function hasClass(el, cls) {
+        return (el.getAttribute("class") || "").indexOf(cls) >= 0;
+    }
+
+    function childSpans(li, cls) {
+        var result = [];
+        for (var i = 0; i < li.children.length; i++) {
+            var child = li.children[i];
+            if (child.tagName.toLowerCase() === "span" && hasClass(child, cls)) result.push(child);
+        }
+        return result;
+    }
+
+    var items = [];
+    for (var i = 0; i < tree.children.length; i++) {
+        var list = tree.children[i];
+        if (list.tagName.toLowerCase() !== "ul") continue;
+        for (var j = 0; j < list.children.length; j++) {
+            var li = list.children[j];
+            if (li.tagName.toLowerCase() !== "li") continue;
+            var expand = childSpans(li, "expand-icon");
+            var check = childSpans(li, "check-icon");
+            var image = childSpans(li, "node-image");
+            items.push({
+                nodeid: li.getAttribute("data-nodeid"),
+                text: ((li.innerText === undefined) ? li.textContent : li.innerText).trim(),
+                indent: childSpans(li, "indent").length,
+                expandable: expand.length > 0,
+                expanded: expand.length > 0 && hasClass(expand[0], "fa-angle-down"),
+                loading: expand.length > 0 && hasClass(expand[0], "fa-spinner"),
+                checked: check.length > 0 ? hasClass(check[0], "fa-check-square-o") : null,
+                image: image.length > 0 ? image[0].getAttribute("style") : null
+            });
+        }
+    }
+    return items;
+    """)
+    # Clicks the expand/collapse arrows of the nodes with the nodeids in arguments[1]
+    CLICK_ARROWS = jsmin("""\
+    var tree = arguments[0], nodeids = arguments[1];
+
+    for (var i = 0; i < nodeids.length; i++) {
+        // the tree may be rendered again after every click, so look the node up every time
+        var items = tree.querySelectorAll("li[data-nodeid]");
+        for (var j = 0; j < items.length; j++) {
+            if (items[j].getAttribute("data-nodeid") !== nodeids[i]) continue;
+            var arrows = items[j].querySelectorAll("span.expand-icon");
+            if (arrows.length > 0) arrows[0].click();
+            break;
+        }
+    }
+    """)
 
     def __init__(self, parent, tree_id=None, logger=None):
         Widget.__init__(self, parent, logger=logger)
@@ -673,9 +731,7 @@ class BootstrapTreeview(Widget):
             The name of the image without the hash, path and extension.
         """
         image_node = self.browser.element('./span[contains(@class, "node-image")]', parent=item)
-        style = self.browser.get_attribute('style', image_node)
-        image_href = re.search(r'url\("([^"]+)"\)', style).groups()[0]
-        return re.search(r'/([^/]+)-[0-9a-f]+\.png$', image_href).groups()[0]
+        return self.image_from_style(self.browser.get_attribute('style', image_node))
 
     def __locator__(self):
         return '#{}'.format(self.tree_id)
@@ -958,10 +1014,142 @@ class BootstrapTreeview(Widget):
         self.browser.click(node)
         return node
 
+    @staticmethod
+    def image_from_style(style):
+        """The image name from the style of the image node, like :py:meth:`image_getter`"""
+        if not style:
+            return None
+        image_href = re.search(r'url\("([^"]+)"\)', style).groups()[0]
+        return re.search(r'/([^/]+)-[0-9a-f]+\.png$', image_href).groups()[0]
+
+    @staticmethod
+    def subtree_items(items, nodeid):
+        """The item with the nodeid and all the items below it, all the items if nodeid is None
+
+        Args:
+            items: Items of the tree, as :py:attr:`DUMP_ITEMS` returns them
+        """
+        if nodeid is None:
+            return items
+        for start, item in enumerate(items):
+            if item['nodeid'] == nodeid:
+                break
+        else:
+            return []
+        end = start + 1
+        while end < len(items) and items[end]['indent'] > items[start]['indent']:
+            end += 1
+        return items[start:end]
+
+    @classmethod
+    def expand_items(cls, dump, click, nodeid, num_sec=300, delay=0.2, max_clicks=3):
+        """Expand a node (or the whole tree) and everything below it, a level at once
+
+        All the collapsed nodes found in the subtree are clicked at once, then the tree is read
+        again when they finished loading, until there is nothing more to expand. Nodes which are
+        still collapsed then, e.g. because a click got lost, are clicked again. Shared with
+        :py:class:`cfme.web_ui.BootstrapTreeview`, which runs the scripts its own way.
+
+        Args:
+            dump: Called to read the items of the tree with :py:attr:`DUMP_ITEMS`
+            click: Called with a list of nodeids to click their arrows with
+                :py:attr:`CLICK_ARROWS`
+            nodeid: Node to expand, ``None`` for the whole tree
+            max_clicks: How many times a node is clicked before giving up on expanding it
+
+        Returns:
+            The items of the subtree, see :py:meth:`subtree_items`
+        """
+        clicks = {}
+
+        def _collapsed(items):
+            return [
+                item['nodeid'] for item in items if item['expandable'] and not item['expanded']]
+
+        def _expand_level():
+            items = cls.subtree_items(dump(), nodeid)
+            if any(item['loading'] for item in items):
+                return False
+            collapsed = [
+                item_id for item_id in _collapsed(items) if clicks.get(item_id, 0) < max_clicks]
+            if not collapsed:
+                return items
+            for item_id in collapsed:
+                clicks[item_id] = clicks.get(item_id, 0) + 1
+            click(collapsed)
+            return False
+
+        items = wait_for(_expand_level, delay=delay, num_sec=num_sec).out
+        collapsed = _collapsed(items)
+        if collapsed:
+            raise Exception('Could not expand the nodes {} after {} clicks'.format(
+                ', '.join(collapsed), max_clicks))
+        return items
+
+    @staticmethod
+    def collapse_items(dump, click, items, delay=0.2):
+        """Collapse the expanded items, the deepest first, with one click call
+
+        Args:
+            dump: See :py:meth:`expand_items`
+            click: See :py:meth:`expand_items`
+            items: Items to collapse, as :py:meth:`expand_items` returns them
+        """
+        expanded = [item['nodeid'] for item in reversed(items) if item['expanded']]
+        if not expanded:
+            return
+        click(expanded)
+        wait_for(
+            lambda: not any(item['expanded'] for item in dump() if item['nodeid'] in expanded),
+            delay=delay, num_sec=10)
+
+    @classmethod
+    def nest_items(cls, items, include_images=False):
+        """Turn the items of a subtree into a list of the structures :py:meth:`read_contents`
+        returns, one for every topmost item"""
+        def _nest(index):
+            item = items[index]
+            if include_images:
+                this_item = (cls.image_from_style(item['image']), item['text'])
+            else:
+                this_item = item['text']
+            children = []
+            index += 1
+            while index < len(items) and items[index]['indent'] > item['indent']:
+                child, index = _nest(index)
+                children.append(child)
+            if children:
+                return [this_item, children], index
+            else:
+                return this_item, index
+
+        result = []
+        index = 0
+        while index < len(items):
+            nested, index = _nest(index)
+            result.append(nested)
+        return result
+
+    def dump_items(self):
+        """Read all the rendered items of the tree in one JavaScript call
+
+        Returns:
+            A list of dicts with ``nodeid``, ``text``, ``indent``, ``expandable``, ``expanded``,
+            ``loading``, ``checked`` and ``image`` (the style with the image url) of every item,
+            in the order they are in the tree.
+        """
+        return self.browser.execute_script(self.DUMP_ITEMS, self.browser.element(self))
+
+    def click_arrows(self, nodeids):
+        """Click the expand/collapse arrows of the nodes in one JavaScript call"""
+        self.logger.debug('Clicking %d node arrows on tree %s', len(nodeids), self.tree_id)
+        self.browser.execute_script(self.CLICK_ARROWS, self.browser.element(self), nodeids)
+
     def read_contents(self, nodeid=None, include_images=False, collapse_after_read=False):
         """Reads the contents of the tree into a tree structure of strings and lists.
 
-        This method is called recursively.
+        The subtree is expanded level by level with :py:meth:`expand_items` and read with one
+        JavaScript call, instead of visiting every node.
 
         Args:
             nodeid: id of the node where the process should start from.
@@ -974,33 +1162,18 @@ class BootstrapTreeview(Widget):
             :py:class:`list`
         """
         if nodeid is None:
-            return self.read_contents(
-                nodeid=self.get_nodeid(self.root_item),
-                include_images=include_images,
-                collapse_after_read=collapse_after_read)
-
-        item = self.get_item_by_nodeid(nodeid)
-        self.expand_node(nodeid)
-        result = []
+            nodeid = self.get_nodeid(self.root_item)
+        else:
+            # Fails the same way as before when there is no such node
+            self.get_item_by_nodeid(nodeid)
 
-        for child_item in self.child_items(item):
-            result.append(
-                self.read_contents(
-                    nodeid=self.get_nodeid(child_item),
-                    include_images=include_images,
-                    collapse_after_read=collapse_after_read))
+        items = self.expand_items(self.dump_items, self.click_arrows, nodeid)
+        result = self.nest_items(items, include_images=include_images)[0]
 
         if collapse_after_read:
-            self.collapse_node(nodeid)
+            self.collapse_items(self.dump_items, self.click_arrows, items)
 
-        if include_images:
-            this_item = (self.image_getter(item), self.browser.text(item))
-        else:
-            this_item = self.browser.text(item)
-        if result:
-            return [this_item, result]
-        else:
-            return this_item
+        return result
 
     def check_uncheck_node(self, check, *path, **kwargs):
         leaf = self.expand_path(*path, **kwargs)